@@ -27,6 +27,7 @@ from .traffic import (
     TrafficAnalysisEntity,
     VehicleEntity,
     VehicleFrameEntity,
+    VehicleLinkEntity,
     CreateTrafficAnalysisDTO,
     UpdateTrafficAnalysisStatsDTO,
     CreateVehicleDTO,
@@ -171,6 +172,7 @@ __all__ = [
     "TrafficAnalysisEntity",
     "VehicleEntity",
     "VehicleFrameEntity",
+    "VehicleLinkEntity",
     "CreateTrafficAnalysisDTO",
     "UpdateTrafficAnalysisStatsDTO",
     "CreateVehicleDTO",
@@ -91,6 +91,10 @@ class CameraEntity(BaseModel):
     lanes = models.IntegerField(default=2)
     coversBothDirections = models.BooleanField(default=False)
     notes = models.TextField(blank=True, null=True)
+    roiPolygon = models.JSONField(default=list)
+    countLines = models.JSONField(default=list)
+    lanePolygons = models.JSONField(default=list)
+    speedCalibration = models.JSONField(default=dict)
 
     class Meta:
         abstract = True  # DLL model - inherit in other apps
@@ -158,6 +162,7 @@ class VehicleEntity(BaseModel):
     model = models.CharField(max_length=50, blank=True, null=True)
     plateProcessingStatus = models.CharField(max_length=20)
     bestFrameForPlate = models.IntegerField(blank=True, null=True)
+    reidFeature = models.JSONField(blank=True, null=True)
 
     class Meta:
         abstract = True  # DLL model - inherit in other apps
@@ -180,6 +185,7 @@ class VehicleFrameEntity(BaseModel):
     boundingBoxHeight = models.IntegerField()
     confidence = models.DecimalField(max_digits=5, decimal_places=4)
     frameQuality = models.DecimalField(max_digits=5, decimal_places=4)
+    plateQuality = models.DecimalField(max_digits=5, decimal_places=4, blank=True, null=True)
     speed = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
     imagePath = models.CharField(max_length=500, blank=True, null=True)
 
@@ -191,6 +197,23 @@ class VehicleFrameEntity(BaseModel):
     def __str__(self):
         return f'VehicleFrameEntity ({self.pk})'
 
+class VehicleLinkEntity(BaseModel):
+    """Abstract DLL model from TypeScript interface VehicleLinkEntity"""
+    """USAGE: Inherit in other apps - class User(VehicleLinkEntity): pass"""
+
+    sourceVehicleId = models.ForeignKey('Vehicle', on_delete=models.CASCADE, related_name='sourcevehicleid_vehicle_set')
+    targetVehicleId = models.ForeignKey('Vehicle', on_delete=models.CASCADE, related_name='targetvehicleid_vehicle_set')
+    similarity = models.DecimalField(max_digits=5, decimal_places=4)
+    travelSeconds = models.IntegerField()
+
+    class Meta:
+        abstract = True  # DLL model - inherit in other apps
+        verbose_name = "Abstract VehicleLinkEntity"
+        verbose_name_plural = "Abstract VehicleLinkEntitys"
+
+    def __str__(self):
+        return f'VehicleLinkEntity ({self.pk})'
+
 class CreateTrafficAnalysisDTO(BaseModel):
     """Abstract DLL model from TypeScript interface CreateTrafficAnalysisDTO"""
     """USAGE: Inherit in other apps - class User(CreateTrafficAnalysisDTO): pass"""
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("traffic_app", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="camera",
+            name="roiPolygon",
+            field=models.JSONField(default=list),
+        ),
+    ]
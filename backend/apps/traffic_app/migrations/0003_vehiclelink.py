@@ -0,0 +1,85 @@
+# Generated by Django 5.2 on 2026-10-17 14:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("traffic_app", "0002_camera_roipolygon"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VehicleLink",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        editable=False, primary_key=True, serialize=False
+                    ),
+                ),
+                (
+                    "createdAt",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        db_column="createdAt",
+                        verbose_name="Created At",
+                    ),
+                ),
+                (
+                    "updatedAt",
+                    models.DateTimeField(
+                        auto_now=True, db_column="updatedAt", verbose_name="Updated At"
+                    ),
+                ),
+                (
+                    "isActive",
+                    models.BooleanField(
+                        db_column="isActive", default=True, verbose_name="Is Active"
+                    ),
+                ),
+                ("similarity", models.DecimalField(decimal_places=4, max_digits=5)),
+                ("travelSeconds", models.IntegerField()),
+                (
+                    "sourceVehicleId",
+                    models.ForeignKey(
+                        db_column="sourceVehicleId",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="next_links",
+                        to="traffic_app.vehicle",
+                        verbose_name="Source Vehicle",
+                    ),
+                ),
+                (
+                    "targetVehicleId",
+                    models.ForeignKey(
+                        db_column="targetVehicleId",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="previous_links",
+                        to="traffic_app.vehicle",
+                        verbose_name="Target Vehicle",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Vehicle Link",
+                "verbose_name_plural": "Vehicle Links",
+                "db_table": "traffic_vehicle_links",
+                "ordering": ["-createdAt"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="vehiclelink",
+            index=models.Index(
+                fields=["sourceVehicleId"], name="traffic_veh_sourceV_7375b0_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="vehiclelink",
+            index=models.Index(
+                fields=["targetVehicleId"], name="traffic_veh_targetV_f15b02_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-17 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("traffic_app", "0003_vehiclelink"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="camera",
+            name="countLines",
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name="camera",
+            name="lanePolygons",
+            field=models.JSONField(default=list),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("traffic_app", "0004_camera_countlines_lanepolygons"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="camera",
+            name="speedCalibration",
+            field=models.JSONField(default=dict),
+        ),
+    ]
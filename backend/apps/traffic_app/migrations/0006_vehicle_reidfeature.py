@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("traffic_app", "0005_camera_speedcalibration"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="vehicle",
+            name="reidFeature",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
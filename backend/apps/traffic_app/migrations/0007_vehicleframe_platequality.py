@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("traffic_app", "0006_vehicle_reidfeature"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="vehicleframe",
+            name="plateQuality",
+            field=models.DecimalField(
+                blank=True, decimal_places=4, max_digits=5, null=True
+            ),
+        ),
+    ]
@@ -10,6 +10,7 @@ from apps.entities.models.traffic import (
     TrafficAnalysisEntity,
     VehicleEntity,
     VehicleFrameEntity,
+    VehicleLinkEntity,
 )
 
 
@@ -39,6 +40,9 @@ class Camera(CameraEntity):
     IMPORTANTE: Todos los campos ya están definidos en CameraEntity.
     - locationId: ForeignKey a Location (se actualiza cuando se mueve la cámara)
     - name, brand, model, resolution, fps, lanes, coversBothDirections
+    - roiPolygon: región de interés de la vía (se recorta antes de la detección)
+    - countLines, lanePolygons: líneas de conteo y carriles (dirección y carril del vehículo)
+    - speedCalibration: puntos imagen ↔ metros en la vía (homografía para velocidad)
     - isActive, notes, createdAt, updatedAt
 
     NO agregues campos redundantes. Solo sobrescribe ForeignKey para usar instancia concreta.
@@ -155,7 +159,7 @@ class VehicleFrame(VehicleFrameEntity):
     IMPORTANTE: Todos los campos ya están definidos en VehicleFrameEntity.
     - vehicleId: ForeignKey a Vehicle
     - frameNumber, timestamp, boundingBox (X/Y/Width/Height)
-    - confidence, frameQuality, speed, imagePath
+    - confidence, frameQuality, plateQuality, speed, imagePath
 
     NO agregues campos redundantes. Solo sobrescribe ForeignKey para usar instancia concreta.
     """
@@ -181,3 +185,45 @@ class VehicleFrame(VehicleFrameEntity):
 
     def __str__(self):
         return f"Frame {self.frameNumber} - Vehicle {self.vehicleId.id[:8]}... (Quality: {self.frameQuality:.2f})"
+
+
+class VehicleLink(VehicleLinkEntity):
+    """
+    Re-identificación de un vehículo entre cámaras cercanas.
+
+    IMPORTANTE: Todos los campos ya están definidos en VehicleLinkEntity.
+    - sourceVehicleId: Vehicle visto antes en otra cámara
+    - targetVehicleId: Vehicle del análisis actual re-identificado
+    - similarity, travelSeconds
+
+    NO agregues campos redundantes. Solo sobrescribe ForeignKeys para usar instancias concretas.
+    """
+
+    # Sobrescribir ForeignKeys para usar modelo concreto Vehicle
+    sourceVehicleId = models.ForeignKey(
+        Vehicle,
+        on_delete=models.CASCADE,
+        related_name="next_links",
+        db_column="sourceVehicleId",
+        verbose_name="Source Vehicle",
+    )
+    targetVehicleId = models.ForeignKey(
+        Vehicle,
+        on_delete=models.CASCADE,
+        related_name="previous_links",
+        db_column="targetVehicleId",
+        verbose_name="Target Vehicle",
+    )
+
+    class Meta:
+        db_table = "traffic_vehicle_links"
+        verbose_name = "Vehicle Link"
+        verbose_name_plural = "Vehicle Links"
+        ordering = ["-createdAt"]
+        indexes = [
+            models.Index(fields=["sourceVehicleId"]),
+            models.Index(fields=["targetVehicleId"]),
+        ]
+
+    def __str__(self):
+        return f"{self.sourceVehicleId_id} → {self.targetVehicleId_id} ({self.similarity})"
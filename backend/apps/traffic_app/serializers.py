@@ -4,8 +4,11 @@ Convierten modelos Django a JSON y viceversa
 """
 
 from rest_framework import serializers
+from apps.entities.constants.traffic import TRAFFIC_DIRECTION_CHOICES
 from .models import Location, Camera, TrafficAnalysis, Vehicle, VehicleFrame
 
+TRAFFIC_DIRECTION_VALUES = {key for key, _ in TRAFFIC_DIRECTION_CHOICES}
+
 
 class LocationSerializer(serializers.ModelSerializer):
     """Serializer para Location"""
@@ -27,6 +30,85 @@ class CameraSerializer(serializers.ModelSerializer):
         fields = "__all__"
         read_only_fields = ("id", "createdAt", "updatedAt")
 
+    def validate_roiPolygon(self, value):
+        """Valida el polígono ROI: [] o al menos 3 puntos [x, y] en píxeles"""
+        if not value:
+            return []
+        if not isinstance(value, list) or len(value) < 3:
+            raise serializers.ValidationError(
+                "El polígono ROI necesita al menos 3 puntos [x, y]"
+            )
+        for point in value:
+            if (
+                not isinstance(point, list)
+                or len(point) != 2
+                or not all(isinstance(v, (int, float)) and v >= 0 for v in point)
+            ):
+                raise serializers.ValidationError(f"Punto ROI inválido: {point}")
+        return value
+
+    def validate_countLines(self, value):
+        """Valida las líneas de conteo: [{name, points: [[x1, y1], [x2, y2]], direction}]"""
+        if not value:
+            return []
+        if not isinstance(value, list):
+            raise serializers.ValidationError("Las líneas de conteo deben ser una lista")
+        for line in value:
+            points = line.get("points") if isinstance(line, dict) else None
+            if (
+                not isinstance(points, list)
+                or len(points) != 2
+                or not all(
+                    isinstance(point, list)
+                    and len(point) == 2
+                    and all(isinstance(v, (int, float)) and v >= 0 for v in point)
+                    for point in points
+                )
+                or points[0] == points[1]
+            ):
+                raise serializers.ValidationError(
+                    f"La línea de conteo necesita 2 puntos distintos [x, y]: {line}"
+                )
+            if line.get("direction") not in TRAFFIC_DIRECTION_VALUES:
+                raise serializers.ValidationError(
+                    f"Dirección inválida en línea de conteo: {line.get('direction')}"
+                )
+        return value
+
+    def validate_lanePolygons(self, value):
+        """Valida los carriles: lista de polígonos de al menos 3 puntos [x, y]"""
+        if not value:
+            return []
+        if not isinstance(value, list):
+            raise serializers.ValidationError("Los carriles deben ser una lista de polígonos")
+        for polygon in value:
+            if not polygon:
+                raise serializers.ValidationError("Carril vacío")
+            self.validate_roiPolygon(polygon)
+        return value
+
+    def validate_speedCalibration(self, value):
+        """Valida la calibración: {imagePoints, worldPoints} con al menos 4 pares [x, y]"""
+        if not value:
+            return {}
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("La calibración de velocidad debe ser un objeto")
+        image_points = value.get("imagePoints")
+        world_points = value.get("worldPoints")
+        for points in (image_points, world_points):
+            if not isinstance(points, list) or not all(
+                isinstance(point, list)
+                and len(point) == 2
+                and all(isinstance(v, (int, float)) for v in point)
+                for point in points
+            ):
+                raise serializers.ValidationError(f"Puntos de calibración inválidos: {points}")
+        if len(image_points) < 4 or len(image_points) != len(world_points):
+            raise serializers.ValidationError(
+                "La calibración necesita al menos 4 pares de puntos imagen ↔ vía"
+            )
+        return value
+
 
 class VehicleFrameSerializer(serializers.ModelSerializer):
     """Serializer para VehicleFrame"""
@@ -46,7 +128,7 @@ class VehicleSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Vehicle
-        fields = "__all__"
+        exclude = ("reidFeature",)  # Uso interno (services.reid_gallery)
         read_only_fields = ("createdAt", "updatedAt")
 
 
@@ -0,0 +1,208 @@
+"""
+Adaptive Sampling Service
+Muestreo de frames guiado por movimiento y actividad de la escena
+- Tramos estáticos (sin movimiento ni tracks activos): el stride crece
+  hasta `max_stride` y se infiere sobre muchos menos frames
+- Movimiento o vehículos en seguimiento: el stride vuelve a `min_stride`
+"""
+
+from typing import Dict, Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+from django.conf import settings
+
+from .frame_sampling import SAMPLING_MODES, skip_to
+
+
+class AdaptiveSampler:
+    """
+    Decide cada cuántos frames ejecutar la detección
+
+    El movimiento se mide en el decodificador con una diferencia de
+    frames sobre una versión reducida en escala de grises (160 px de
+    ancho): fracción de píxeles que cambian entre dos frames muestreados.
+
+    Los frames leídos son siempre múltiplos de `min_stride` en la
+    numeración global del video, igual que con muestreo fijo, de modo
+    que segmentos solapados comparten los frames analizados.
+
+    Nota: el tracking corre detrás del decodificador (colas del
+    pipeline), así que observe_tracks() llega con unos frames de retraso;
+    por eso el stride baja de golpe pero sólo sube tras `patience`
+    muestras tranquilas.
+    """
+
+    def __init__(
+        self,
+        min_stride: int = 3,
+        max_stride: int = 15,
+        motion_threshold: float = 0.002,
+        diff_threshold: int = 25,
+        patience: int = 3,
+        probe_width: int = 160,
+        roi: Optional[Tuple[int, int, int, int]] = None,
+    ):
+        """
+        Args:
+            min_stride: Stride con actividad (procesar 1 de cada N frames)
+            max_stride: Stride máximo en tramos estáticos
+            motion_threshold: Fracción de píxeles cambiados que cuenta como movimiento
+            diff_threshold: Diferencia de intensidad (0-255) para considerar un píxel cambiado
+            patience: Muestras sin actividad antes de duplicar el stride
+            probe_width: Ancho de la imagen reducida usada para medir movimiento
+            roi: Rectángulo (x0, y0, x1, y1) donde medir movimiento (None = frame completo)
+        """
+        self.min_stride = max(1, int(min_stride))
+        # El stride crece duplicándose, siempre múltiplo de min_stride
+        self.max_stride = max(self.min_stride, int(max_stride) // self.min_stride * self.min_stride)
+        self.motion_threshold = motion_threshold
+        self.diff_threshold = diff_threshold
+        self.patience = max(1, int(patience))
+        self.probe_width = probe_width
+        self.roi = roi
+
+        self.stride = self.min_stride
+        self.active_tracks = 0
+        self._previous: Optional[np.ndarray] = None
+        self._quiet_samples = 0
+
+        # Estadísticas
+        self.frames_read = 0
+        self.frames_skipped = 0
+        self.motion_frames = 0
+
+    def observe_tracks(self, active_tracks: int):
+        """Informa cuántos vehículos sigue el tracker (llamado desde el hilo de tracking)"""
+        self.active_tracks = active_tracks
+        if active_tracks:
+            self.stride = self.min_stride
+
+    def motion_score(self, frame: np.ndarray) -> float:
+        """
+        Fracción de píxeles que cambiaron respecto al frame muestreado anterior
+
+        Returns:
+            Valor 0-1 (1.0 para el primer frame: siempre se considera activo)
+        """
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            frame = frame[y0:y1, x0:x1]
+
+        height, width = frame.shape[:2]
+        scale = self.probe_width / float(width)
+        probe = cv2.resize(
+            frame, (self.probe_width, max(1, int(height * scale))), interpolation=cv2.INTER_AREA
+        )
+        probe = cv2.GaussianBlur(cv2.cvtColor(probe, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        previous, self._previous = self._previous, probe
+        if previous is None or previous.shape != probe.shape:
+            return 1.0
+
+        changed = cv2.absdiff(probe, previous) > self.diff_threshold
+        return float(np.count_nonzero(changed)) / changed.size
+
+    def update(self, frame: np.ndarray) -> int:
+        """
+        Mide el movimiento del frame leído y ajusta el stride
+
+        Returns:
+            Stride hasta el próximo frame a leer
+        """
+        if self.motion_score(frame) >= self.motion_threshold:
+            self.motion_frames += 1
+            self._quiet_samples = 0
+            self.stride = self.min_stride
+        elif self.active_tracks:
+            self._quiet_samples = 0
+            self.stride = self.min_stride
+        else:
+            self._quiet_samples += 1
+            if self._quiet_samples >= self.patience:
+                self._quiet_samples = 0
+                self.stride = min(self.stride * 2, self.max_stride)
+        return self.stride
+
+    def iter_frames(
+        self,
+        cap: cv2.VideoCapture,
+        mode: str = "auto",
+        seek_min_stride: int = 30,
+        start_frame: int = 1,
+        end_frame: Optional[int] = None,
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Lee frames con stride adaptativo (equivalente a frame_sampling.iter_frames)
+
+        Los frames saltados no se decodifican (grab/seek según `mode`).
+
+        Yields:
+            (frame_number, frame)
+        """
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Modo de muestreo no soportado: {mode}")
+
+        can_seek = mode != "grab"
+
+        # Posicionar al inicio del rango
+        frame_number = 0
+        if start_frame > 1:
+            frame_number, _ = skip_to(cap, 0, start_frame, True)
+            if frame_number is None:
+                return
+
+        next_kept = (frame_number // self.min_stride + 1) * self.min_stride
+        while end_frame is None or next_kept <= end_frame:
+            previous_number = frame_number
+            seek = can_seek and (mode == "seek" or next_kept - frame_number >= seek_min_stride)
+            frame_number, seek_ok = skip_to(cap, frame_number, next_kept, seek)
+            if frame_number is None:
+                return
+            if seek and not seek_ok:
+                can_seek = False  # La fuente no permite seek (streams)
+
+            ret, frame = cap.read()
+            if not ret:
+                return
+
+            frame_number += 1
+            self.frames_read += 1
+            self.frames_skipped += frame_number - previous_number - 1
+
+            # frame_number es múltiplo de min_stride y el stride también
+            next_kept = frame_number + self.update(frame)
+            yield frame_number, frame
+
+    def get_stats(self) -> Dict:
+        """Retorna estadísticas del muestreo"""
+        total = self.frames_read + self.frames_skipped
+        return {
+            "frames_read": self.frames_read,
+            "frames_skipped": self.frames_skipped,
+            "motion_frames": self.motion_frames,
+            "sampled_ratio": round(self.frames_read / total, 4) if total else 0.0,
+            "current_stride": self.stride,
+        }
+
+
+def create_sampler(
+    min_stride: int, roi: Optional[Tuple[int, int, int, int]] = None
+) -> Optional[AdaptiveSampler]:
+    """
+    Sampler adaptativo según settings (None si ADAPTIVE_SAMPLING_ENABLED es False)
+
+    Args:
+        min_stride: Stride con actividad (el stride fijo del análisis)
+        roi: Rectángulo donde medir movimiento
+    """
+    if not getattr(settings, "ADAPTIVE_SAMPLING_ENABLED", False):
+        return None
+
+    return AdaptiveSampler(
+        min_stride=min_stride,
+        max_stride=getattr(settings, "ADAPTIVE_SAMPLING_MAX_STRIDE", 15),
+        motion_threshold=getattr(settings, "ADAPTIVE_SAMPLING_MOTION_THRESHOLD", 0.002),
+        patience=getattr(settings, "ADAPTIVE_SAMPLING_PATIENCE", 3),
+        roi=roi,
+    )
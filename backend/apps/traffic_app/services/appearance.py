@@ -0,0 +1,198 @@
+"""
+Appearance Features Service
+Features visuales para re-identificación de vehículos
+- extract_features: histogramas de color de todas las cajas de un frame
+  en una sola pasada (crop_features si los recortes ya están cortados)
+- FeatureIndex: matriz contigua de features particionada por tipo de
+  vehículo; una búsqueda es un único producto matricial
+"""
+
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+PATCH_SIZE = 64  # Lado del recorte normalizado
+HISTOGRAM_BINS = 32  # Bins por canal
+FEATURE_DIM = 3 * HISTOGRAM_BINS
+
+
+def extract_features(
+    frame: np.ndarray, bboxes: Sequence[Sequence[int]]
+) -> np.ndarray:
+    """
+    Histograma de color BGR (32 bins por canal, norma L2) de cada caja
+
+    Args:
+        frame: Frame del video (BGR)
+        bboxes: Cajas (x, y, w, h)
+
+    Returns:
+        Array (N, FEATURE_DIM) float32 (fila en cero si la caja está fuera del frame)
+    """
+    return crop_features([
+        frame[max(0, y) : y + h, max(0, x) : x + w] for x, y, w, h in bboxes
+    ])
+
+
+def crop_features(crops: Sequence[Optional[np.ndarray]]) -> np.ndarray:
+    """
+    Histograma de color BGR (32 bins por canal, norma L2) de cada recorte
+
+    Los recortes se escalan a 64x64 en un buffer común (la feature no
+    depende de la resolución del recorte) y los tres histogramas de todos
+    salen de un único np.bincount (equivalente a cv2.calcHist por canal y
+    por recorte).
+
+    Args:
+        crops: Recortes BGR de cualquier tamaño (None o vacío = sin recorte)
+
+    Returns:
+        Array (N, FEATURE_DIM) float32 (fila en cero si no hay recorte)
+    """
+    count = len(crops)
+    features = np.zeros((count, FEATURE_DIM), dtype=np.float32)
+    if count == 0:
+        return features
+
+    patches = np.empty((count, PATCH_SIZE, PATCH_SIZE, 3), dtype=np.uint8)
+    valid = np.zeros(count, dtype=bool)
+    for i, crop in enumerate(crops):
+        if crop is not None and crop.size:
+            cv2.resize(crop, (PATCH_SIZE, PATCH_SIZE), dst=patches[i])
+            valid[i] = True
+    if not valid.any():
+        return features
+
+    # Índice de bin global: fila * FEATURE_DIM + canal * 32 + valor // 8
+    bins = (patches[valid] >> 3).astype(np.int64).reshape(-1, PATCH_SIZE * PATCH_SIZE, 3)
+    bins += np.arange(3) * HISTOGRAM_BINS
+    bins += (np.arange(len(bins)) * FEATURE_DIM)[:, None, None]
+    histograms = np.bincount(bins.ravel(), minlength=len(bins) * FEATURE_DIM)
+    histograms = histograms.reshape(-1, FEATURE_DIM).astype(np.float32)
+
+    histograms /= np.linalg.norm(histograms, axis=1, keepdims=True) + 1e-7
+    features[valid] = histograms
+    return features
+
+
+class _Partition:
+    """Features de un tipo de vehículo en filas contiguas"""
+
+    __slots__ = ("features", "stamps", "keys", "size")
+
+    def __init__(self, dim: int, capacity: int):
+        self.features = np.zeros((capacity, dim), dtype=np.float32)
+        self.stamps = np.zeros(capacity, dtype=np.float64)
+        self.keys: List[Hashable] = []
+        self.size = 0
+
+    def grow(self):
+        capacity = 2 * len(self.stamps)
+        features = np.zeros((capacity, self.features.shape[1]), dtype=np.float32)
+        stamps = np.zeros(capacity, dtype=np.float64)
+        features[: self.size] = self.features[: self.size]
+        stamps[: self.size] = self.stamps[: self.size]
+        self.features, self.stamps = features, stamps
+
+
+class FeatureIndex:
+    """
+    Índice de features para búsqueda por similitud coseno
+
+    Cada entrada tiene una clave, una partición (tipo de vehículo) y una
+    marca de tiempo (frame o timestamp) para filtrar por ventana. Las
+    bajas mueven la última fila al hueco, así la matriz sigue contigua.
+    """
+
+    def __init__(self, dim: int = FEATURE_DIM, initial_capacity: int = 256):
+        self.dim = dim
+        self.initial_capacity = max(1, initial_capacity)
+        self._partitions: Dict[Hashable, _Partition] = {}
+        self._rows: Dict[Hashable, Tuple[Hashable, int]] = {}  # clave → (partición, fila)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._rows
+
+    def add(self, key: Hashable, partition: Hashable, feature: np.ndarray, stamp: float):
+        """Agrega (o reemplaza) la feature de una clave"""
+        self.remove(key)
+
+        part = self._partitions.get(partition)
+        if part is None:
+            part = self._partitions[partition] = _Partition(self.dim, self.initial_capacity)
+        if part.size == len(part.stamps):
+            part.grow()
+
+        row = part.size
+        part.features[row] = feature
+        part.stamps[row] = stamp
+        part.keys.append(key)
+        part.size += 1
+        self._rows[key] = (partition, row)
+
+    def remove(self, key: Hashable) -> bool:
+        """Elimina una clave; retorna False si no estaba"""
+        location = self._rows.pop(key, None)
+        if location is None:
+            return False
+
+        partition, row = location
+        part = self._partitions[partition]
+        last = part.size - 1
+        if row != last:
+            part.features[row] = part.features[last]
+            part.stamps[row] = part.stamps[last]
+            moved = part.keys[last]
+            part.keys[row] = moved
+            self._rows[moved] = (partition, row)
+        part.keys.pop()
+        part.size = last
+        return True
+
+    def search(
+        self,
+        partition: Hashable,
+        queries: np.ndarray,
+        min_stamp=None,
+        max_stamp=None,
+        threshold: float = 0.0,
+    ) -> List[Optional[Tuple[Hashable, float]]]:
+        """
+        Mejor coincidencia de cada consulta dentro de una partición
+
+        Args:
+            partition: Tipo de vehículo
+            queries: Array (M, dim) de features normalizadas
+            min_stamp: Marca de tiempo mínima de las candidatas (escalar o una por consulta)
+            max_stamp: Marca de tiempo máxima de las candidatas (escalar o una por consulta)
+            threshold: Similitud mínima (estrictamente mayor)
+
+        Returns:
+            Por consulta, (clave, similitud) o None si nada supera el umbral
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        part = self._partitions.get(partition)
+        if part is None or part.size == 0:
+            return [None] * len(queries)
+
+        stamps = part.stamps[: part.size]
+        similarities = queries @ part.features[: part.size].T  # (M, size)
+
+        valid = np.ones((1, part.size), dtype=bool)
+        if min_stamp is not None:
+            valid = valid & (stamps[None] >= np.reshape(min_stamp, (-1, 1)))
+        if max_stamp is not None:
+            valid = valid & (stamps[None] <= np.reshape(max_stamp, (-1, 1)))
+        similarities = np.where(valid, similarities, -1.0)
+
+        best = similarities.argmax(axis=1)
+        best_similarity = similarities[np.arange(len(queries)), best]
+        return [
+            (part.keys[row], float(similarity)) if similarity > threshold else None
+            for row, similarity in zip(best.tolist(), best_similarity.tolist())
+        ]
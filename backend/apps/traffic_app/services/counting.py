@@ -0,0 +1,270 @@
+"""
+Traffic Counting Service
+Líneas virtuales de conteo y carriles por cámara
+- Conteo por cruce de línea: cada track cuenta una vez por línea, así
+  un cambio de ID lejos de la línea no infla el conteo
+- Dirección: la del primer cruce del vehículo
+- Carril: polígono donde el vehículo fue visto más veces
+La geometría de cada frame se evalúa en lote (todos los tracks contra
+todas las líneas) sobre el segmento de movimiento desde su último punto.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from apps.entities.constants.traffic import TRAFFIC_DIRECTION_CHOICES
+
+from .roi import scale_to_frame, validate_polygon
+
+
+TRAFFIC_DIRECTIONS = tuple(key for key, _ in TRAFFIC_DIRECTION_CHOICES)
+OPPOSITE_DIRECTIONS = {
+    "NORTH": "SOUTH",
+    "SOUTH": "NORTH",
+    "EAST": "WEST",
+    "WEST": "EAST",
+    "NORTHEAST": "SOUTHWEST",
+    "SOUTHWEST": "NORTHEAST",
+    "NORTHWEST": "SOUTHEAST",
+    "SOUTHEAST": "NORTHWEST",
+}
+
+
+def validate_count_lines(lines) -> List[Dict]:
+    """
+    Valida las líneas de conteo de una cámara
+
+    Formato: [{"name": str, "points": [[x1, y1], [x2, y2]], "direction": "NORTH"}]
+    `direction` es el sentido de los vehículos que cruzan de la izquierda
+    a la derecha del segmento (x1, y1) → (x2, y2) tal como se ve en la
+    imagen; los que cruzan al revés toman la dirección opuesta.
+
+    Raises:
+        ValueError: Si el formato no es válido
+    """
+    if not isinstance(lines, (list, tuple)):
+        raise ValueError("Las líneas de conteo deben ser una lista")
+    validated = []
+    for index, line in enumerate(lines):
+        if not isinstance(line, dict):
+            raise ValueError(f"Línea de conteo inválida: {line}")
+        points = line.get("points")
+        if (
+            not isinstance(points, (list, tuple))
+            or len(points) != 2
+            or not all(
+                isinstance(p, (list, tuple))
+                and len(p) == 2
+                and all(isinstance(v, (int, float)) for v in p)
+                for p in points
+            )
+            or list(points[0]) == list(points[1])
+        ):
+            raise ValueError(f"La línea de conteo necesita 2 puntos distintos [x, y]: {line}")
+        direction = line.get("direction")
+        if direction not in TRAFFIC_DIRECTIONS:
+            raise ValueError(f"Dirección inválida en línea de conteo: {direction}")
+        validated.append(
+            {
+                "name": str(line.get("name") or f"line_{index + 1}"),
+                "points": [[float(v) for v in p] for p in points],
+                "direction": direction,
+            }
+        )
+    return validated
+
+
+class TrafficCounter:
+    """
+    Conteo por líneas virtuales y asignación de carril de los tracks
+
+    Usa el punto inferior central de la caja (contacto con la vía).
+    Estado por track: último punto, líneas ya cruzadas, dirección y
+    votos por carril; forget() lo libera cuando el track termina.
+    """
+
+    def __init__(
+        self,
+        lines: Sequence[Dict],
+        lanes: Sequence[Sequence[Sequence[float]]],
+        frame_size: Tuple[int, int],
+        count_from_frame: int = 1,
+    ):
+        """
+        Args:
+            lines: Líneas validadas (validate_count_lines) en píxeles del video
+            lanes: Polígonos de carril en píxeles del video (carril 1, 2, ...)
+            frame_size: (width, height) del video
+            count_from_frame: Los cruces anteriores a este frame no se cuentan
+                (segmentos solapados de un video dividido)
+        """
+        self.names = [line["name"] for line in lines]
+        self.directions = [line["direction"] for line in lines]
+        points = np.array([line["points"] for line in lines], dtype=np.float64).reshape(-1, 2, 2)
+        self.starts = points[:, 0]  # (L, 2)
+        self.vectors = points[:, 1] - points[:, 0]  # (L, 2)
+        self.count_from_frame = count_from_frame
+
+        # Máscara de carriles: 0 = fuera de carril, i = carril i
+        width, height = frame_size
+        self.num_lanes = len(lanes)
+        self.lane_mask = None
+        if lanes:
+            self.lane_mask = np.zeros((height, width), dtype=np.uint8)
+            for lane_number, polygon in enumerate(lanes, start=1):
+                cv2.fillPoly(
+                    self.lane_mask,
+                    [np.round(np.asarray(polygon, dtype=np.float32)).astype(np.int32)],
+                    lane_number,
+                )
+
+        self._last_points: Dict[int, Tuple[float, float]] = {}
+        self._crossed: Dict[int, set] = {}
+        self._direction: Dict[int, str] = {}
+        self._lane_votes: Dict[int, np.ndarray] = {}
+        self.counts: Dict[str, Dict[str, int]] = {name: {} for name in self.names}
+
+    @classmethod
+    def from_camera(
+        cls, camera, frame_size: Tuple[int, int], count_from_frame: int = 1
+    ) -> Optional["TrafficCounter"]:
+        """
+        Contador con las líneas y carriles de una cámara escalados al video
+
+        Returns:
+            TrafficCounter o None si la cámara no define líneas ni carriles
+        """
+        lines = validate_count_lines(getattr(camera, "countLines", None) or [])
+        lanes = [
+            scale_to_frame(validate_polygon(polygon), camera, frame_size)
+            for polygon in getattr(camera, "lanePolygons", None) or []
+        ]
+        if not lines and not lanes:
+            return None
+
+        for line in lines:
+            line["points"] = scale_to_frame(line["points"], camera, frame_size).tolist()
+        return cls(lines, lanes, frame_size, count_from_frame=count_from_frame)
+
+    def update(
+        self, track_ids: np.ndarray, bboxes: np.ndarray, frame_number: int
+    ) -> List[Tuple[int, str, str]]:
+        """
+        Procesa las posiciones de los tracks en un frame
+
+        Args:
+            track_ids: Array (N,) de ids de track
+            bboxes: Array (N, 4) de cajas (x, y, w, h) en píxeles del video
+            frame_number: Número de frame
+
+        Returns:
+            Cruces nuevos [(track_id, nombre de línea, dirección)]
+        """
+        if len(track_ids) == 0:
+            return []
+
+        track_ids = track_ids.tolist()
+        bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        points = np.stack([bboxes[:, 0] + bboxes[:, 2] / 2, bboxes[:, 1] + bboxes[:, 3]], axis=1)
+
+        if self.lane_mask is not None:
+            height, width = self.lane_mask.shape
+            xs = np.clip(points[:, 0].astype(np.int32), 0, width - 1)
+            ys = np.clip(points[:, 1].astype(np.int32), 0, height - 1)
+            for track_id, lane in zip(track_ids, self.lane_mask[ys, xs].tolist()):
+                if lane:
+                    votes = self._lane_votes.get(track_id)
+                    if votes is None:
+                        votes = self._lane_votes[track_id] = np.zeros(
+                            self.num_lanes + 1, dtype=np.int32
+                        )
+                    votes[lane] += 1
+
+        crossings = []
+        if self.names:
+            rows = [i for i, track_id in enumerate(track_ids) if track_id in self._last_points]
+            if rows:
+                crossings = self._crossings(
+                    [track_ids[i] for i in rows],
+                    np.array([self._last_points[track_ids[i]] for i in rows]),
+                    points[rows],
+                    frame_number,
+                )
+
+        for track_id, point in zip(track_ids, points.tolist()):
+            self._last_points[track_id] = point
+        return crossings
+
+    def _crossings(self, track_ids, starts, ends, frame_number):
+        """Intersección de los segmentos de movimiento (N) con las líneas (L)"""
+        A, D = self.starts[None], self.vectors[None]  # (1, L, 2)
+        P, Q = starts[:, None], ends[:, None]  # (N, 1, 2)
+        M = Q - P
+
+        def cross(u, v):
+            return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+        # Lado de la línea antes/después (> 0: a la derecha de A → B en la imagen)
+        side_start = cross(D, P - A) > 0
+        side_end = cross(D, Q - A) > 0
+        # El segmento de la línea debe quedar a ambos lados del movimiento
+        side_a = cross(M, A - P)
+        side_b = cross(M, A + D - P)
+        crossed = (side_start != side_end) & (side_a * side_b <= 0)
+
+        events = []
+        for row, line in zip(*np.nonzero(crossed)):
+            track_id = track_ids[row]
+            done = self._crossed.setdefault(track_id, set())
+            if line in done:
+                continue
+            done.add(line)
+
+            direction = self.directions[line]
+            if not side_end[row, line]:
+                direction = OPPOSITE_DIRECTIONS[direction]
+            self._direction.setdefault(track_id, direction)
+
+            if frame_number >= self.count_from_frame:
+                name = self.names[line]
+                self.counts[name][direction] = self.counts[name].get(direction, 0) + 1
+                events.append((track_id, name, direction))
+        return events
+
+    def attributes(self, track_id: int) -> Dict:
+        """
+        Atributos de un vehículo para persistir
+
+        Returns:
+            {direction, lane, lane_votes} (None si no cruzó líneas / no tiene carril)
+        """
+        votes = self._lane_votes.get(track_id)
+        return {
+            "direction": self._direction.get(track_id),
+            "lane": int(votes.argmax()) if votes is not None else None,
+            "lane_votes": votes.tolist() if votes is not None else None,
+        }
+
+    def forget(self, track_id: int):
+        """Libera el estado de un track terminado"""
+        self._last_points.pop(track_id, None)
+        self._crossed.pop(track_id, None)
+        self._direction.pop(track_id, None)
+        self._lane_votes.pop(track_id, None)
+
+    def get_counts(self) -> Dict[str, Dict[str, int]]:
+        """Cruces por línea y dirección: {line_name: {direction: count}}"""
+        return {name: dict(counts) for name, counts in self.counts.items()}
+
+
+def merge_line_counts(*counts: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+    """Suma conteos por línea de varios contadores (segmentos de un video)"""
+    merged: Dict[str, Dict[str, int]] = {}
+    for line_counts in counts:
+        for name, by_direction in (line_counts or {}).items():
+            target = merged.setdefault(name, {})
+            for direction, count in by_direction.items():
+                target[direction] = target.get(direction, 0) + count
+    return merged
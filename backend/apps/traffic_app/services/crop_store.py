@@ -0,0 +1,182 @@
+"""
+Crop Store Service
+Recortes de los mejores frames de cada vehículo en disco
+- Codificación JPEG/WebP y escritura en un pool de hilos, fuera del
+  bucle de análisis (con contrapresión si el disco se atrasa)
+- Rutas por contenido: <directorio del análisis>/ab/abcdef....jpg; un
+  recorte idéntico se escribe una sola vez
+- Recortes casi iguales del mismo vehículo (dHash a poca distancia de
+  Hamming) comparten el archivo del primero
+- remove_crops: borra los recortes que ningún frame guardado referencia
+  (tracks de segmentos unidos o descartados)
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+IMAGE_FORMATS = {
+    "jpg": cv2.IMWRITE_JPEG_QUALITY,
+    "webp": cv2.IMWRITE_WEBP_QUALITY,
+}
+
+
+def dhash(crop: np.ndarray) -> int:
+    """Hash perceptual de diferencias (64 bits) de un recorte BGR"""
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class CropStore:
+    """Escritor de recortes de un análisis"""
+
+    def __init__(
+        self,
+        directory: str,
+        image_format: str = "jpg",
+        quality: int = 90,
+        workers: int = 2,
+        dedup_distance: int = 4,
+        max_pending: int = 256,
+    ):
+        """
+        Args:
+            directory: Directorio del análisis
+            image_format: "jpg" o "webp"
+            quality: Calidad de codificación (0-100)
+            workers: Hilos de codificación/escritura
+            dedup_distance: Distancia de Hamming máxima entre dHash para
+                considerar dos recortes del mismo vehículo duplicados
+            max_pending: Recortes en cola antes de bloquear a quien guarda
+        """
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Formato de recorte no soportado: {image_format}")
+        self.directory = directory
+        self.image_format = image_format
+        self.params = [IMAGE_FORMATS[image_format], int(quality)]
+        self.dedup_distance = dedup_distance
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crop-writer")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+
+        # Estadísticas
+        self.written = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.bytes_written = 0
+
+    def save(self, crops: Sequence[Optional[np.ndarray]]) -> List[Optional[str]]:
+        """
+        Encola los recortes de un vehículo
+
+        Args:
+            crops: Recortes BGR (None o vacío = sin imagen)
+
+        Returns:
+            Ruta de cada recorte (los duplicados apuntan al archivo del
+            recorte que se conserva); el archivo existe tras close()
+        """
+        paths: List[Optional[str]] = []
+        kept = []  # (dhash, ruta) de los recortes escritos de este vehículo
+        for crop in crops:
+            if crop is None or crop.size == 0:
+                paths.append(None)
+                continue
+
+            signature = dhash(crop)
+            duplicate = next(
+                (
+                    path
+                    for other, path in kept
+                    if bin(signature ^ other).count("1") <= self.dedup_distance
+                ),
+                None,
+            )
+            if duplicate is not None:
+                self.duplicates += 1
+                paths.append(duplicate)
+                continue
+
+            digest = hashlib.blake2b(crop.tobytes(), digest_size=16)
+            digest.update(repr(crop.shape).encode())
+            name = digest.hexdigest()
+            path = os.path.join(self.directory, name[:2], f"{name}.{self.image_format}")
+
+            self._slots.acquire()
+            future = self._executor.submit(self._write, crop, path)
+            future.add_done_callback(lambda _: self._slots.release())
+            kept.append((signature, path))
+            paths.append(path)
+        return paths
+
+    def _write(self, crop: np.ndarray, path: str):
+        """Codifica y escribe un recorte (hilo del pool)"""
+        try:
+            if os.path.exists(path):
+                return  # Mismo contenido ya escrito
+            ok, buffer = cv2.imencode(f".{self.image_format}", crop, self.params)
+            if not ok:
+                raise ValueError("cv2.imencode falló")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as file:
+                file.write(buffer.tobytes())
+            os.replace(temp_path, path)
+            with self._lock:
+                self.written += 1
+                self.bytes_written += len(buffer)
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            logger.warning(f"⚠️ No se pudo guardar el recorte {path}: {e}")
+
+    def close(self, wait: bool = True):
+        """Espera las escrituras pendientes y libera los hilos"""
+        self._executor.shutdown(wait=wait)
+
+    def get_stats(self) -> dict:
+        """Retorna estadísticas de escritura"""
+        return {
+            "written": self.written,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "bytes_written": self.bytes_written,
+        }
+
+
+def crop_region(frame: np.ndarray, bbox) -> Optional[np.ndarray]:
+    """Copia de la región (x, y, w, h) de un frame (None si queda fuera)"""
+    x, y, w, h = (int(v) for v in bbox)
+    crop = frame[max(0, y) : y + h, max(0, x) : x + w]
+    return crop.copy() if crop.size else None
+
+
+def remove_crops(paths) -> int:
+    """
+    Borra recortes ya escritos
+
+    Returns:
+        Número de archivos borrados
+    """
+    removed = 0
+    for path in paths:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"⚠️ No se pudo borrar el recorte {path}: {e}")
+    return removed
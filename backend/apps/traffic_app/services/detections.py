@@ -0,0 +1,149 @@
+"""
+Detections Service
+Representación compacta de las detecciones de un frame como array
+estructurado de numpy; filtrado por clase, conversión xyxy → xywh e IoU
+vectorizados (sin objetos Python por caja)
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+
+# Una fila por detección
+DETECTION_DTYPE = np.dtype(
+    [
+        ("xyxy", np.float32, (4,)),  # Esquinas en coordenadas del frame
+        ("bbox", np.int32, (4,)),  # (x, y, w, h) en píxeles enteros
+        ("conf", np.float32),
+        ("cls", np.int16),  # Clase COCO
+    ]
+)
+
+
+def empty_detections() -> np.ndarray:
+    return np.empty(0, dtype=DETECTION_DTYPE)
+
+
+def from_raw(raw: Optional[np.ndarray], classes: Optional[Iterable[int]] = None) -> np.ndarray:
+    """
+    Convierte la salida del detector en un array de detecciones
+
+    Args:
+        raw: Array (N, 6) [x1, y1, x2, y2, conf, cls] (Detector.predict)
+        classes: Clases a conservar (None = todas)
+
+    Returns:
+        Array estructurado DETECTION_DTYPE de longitud <= N
+    """
+    if raw is None or len(raw) == 0:
+        return empty_detections()
+
+    raw = np.asarray(raw, dtype=np.float32)
+    if classes is not None:
+        raw = raw[np.isin(raw[:, 5].astype(np.int16), np.fromiter(classes, dtype=np.int16))]
+
+    detections = np.empty(len(raw), dtype=DETECTION_DTYPE)
+    detections["xyxy"] = raw[:, :4]
+    corners = raw[:, :4].astype(np.int32)
+    detections["bbox"][:, :2] = corners[:, :2]
+    detections["bbox"][:, 2:] = corners[:, 2:] - corners[:, :2]
+    detections["conf"] = raw[:, 4]
+    detections["cls"] = raw[:, 5]
+    return detections
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """
+    IoU entre todos los pares de cajas (x, y, w, h)
+
+    Args:
+        boxes_a: Array (N, 4)
+        boxes_b: Array (M, 4)
+
+    Returns:
+        Matriz (N, M) de IoU
+    """
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+
+    a_x2, a_y2 = a[:, 0] + a[:, 2], a[:, 1] + a[:, 3]
+    b_x2, b_y2 = b[:, 0] + b[:, 2], b[:, 1] + b[:, 3]
+
+    inter_w = np.minimum(a_x2[:, None], b_x2[None]) - np.maximum(a[:, 0, None], b[None, :, 0])
+    inter_h = np.minimum(a_y2[:, None], b_y2[None]) - np.maximum(a[:, 1, None], b[None, :, 1])
+    inter = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+
+    union = (a[:, 2] * a[:, 3])[:, None] + (b[:, 2] * b[:, 3])[None] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def match_iou(
+    ious: np.ndarray, iou_threshold: float
+) -> Tuple[List[Tuple[int, int]], List[int], List[int]]:
+    """
+    Asignación óptima (Hungarian) detección → track sobre una matriz IoU
+
+    Maximiza el IoU total entre los pares con IoU >= `iou_threshold`
+    (el resto no puede asignarse).
+
+    Args:
+        ious: Matriz (detecciones, tracks)
+        iou_threshold: IoU mínimo para aceptar un par
+
+    Returns:
+        (matches [(det_idx, track_idx)], detecciones sin track, tracks sin detección)
+    """
+    num_detections, num_tracks = ious.shape
+    matches = []
+    if num_detections and num_tracks:
+        # Pares bajo el umbral nunca deben ganar a dejar ambos sin asignar
+        gated = np.where(ious >= iou_threshold, ious, 0.0)
+        rows, cols = linear_sum_assignment(gated, maximize=True)
+        matches = [(int(r), int(c)) for r, c in zip(rows, cols) if gated[r, c] > 0]
+
+    matched_detections = {d for d, _ in matches}
+    matched_tracks = {t for _, t in matches}
+    return (
+        matches,
+        [d for d in range(num_detections) if d not in matched_detections],
+        [t for t in range(num_tracks) if t not in matched_tracks],
+    )
+
+
+def to_dicts(
+    detections: np.ndarray,
+    class_names: Dict[int, str],
+    track_ids: Optional[Iterable] = None,
+) -> List[Dict]:
+    """
+    Detecciones en formato JSON para WebSocket/API
+
+    Se llama sólo cuando el resultado se emite, no por cada frame procesado.
+
+    Returns:
+        [{vehicle_type, bbox, confidence, x1, y1, x2, y2[, track_id]}]
+    """
+    bboxes = detections["bbox"].tolist()
+    confs = detections["conf"].tolist()
+    classes = detections["cls"].tolist()
+    track_ids = list(track_ids) if track_ids is not None else [None] * len(detections)
+
+    items = []
+    for (x, y, w, h), conf, cls, track_id in zip(bboxes, confs, classes, track_ids):
+        item = {
+            "vehicle_type": class_names.get(cls, "unknown"),
+            "bbox": [x, y, w, h],
+            "confidence": conf,
+            "x1": x,
+            "y1": y,
+            "x2": x + w,
+            "y2": y + h,
+        }
+        if track_id is not None:
+            item["track_id"] = track_id
+        items.append(item)
+    return items
@@ -0,0 +1,304 @@
+"""
+Detector Backends Service
+Backends intercambiables para la detección de vehículos
+- torch: ultralytics/PyTorch (GPU o CPU)
+- onnx: modelo exportado a ONNX una sola vez y ejecutado con ONNX Runtime
+  (mucho más rápido que PyTorch eager en workers sólo CPU)
+
+Todos los backends devuelven, por frame, un array (N, 6) float32 con
+columnas [x1, y1, x2, y2, conf, cls] en coordenadas del frame original.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from django.conf import settings
+
+from .model_registry import get_registry, resolve_device
+
+logger = logging.getLogger(__name__)
+
+
+BACKENDS = ("auto", "torch", "onnx")
+
+# Array vacío de detecciones (N=0)
+EMPTY_DETECTIONS = np.zeros((0, 6), dtype=np.float32)
+
+
+def letterbox(
+    frame: np.ndarray, size: int, color: int = 114
+) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """
+    Redimensiona manteniendo la relación de aspecto y rellena a size x size
+
+    Returns:
+        (imagen, escala, (pad_x, pad_y))
+    """
+    h, w = frame.shape[:2]
+    ratio = min(size / h, size / w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+
+    canvas = np.full((size, size, 3), color, dtype=np.uint8)
+    pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+    canvas[pad_y : pad_y + new_h, pad_x : pad_x + new_w] = cv2.resize(
+        frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR
+    )
+    return canvas, ratio, (pad_x, pad_y)
+
+
+class OnnxModel:
+    """
+    Modelo YOLO exportado a ONNX ejecutado con ONNX Runtime
+
+    El .onnx se exporta una vez por archivo de pesos, con ejes dinámicos
+    (sirve para cualquier imgsz), y se guarda junto a los pesos
+    (<pesos>.onnx). Las exportaciones concurrentes se serializan con un
+    lock de archivo por pesos y el .onnx aparece con un rename atómico.
+    """
+
+    MAX_DETECTIONS = 300
+
+    def __init__(self, onnx_path: str, device: str = "cpu"):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = getattr(settings, "ONNX_INTRA_OP_THREADS", 0)
+        options.inter_op_num_threads = getattr(settings, "ONNX_INTER_OP_THREADS", 1)
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        providers = ["CPUExecutionProvider"]
+        if device.startswith("cuda") and "CUDAExecutionProvider" in ort.get_available_providers():
+            providers.insert(0, "CUDAExecutionProvider")
+
+        self.onnx_path = onnx_path
+        self.session = ort.InferenceSession(onnx_path, sess_options=options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+
+    @classmethod
+    def export(cls, weights_path: str) -> str:
+        """
+        Exporta los pesos a ONNX si no existe el artefacto en caché
+
+        Returns:
+            Ruta al .onnx
+        """
+        weights = Path(weights_path)
+        onnx_path = weights.with_suffix(".onnx")
+
+        if onnx_path.exists() and onnx_path.stat().st_mtime >= weights.stat().st_mtime:
+            return str(onnx_path)
+
+        from filelock import FileLock
+        from ultralytics import YOLO
+
+        with FileLock(str(onnx_path) + ".lock"):
+            # Otro proceso pudo exportarlo mientras esperábamos el lock
+            if onnx_path.exists() and onnx_path.stat().st_mtime >= weights.stat().st_mtime:
+                return str(onnx_path)
+
+            logger.info(f"📦 Exportando {weights.name} a ONNX (ejes dinámicos)...")
+            # YOLO.export escribe <stem>.onnx junto a los pesos que carga: se
+            # exporta una copia en un directorio temporal y se publica con rename
+            with tempfile.TemporaryDirectory(dir=weights.parent, prefix=".onnx-export-") as tmp:
+                copy = shutil.copy2(weights, os.path.join(tmp, weights.name))
+                exported = YOLO(copy).export(format="onnx", dynamic=True, simplify=True)
+                os.replace(exported, onnx_path)
+
+        return str(onnx_path)
+
+    @classmethod
+    def load(cls, weights_path: str, device: str = "cpu") -> "OnnxModel":
+        """Exporta (si hace falta) y abre una sesión de ONNX Runtime"""
+        return cls(cls.export(weights_path), device)
+
+    @property
+    def size_bytes(self) -> int:
+        return os.path.getsize(self.onnx_path)
+
+    def predict(
+        self,
+        frames: List[np.ndarray],
+        imgsz: int = 640,
+        conf: float = 0.25,
+        iou: float = 0.45,
+        classes: Optional[Iterable[int]] = None,
+        **kwargs,
+    ) -> List[np.ndarray]:
+        """
+        Detecta objetos en un lote de frames
+
+        Args:
+            frames: Frames BGR
+            imgsz: Lado del letterbox (múltiplo de 32)
+            conf: Umbral de confianza
+            iou: Umbral IoU para NMS
+            classes: Clases a conservar (None = todas)
+
+        Returns:
+            Lista de arrays (N, 6) [x1, y1, x2, y2, conf, cls], uno por frame
+        """
+        if not frames:
+            return []
+
+        boxed = [letterbox(frame, imgsz) for frame in frames]
+        batch = np.stack([img for img, _, _ in boxed])
+        batch = np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32)
+        batch /= 255.0
+
+        # Salida YOLOv8: (B, 4 + num_clases, anchors)
+        output = self.session.run(None, {self.input_name: batch})[0]
+
+        class_filter = np.array(list(classes)) if classes is not None else None
+        return [
+            self._postprocess(pred.T, frame.shape, ratio, pad, conf, iou, class_filter)
+            for pred, frame, (_, ratio, pad) in zip(output, frames, boxed)
+        ]
+
+    def _postprocess(self, pred, frame_shape, ratio, pad, conf, iou, class_filter) -> np.ndarray:
+        """Filtra por confianza/clase, aplica NMS y deshace el letterbox"""
+        scores = pred[:, 4:]
+        cls = scores.argmax(axis=1)
+        confidence = scores[np.arange(len(scores)), cls]
+
+        keep = confidence >= conf
+        if class_filter is not None:
+            keep &= np.isin(cls, class_filter)
+        if not keep.any():
+            return EMPTY_DETECTIONS
+
+        cx, cy, w, h = pred[keep, :4].T
+        cls, confidence = cls[keep], confidence[keep]
+        xywh = np.stack([cx - w / 2, cy - h / 2, w, h], axis=1)
+
+        # NMS por clase
+        indices = cv2.dnn.NMSBoxesBatched(
+            xywh.tolist(), confidence.tolist(), cls.tolist(), conf, iou
+        )
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)[: self.MAX_DETECTIONS]
+        if indices.size == 0:
+            return EMPTY_DETECTIONS
+
+        boxes = xywh[indices].copy()
+        boxes[:, 2:] += boxes[:, :2]  # xywh → xyxy
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / ratio
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / ratio
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, frame_shape[1])
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, frame_shape[0])
+
+        return np.column_stack([boxes, confidence[indices], cls[indices]]).astype(np.float32)
+
+
+class Detector:
+    """
+    Detector de objetos con backend intercambiable
+
+    Envuelve un modelo del registro (YOLO o OnnxModel) con los parámetros
+    de inferencia; predict(frames) devuelve arrays (N, 6) por frame.
+    """
+
+    def __init__(
+        self,
+        model,
+        backend: str,
+        device: str,
+        imgsz: int = 640,
+        conf: float = 0.5,
+        iou: float = 0.45,
+        classes: Optional[Iterable[int]] = None,
+        half: bool = False,
+    ):
+        self.model = model
+        self.backend = backend
+        self.device = device
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        self.classes = list(classes) if classes is not None else None
+        self.half = half
+
+    def predict(self, frames: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        Args:
+            frames: Frames BGR
+
+        Returns:
+            Lista de arrays (N, 6) [x1, y1, x2, y2, conf, cls], uno por frame
+        """
+        if self.backend == "onnx":
+            return self.model.predict(
+                frames, imgsz=self.imgsz, conf=self.conf, iou=self.iou, classes=self.classes
+            )
+
+        results = self.model.predict(
+            frames,
+            conf=self.conf,
+            iou=self.iou,
+            classes=self.classes,
+            imgsz=self.imgsz,
+            device=self.device,
+            half=self.half,
+            verbose=False,
+        )
+        return [
+            r.boxes.data.cpu().numpy() if r.boxes is not None else EMPTY_DETECTIONS
+            for r in results
+        ]
+
+
+def create_detector(
+    weights_path=None,
+    device: str = "auto",
+    imgsz: int = 640,
+    precision: str = "fp32",
+    backend: Optional[str] = None,
+    conf: float = 0.5,
+    iou: float = 0.45,
+    classes: Optional[Iterable[int]] = None,
+) -> Detector:
+    """
+    Crea un detector usando el modelo en caché del proceso
+
+    Args:
+        weights_path: Ruta a los pesos .pt (None = settings.YOLO_MODEL_PATH)
+        device: 'auto', 'cuda' o 'cpu'
+        imgsz: Tamaño de entrada
+        precision: 'fp32' o 'fp16'
+        backend: 'auto', 'torch' u 'onnx' (None = settings.YOLO_BACKEND).
+            'auto' usa ONNX Runtime en CPU y PyTorch en GPU.
+        conf: Umbral de confianza
+        iou: Umbral IoU para NMS
+        classes: Clases COCO a conservar
+
+    Returns:
+        Detector listo; si ONNX no está disponible o falla la exportación
+        se usa PyTorch automáticamente
+    """
+    if weights_path is None:
+        weights_path = getattr(settings, "YOLO_MODEL_PATH", "yolov8n.pt")
+    if backend is None:
+        backend = getattr(settings, "YOLO_BACKEND", "auto")
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de detección no soportado: {backend}")
+
+    device = resolve_device(device)
+    if backend == "auto":
+        backend = "onnx" if device == "cpu" else "torch"
+
+    registry = get_registry()
+
+    if backend == "onnx":
+        try:
+            model = registry.get(weights_path, device=device, imgsz=imgsz, backend="onnx")
+            return Detector(model, "onnx", device, imgsz, conf, iou, classes)
+        except Exception as e:
+            logger.warning(f"⚠️ Backend ONNX no disponible ({e}), usando PyTorch")
+
+    model = registry.get(weights_path, device=device, imgsz=imgsz, precision=precision)
+    half = precision == "fp16" and device != "cpu"
+    return Detector(model, "torch", device, imgsz, conf, iou, classes, half)
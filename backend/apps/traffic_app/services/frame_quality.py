@@ -0,0 +1,164 @@
+"""
+Frame Quality Service
+Nitidez y brillo de las regiones de un frame con una sola pasada
+- Escala de grises y Laplaciano una vez por frame, reducidos a `scale` y
+  limitados a la región que cubre las cajas candidatas
+- Imágenes integrales de gris, Laplaciano y Laplaciano²: la media y la
+  varianza de cualquier caja salen de 4 lecturas, vectorizado por lote
+- Se construye al primer uso: los frames sin candidatos no pagan nada
+- Con pocas cajas dispersas (shared_region = None) conviene un mapa por
+  caja: el costo es proporcional a los píxeles analizados
+- crop_quality: el mismo puntaje para un recorte suelto (frames guardados)
+"""
+
+from typing import Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Varianza del Laplaciano (en la imagen reducida) con nitidez 1.0
+SHARPNESS_NORM = 500.0
+
+# Pesos del score de calidad (nitidez, brillo, tamaño)
+SHARPNESS_WEIGHT = 0.5
+BRIGHTNESS_WEIGHT = 0.3
+SIZE_WEIGHT = 0.2
+
+
+def size_score(w: int, h: int) -> float:
+    """Score de tamaño (vehículos más grandes = mejor para OCR, 50k píxeles = 1.0)"""
+    return min(w * h / 50000.0, 1.0)
+
+
+def quality_score(sharpness: float, brightness: float, w: int, h: int) -> float:
+    """Calidad (0-1) de la caja de un vehículo para OCR de placas"""
+    return (
+        float(sharpness) * SHARPNESS_WEIGHT
+        + float(brightness) * BRIGHTNESS_WEIGHT
+        + size_score(w, h) * SIZE_WEIGHT
+    )
+
+
+def union_rect(bboxes: Sequence[Sequence[int]]) -> Optional[Tuple[int, int, int, int]]:
+    """Rectángulo (x0, y0, x1, y1) que cubre cajas (x, y, w, h) (None si no hay)"""
+    if not len(bboxes):
+        return None
+    boxes = np.asarray(bboxes, dtype=np.int64).reshape(-1, 4)
+    return (
+        int(boxes[:, 0].min()),
+        int(boxes[:, 1].min()),
+        int((boxes[:, 0] + boxes[:, 2]).max()),
+        int((boxes[:, 1] + boxes[:, 3]).max()),
+    )
+
+
+def shared_region(bboxes: Sequence[Sequence[int]]) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Región para un mapa compartido por las cajas, o None si la suma de sus
+    áreas no llega al área que las cubre (cajas dispersas: un mapa por caja
+    analiza menos píxeles)
+    """
+    region = union_rect(bboxes)
+    if region is None:
+        return None
+    boxes = np.asarray(bboxes, dtype=np.int64).reshape(-1, 4)
+    covered = int((boxes[:, 2] * boxes[:, 3]).sum())
+    return region if covered >= (region[2] - region[0]) * (region[3] - region[1]) else None
+
+
+class FrameQualityMap:
+    """Puntajes de nitidez y brillo de cajas de un mismo frame"""
+
+    __slots__ = ("frame", "scale", "origin", "_sums")
+
+    def __init__(
+        self,
+        frame: np.ndarray,
+        scale: float = 0.5,
+        region: Optional[Tuple[int, int, int, int]] = None,
+    ):
+        """
+        Args:
+            frame: Frame BGR (o gris)
+            scale: Factor de reducción antes del Laplaciano (1.0 = resolución completa)
+            region: Rectángulo (x0, y0, x1, y1) a analizar (None = frame completo);
+                las cajas fuera de él se recortan
+        """
+        height, width = frame.shape[:2]
+        x0, y0, x1, y1 = region if region is not None else (0, 0, width, height)
+        x0, y0 = max(0, x0), max(0, y0)
+        self.frame = frame[y0 : max(y0, min(y1, height)), x0 : max(x0, min(x1, width))]
+        self.scale = min(float(scale), 1.0)
+        self.origin = (x0, y0)
+        self._sums = None
+
+    def _build(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        image = self.frame
+        if not image.size:
+            empty = np.zeros((1, 1))
+            self._sums = (empty, empty, empty)
+            return self._sums
+        if self.scale < 1.0:
+            # Reducir antes de convertir: menos píxeles en todas las pasadas
+            image = cv2.resize(
+                image,
+                (max(1, round(image.shape[1] * self.scale)), max(1, round(image.shape[0] * self.scale))),
+                interpolation=cv2.INTER_AREA,
+            )
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        laplacian = cv2.Laplacian(gray, cv2.CV_32F)
+        # int32 alcanza para el gris de un frame 4K; el Laplaciano² en float64
+        gray_sum = cv2.integral(gray)
+        laplacian_sum, laplacian_sqsum = cv2.integral2(
+            laplacian, sdepth=cv2.CV_32F, sqdepth=cv2.CV_64F
+        )
+        self._sums = (gray_sum, laplacian_sum, laplacian_sqsum)
+        self.frame = None  # Ya no se necesita
+        return self._sums
+
+    def measure(self, bboxes) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Nitidez y brillo de cada caja
+
+        Args:
+            bboxes: Array (N, 4) de cajas (x, y, w, h) en píxeles del frame
+
+        Returns:
+            (sharpness, brightness): Arrays (N,) en [0, 1]; 0 para cajas
+            fuera de la región. El brillo es óptimo en 127.
+        """
+        sums = self._sums if self._sums is not None else self._build()
+        height, width = sums[0].shape[0] - 1, sums[0].shape[1] - 1
+
+        bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        left = bboxes[:, 0] - self.origin[0]
+        top = bboxes[:, 1] - self.origin[1]
+        x0 = np.clip(np.floor(left * self.scale), 0, width).astype(np.intp)
+        y0 = np.clip(np.floor(top * self.scale), 0, height).astype(np.intp)
+        x1 = np.clip(np.ceil((left + bboxes[:, 2]) * self.scale), 0, width).astype(np.intp)
+        y1 = np.clip(np.ceil((top + bboxes[:, 3]) * self.scale), 0, height).astype(np.intp)
+
+        area = (x1 - x0) * (y1 - y0)
+        brightness, laplacian_mean, laplacian_sqmean = (
+            (
+                table[y1, x1].astype(np.float64) - table[y0, x1] - table[y1, x0] + table[y0, x0]
+            ) / np.maximum(area, 1)
+            for table in sums
+        )
+        variance = np.maximum(laplacian_sqmean - laplacian_mean**2, 0.0)
+
+        sharpness = np.minimum(variance / SHARPNESS_NORM, 1.0)
+        brightness = 1.0 - np.abs(brightness - 127.0) / 127.0
+        empty = area == 0
+        sharpness[empty] = 0.0
+        brightness[empty] = 0.0
+        return sharpness, brightness
+
+
+def crop_quality(crop: np.ndarray, scale: float = 0.5) -> float:
+    """Calidad (0-1) del recorte de un vehículo (0.0 si está vacío)"""
+    if crop is None or crop.size == 0:
+        return 0.0
+    height, width = crop.shape[:2]
+    sharpness, brightness = FrameQualityMap(crop, scale).measure([(0, 0, width, height)])
+    return quality_score(sharpness[0], brightness[0], width, height)
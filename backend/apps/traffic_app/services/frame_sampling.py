@@ -0,0 +1,108 @@
+"""
+Frame Sampling Service
+Lectura de frames con salto sin decodificar los frames descartados
+- grab: avanza con cap.grab() (demux sin convertir a imagen) y sólo decodifica los conservados
+- seek: salta directamente al siguiente frame conservado (strides grandes)
+"""
+
+from typing import Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+SAMPLING_MODES = ("auto", "grab", "seek")
+
+
+def iter_frames(
+    cap: cv2.VideoCapture,
+    stride: int = 1,
+    mode: str = "auto",
+    seek_min_stride: int = 30,
+    start_frame: int = 1,
+    end_frame: Optional[int] = None,
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Lee frames de un VideoCapture conservando 1 de cada `stride`
+
+    Los frames descartados no se decodifican a imagen:
+    - 'grab': usa cap.grab() para cada frame descartado
+    - 'seek': posiciona el video en el siguiente frame conservado
+      (CAP_PROP_POS_FRAMES); si la fuente no permite seek (streams)
+      se continúa con 'grab'
+    - 'auto': 'seek' si stride >= seek_min_stride, si no 'grab'
+
+    Los frames conservados son siempre múltiplos de `stride` en la
+    numeración global del video, también al leer sólo un rango
+    (start_frame/end_frame), de modo que segmentos solapados muestrean
+    exactamente los mismos frames.
+
+    Args:
+        cap: Video abierto con OpenCV
+        stride: Procesar 1 de cada N frames (numeración desde 1)
+        mode: 'auto', 'grab' o 'seek'
+        seek_min_stride: Stride mínimo para usar seek en modo 'auto'
+        start_frame: Primer frame del rango a leer (desde 1)
+        end_frame: Último frame del rango a leer (None = hasta el final)
+
+    Yields:
+        (frame_number, frame)
+    """
+    if mode not in SAMPLING_MODES:
+        raise ValueError(f"Modo de muestreo no soportado: {mode}")
+
+    stride = max(1, int(stride))
+    use_seek = mode == "seek" or (mode == "auto" and stride >= seek_min_stride)
+
+    frame_number = 0  # Número (desde 1) del último frame consumido
+
+    # Posicionar al inicio del rango
+    if start_frame > 1:
+        frame_number, _ = skip_to(cap, 0, start_frame, True)
+        if frame_number is None:
+            return
+
+    while True:
+        next_kept = (frame_number // stride + 1) * stride
+        if end_frame is not None and next_kept > end_frame:
+            return
+
+        frame_number, use_seek = skip_to(cap, frame_number, next_kept, use_seek)
+        if frame_number is None:
+            return
+
+        ret, frame = cap.read()
+        if not ret:
+            return
+
+        frame_number += 1
+        yield frame_number, frame
+
+
+def skip_to(
+    cap: cv2.VideoCapture, frame_number: int, target: int, use_seek: bool
+) -> Tuple[Optional[int], bool]:
+    """
+    Avanza sin decodificar hasta el frame anterior a `target`
+
+    Args:
+        cap: Video abierto
+        frame_number: Último frame consumido (desde 1)
+        target: Próximo frame a leer con cap.read()
+        use_seek: Saltar con CAP_PROP_POS_FRAMES (un seek por frame útil)
+
+    Returns:
+        (frame_number, use_seek); frame_number es None si el video terminó.
+        use_seek pasa a False si la fuente no permite seek.
+    """
+    if use_seek and target - frame_number > 1:
+        if cap.set(cv2.CAP_PROP_POS_FRAMES, target - 1):
+            return target - 1, use_seek
+        use_seek = False
+
+    while frame_number < target - 1:
+        if not cap.grab():
+            return None, use_seek
+        frame_number += 1
+
+    return frame_number, use_seek
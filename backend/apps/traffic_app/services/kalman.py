@@ -0,0 +1,128 @@
+"""
+Kalman Motion Service
+Filtro de Kalman de velocidad constante para las cajas de los tracks
+(modelo de SORT), vectorizado con numpy sobre todos los tracks a la vez
+
+Estado por track: [cx, cy, s, r, vx, vy, vs]
+- (cx, cy): centro de la caja, s: área, r: relación ancho/alto (constante)
+- velocidades en píxeles (o píxeles²) por frame del video
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+
+STATE_DIM = 7
+MEASUREMENT_DIM = 4
+
+
+def boxes_to_measurements(boxes: np.ndarray) -> np.ndarray:
+    """Cajas (N, 4) (x, y, w, h) → mediciones (N, 4) [cx, cy, s, r]"""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    w = np.maximum(boxes[:, 2], 1.0)
+    h = np.maximum(boxes[:, 3], 1.0)
+    return np.stack(
+        [boxes[:, 0] + w / 2, boxes[:, 1] + h / 2, w * h, w / h], axis=1
+    )
+
+
+def states_to_boxes(states: np.ndarray) -> np.ndarray:
+    """Estados (N, 7) → cajas (N, 4) (x, y, w, h)"""
+    area = np.maximum(states[:, 2], 1.0)
+    ratio = np.maximum(states[:, 3], 1e-3)
+    w = np.sqrt(area * ratio)
+    h = area / w
+    return np.stack([states[:, 0] - w / 2, states[:, 1] - h / 2, w, h], axis=1)
+
+
+class ConstantVelocityKalman:
+    """
+    Predicción/corrección en lote de N filtros independientes
+
+    Equivale a un filterpy.kalman.KalmanFilter(dim_x=7, dim_z=4) por track
+    con las matrices de SORT, pero opera sobre arrays (N, 7) y (N, 7, 7)
+    en lugar de un objeto por vehículo. El paso de predicción admite un
+    intervalo `dt` en frames del video, de modo que saltar frames (stride
+    fijo o adaptativo) no deja a los vehículos rápidos atrás de su caja.
+    """
+
+    def __init__(
+        self,
+        measurement_noise: Tuple[float, ...] = (1.0, 1.0, 10.0, 10.0),
+        process_noise: Tuple[float, ...] = (1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 1e-4),
+        initial_velocity_variance: float = 1e4,
+    ):
+        """
+        Args:
+            measurement_noise: Varianzas de [cx, cy, s, r] medidas
+            process_noise: Varianzas del ruido de proceso por frame
+            initial_velocity_variance: Incertidumbre inicial de las velocidades
+        """
+        self.R = np.diag(measurement_noise).astype(np.float64)
+        self.Q = np.diag(process_noise).astype(np.float64)
+        self.P0 = np.diag([10.0] * MEASUREMENT_DIM + [initial_velocity_variance] * 3)
+        self.H = np.eye(MEASUREMENT_DIM, STATE_DIM)
+
+    @staticmethod
+    def transition(dt: float) -> np.ndarray:
+        """Matriz de transición para `dt` frames"""
+        F = np.eye(STATE_DIM)
+        F[0, 4] = F[1, 5] = F[2, 6] = dt
+        return F
+
+    def initiate(self, boxes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Estados iniciales (velocidad cero) para cajas nuevas
+
+        Returns:
+            (states (N, 7), covariances (N, 7, 7))
+        """
+        measurements = boxes_to_measurements(boxes)
+        states = np.zeros((len(measurements), STATE_DIM))
+        states[:, :MEASUREMENT_DIM] = measurements
+        covariances = np.repeat(self.P0[None], len(measurements), axis=0)
+        return states, covariances
+
+    def predict(
+        self, states: np.ndarray, covariances: np.ndarray, dt: float = 1.0
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Avanza todos los filtros `dt` frames
+
+        Returns:
+            (states, covariances) predichos (arrays nuevos)
+        """
+        if len(states) == 0:
+            return states, covariances
+
+        states = states.copy()
+        # El área no puede hacerse negativa
+        shrinking = states[:, 2] + dt * states[:, 6] <= 0
+        states[shrinking, 6] = 0.0
+
+        F = self.transition(dt)
+        states = states @ F.T
+        covariances = F @ covariances @ F.T + self.Q * dt
+        return states, covariances
+
+    def update(
+        self, states: np.ndarray, covariances: np.ndarray, boxes: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Corrige los filtros con las cajas detectadas (una por filtro)
+
+        Returns:
+            (states, covariances) corregidos
+        """
+        if len(states) == 0:
+            return states, covariances
+
+        H = self.H
+        innovation = boxes_to_measurements(boxes) - states @ H.T
+        S = H @ covariances @ H.T + self.R
+        gain = covariances @ H.T @ np.linalg.inv(S)  # (N, 7, 4)
+
+        states = states + np.einsum("nij,nj->ni", gain, innovation)
+        covariances = (np.eye(STATE_DIM) - gain @ H) @ covariances
+        return states, covariances
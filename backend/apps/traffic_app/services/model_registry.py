@@ -0,0 +1,254 @@
+"""
+Model Registry Service
+Caché de modelos YOLO por proceso worker (PyTorch u ONNX Runtime)
+Cada modelo se carga y calienta una sola vez; los modelos inactivos se
+liberan bajo un presupuesto de memoria
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import torch
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+PRECISIONS = ("fp32", "fp16")
+MODEL_BACKENDS = ("torch", "onnx")
+
+
+def resolve_device(device: str = "auto") -> str:
+    """
+    Normaliza el device de inferencia
+
+    Args:
+        device: 'auto', 'cuda', 'cuda:N' o 'cpu'
+
+    Returns:
+        'cuda:0' / 'cuda:N' o 'cpu'
+    """
+    if device == "auto":
+        return "cuda:0" if torch.cuda.is_available() else "cpu"
+    if device == "cuda":
+        return "cuda:0"
+    return device
+
+
+class _RegistryEntry:
+    """Modelo cargado con su huella de memoria y último uso"""
+
+    def __init__(self, model, size_bytes: int, load_time: float):
+        self.model = model
+        self.size_bytes = size_bytes
+        self.load_time = load_time
+        self.last_used = time.monotonic()
+        self.hits = 0
+
+
+class ModelRegistry:
+    """
+    Registro de modelos YOLO cargados en el proceso
+
+    Clave: (ruta de pesos, device, precisión, backend). imgsz no forma
+    parte de la clave: YOLO.predict y el .onnx (ejes dinámicos) aceptan
+    cualquier tamaño por llamada, así que un modelo sirve a todos los
+    análisis; imgsz sólo fija el tamaño del calentamiento.
+
+    - get(): devuelve el modelo en caché o lo carga y calienta una vez
+    - Los modelos sin uso durante `idle_seconds` se liberan
+    - Si cargar un modelo supera `memory_budget_mb`, se liberan primero
+      los modelos usados hace más tiempo (LRU)
+
+    Nota: una instancia de modelo no debe usarse desde dos hilos a la vez;
+    en workers Celery prefork cada proceso ejecuta una tarea a la vez.
+    """
+
+    def __init__(self, memory_budget_mb: float = 1024, idle_seconds: float = 1800):
+        """
+        Args:
+            memory_budget_mb: Memoria máxima estimada para modelos en caché
+            idle_seconds: Segundos sin uso tras los cuales un modelo se libera
+        """
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.idle_seconds = idle_seconds
+        self._entries: "OrderedDict[Tuple, _RegistryEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def make_key(
+        weights_path,
+        device: str = "auto",
+        precision: str = "fp32",
+        backend: str = "torch",
+    ) -> Tuple:
+        if precision not in PRECISIONS:
+            raise ValueError(f"Precisión no soportada: {precision}")
+        if backend not in MODEL_BACKENDS:
+            raise ValueError(f"Backend no soportado: {backend}")
+        device = resolve_device(device)
+        if device == "cpu" or backend == "onnx":
+            precision = "fp32"  # fp16 no aporta en CPU; el .onnx se exporta en fp32
+        return (str(weights_path), device, precision, backend)
+
+    def get(
+        self,
+        weights_path,
+        device: str = "auto",
+        imgsz: int = 640,
+        precision: str = "fp32",
+        backend: str = "torch",
+    ):
+        """
+        Obtiene un modelo listo para inferencia
+
+        Args:
+            weights_path: Ruta a los pesos (.pt)
+            device: 'auto', 'cuda' o 'cpu'
+            imgsz: Tamaño del calentamiento al cargar (no distingue modelos)
+            precision: 'fp32' o 'fp16' (fp16 sólo en GPU)
+            backend: 'torch' (YOLO) u 'onnx' (OnnxModel exportado y en caché en disco)
+
+        Returns:
+            Modelo YOLO u OnnxModel cargado y calentado
+        """
+        key = self.make_key(weights_path, device, precision, backend)
+
+        with self._lock:
+            self.evict_idle()
+
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._load(key, imgsz)
+                self._make_room(entry.size_bytes)
+                self._entries[key] = entry
+            else:
+                self._entries.move_to_end(key)
+
+            entry.last_used = time.monotonic()
+            entry.hits += 1
+            return entry.model
+
+    def _load(self, key: Tuple, imgsz: int) -> _RegistryEntry:
+        """Carga el modelo en el device y lo calienta con un frame vacío de imgsz"""
+        weights_path, device, precision, backend = key
+        start = time.perf_counter()
+        warmup_frame = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+
+        if backend == "onnx":
+            from .detector_backends import OnnxModel
+
+            model = OnnxModel.load(weights_path, device)
+            for _ in range(2):
+                model.predict([warmup_frame], imgsz=imgsz)
+            size_bytes = model.size_bytes
+        else:
+            from ultralytics import YOLO
+
+            model = YOLO(weights_path)
+            model.to(device)
+
+            # Calentar: la primera inferencia inicializa el predictor y los kernels
+            for _ in range(2):
+                model.predict(
+                    warmup_frame,
+                    imgsz=imgsz,
+                    device=device,
+                    half=precision == "fp16",
+                    verbose=False,
+                )
+            size_bytes = self._estimate_size(model, weights_path)
+
+        load_time = time.perf_counter() - start
+
+        logger.info(
+            f"✅ Modelo cargado y calentado: {os.path.basename(weights_path)} "
+            f"({backend}, {device}, imgsz={imgsz}, {precision}) en {load_time:.2f}s "
+            f"~{size_bytes / 1024**2:.1f}MB"
+        )
+        return _RegistryEntry(model, size_bytes, load_time)
+
+    @staticmethod
+    def _estimate_size(model, weights_path: str) -> int:
+        """Memoria aproximada del modelo (parámetros + buffers)"""
+        try:
+            module = model.model
+            return sum(
+                t.numel() * t.element_size()
+                for t in list(module.parameters()) + list(module.buffers())
+            )
+        except Exception:
+            return os.path.getsize(weights_path) if os.path.exists(weights_path) else 0
+
+    def _make_room(self, needed_bytes: int):
+        """Libera modelos LRU hasta que `needed_bytes` quepa en el presupuesto"""
+        while self._entries and self.memory_used + needed_bytes > self.memory_budget:
+            key, _ = self._entries.popitem(last=False)
+            logger.info(f"🧹 Modelo liberado por presupuesto de memoria: {key}")
+            self._release()
+
+    def evict_idle(self):
+        """Libera modelos sin uso durante más de `idle_seconds`"""
+        now = time.monotonic()
+        with self._lock:
+            for key in [
+                k for k, e in self._entries.items() if now - e.last_used > self.idle_seconds
+            ]:
+                del self._entries[key]
+                logger.info(f"🧹 Modelo inactivo liberado: {key}")
+                self._release()
+
+    @staticmethod
+    def _release():
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def clear(self):
+        """Libera todos los modelos"""
+        with self._lock:
+            self._entries.clear()
+            self._release()
+
+    @property
+    def memory_used(self) -> int:
+        return sum(e.size_bytes for e in self._entries.values())
+
+    def get_stats(self) -> Dict:
+        """Retorna estadísticas del registro"""
+        with self._lock:
+            return {
+                "models": len(self._entries),
+                "memory_used_mb": round(self.memory_used / 1024**2, 1),
+                "memory_budget_mb": round(self.memory_budget / 1024**2, 1),
+                "entries": [
+                    {
+                        "key": key,
+                        "hits": entry.hits,
+                        "load_time": round(entry.load_time, 3),
+                        "size_mb": round(entry.size_bytes / 1024**2, 1),
+                    }
+                    for key, entry in self._entries.items()
+                ],
+            }
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    """Registro de modelos del proceso actual (se crea en el primer uso)"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry(
+                memory_budget_mb=getattr(settings, "YOLO_MODEL_CACHE_MB", 1024),
+                idle_seconds=getattr(settings, "YOLO_MODEL_IDLE_SECONDS", 1800),
+            )
+        return _registry
+
@@ -0,0 +1,234 @@
+"""
+Video Pipeline Service
+Pipeline por etapas: decodificación → inferencia → tracking/emisión
+La decodificación y la lógica Python se solapan con el cómputo del modelo
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from .batch_inference import FrameBatcher
+
+
+# Marcador de fin de stream entre etapas
+_END = object()
+
+
+class StageStats:
+    """Estadísticas de una etapa del pipeline"""
+
+    def __init__(self, name: str, output_queue: Optional[queue.Queue] = None):
+        self.name = name
+        self.output_queue = output_queue
+        self.frames = 0
+        self.stall_time = 0.0  # Segundos bloqueados esperando a otra etapa
+        self.max_queue_depth = 0
+
+    def record_depth(self):
+        if self.output_queue is not None:
+            self.max_queue_depth = max(self.max_queue_depth, self.output_queue.qsize())
+
+    def as_dict(self) -> Dict:
+        data = {
+            "frames": self.frames,
+            "stall_time": round(self.stall_time, 3),
+        }
+        if self.output_queue is not None:
+            data["queue_depth"] = self.output_queue.qsize()
+            data["max_queue_depth"] = self.max_queue_depth
+        return data
+
+
+class VideoPipeline:
+    """
+    Pipeline de análisis con colas acotadas entre etapas
+
+    Etapas:
+    - decode: hilo que lee frames de `frame_source` → cola de frames
+    - infer: hilo que agrupa frames en lotes (FrameBatcher) → cola de resultados
+    - track: el hilo que itera el pipeline (tracking, WebSocket, base de datos)
+
+    Las colas acotadas aplican backpressure: si el modelo es más lento que
+    el decodificador, éste se bloquea en lugar de acumular frames en RAM.
+    """
+
+    def __init__(
+        self,
+        frame_source: Iterable[Tuple[int, np.ndarray]],
+        batcher: FrameBatcher,
+        postprocess: Optional[Callable[[Any], Any]] = None,
+        queue_size: int = 16,
+    ):
+        """
+        Args:
+            frame_source: Iterable de (frame_number, frame); se consume en el hilo decode
+            batcher: FrameBatcher con el modelo y los parámetros de predict()
+            postprocess: Función (frame_number, frame, result) → detecciones,
+                ejecutada en el hilo infer
+            queue_size: Capacidad de cada cola entre etapas
+        """
+        self.frame_source = frame_source
+        self.batcher = batcher
+        self.postprocess = postprocess
+
+        self._frame_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._result_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._threads = []
+
+        self.stages = {
+            "decode": StageStats("decode", self._frame_queue),
+            "infer": StageStats("infer", self._result_queue),
+            "track": StageStats("track"),
+        }
+
+    # ------------------------------------------------------------------
+    # Utilidades de colas
+    # ------------------------------------------------------------------
+
+    def _put(self, q: queue.Queue, item, stage: StageStats) -> bool:
+        """Encola respetando la señal de parada; acumula el tiempo bloqueado"""
+        start = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    stage.record_depth()
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            stage.stall_time += time.perf_counter() - start
+
+    def _fail(self, error: BaseException):
+        """Registra el primer error y detiene el pipeline"""
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    # ------------------------------------------------------------------
+    # Etapas
+    # ------------------------------------------------------------------
+
+    def _decode_worker(self):
+        stage = self.stages["decode"]
+        try:
+            for item in self.frame_source:
+                if not self._put(self._frame_queue, item, stage):
+                    return
+                stage.frames += 1
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._put(self._frame_queue, _END, stage)
+
+    def _emit(self, batch) -> bool:
+        stage = self.stages["infer"]
+        for frame_number, frame, result in batch:
+            if self.postprocess is not None:
+                result = self.postprocess(frame_number, frame, result)
+            if not self._put(self._result_queue, (frame_number, frame, result), stage):
+                return False
+            stage.frames += 1
+        return True
+
+    def _infer_worker(self):
+        stage = self.stages["infer"]
+        batcher = self.batcher
+        try:
+            while not self._stop.is_set():
+                # Esperar solo lo que le queda al lote actual (o indefinidamente si está vacío)
+                timeout = batcher.time_until_due()
+                if timeout is not None and timeout <= 0:
+                    if not self._emit(batcher.flush()):
+                        return
+                    continue
+
+                start = time.perf_counter()
+                try:
+                    item = self._frame_queue.get(timeout=0.1 if timeout is None else min(timeout, 0.1))
+                except queue.Empty:
+                    continue
+                finally:
+                    stage.stall_time += time.perf_counter() - start
+
+                if item is _END:
+                    self._emit(batcher.flush())
+                    return
+
+                frame_number, frame = item
+                if not self._emit(batcher.add(frame_number, frame)):
+                    return
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._put(self._result_queue, _END, stage)
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray, Any]]:
+        """
+        Inicia las etapas y entrega resultados en orden de frame
+
+        Yields:
+            (frame_number, frame, result) donde result es la salida de
+            `postprocess` (o el resultado YOLO si no hay postprocess)
+        """
+        self._threads = [
+            threading.Thread(target=self._decode_worker, name="pipeline-decode", daemon=True),
+            threading.Thread(target=self._infer_worker, name="pipeline-infer", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+        stage = self.stages["track"]
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = self._result_queue.get(timeout=0.1)
+                except queue.Empty:
+                    # Una etapa falló y no podrá entregar el marcador de fin
+                    if self._error is not None:
+                        break
+                    continue
+                finally:
+                    stage.stall_time += time.perf_counter() - start
+
+                if item is _END:
+                    break
+
+                stage.frames += 1
+                yield item
+        finally:
+            self.close()
+
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        """Detiene las etapas y espera a que terminen los hilos"""
+        self._stop.set()
+
+        # Vaciar colas para desbloquear productores
+        for q in (self._frame_queue, self._result_queue):
+            try:
+                while True:
+                    q.get_nowait()
+            except queue.Empty:
+                pass
+
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def get_stats(self) -> Dict:
+        """Profundidad de cola y tiempo bloqueado por etapa"""
+        return {name: stage.as_dict() for name, stage in self.stages.items()}
@@ -0,0 +1,145 @@
+"""
+Plate Quality Service
+Localización ligera de la placa en los recortes candidatos de un vehículo
+- Sin modelo: black-hat (caracteres oscuros sobre fondo claro) + gradiente
+  horizontal + cierre morfológico; la placa es el contorno con proporción
+  de placa en la parte inferior del vehículo
+- Puntaje de legibilidad de la región: nitidez, ancho en píxeles e
+  inclinación (minAreaRect)
+- Sólo se ejecuta sobre la muestra de mejores frames de cada vehículo
+  (unos pocos recortes), nunca sobre el video
+"""
+
+from typing import Dict, Iterable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Pesos del score de placa (nitidez, tamaño, inclinación)
+PLATE_SHARPNESS_WEIGHT = 0.5
+PLATE_SIZE_WEIGHT = 0.3
+PLATE_SKEW_WEIGHT = 0.2
+
+PLATE_ASPECT_RANGE = (2.0, 8.0)  # Ancho / alto de la franja de caracteres (incluye motos)
+PLATE_TARGET_WIDTH = 120  # Ancho de placa (px) con tamaño 1.0 para OCR
+PLATE_SHARPNESS_NORM = 800.0  # Varianza del Laplaciano con nitidez 1.0
+PLATE_MAX_SKEW = 30.0  # Grados de inclinación con score 0
+
+SEARCH_WIDTH = 320  # Ancho de trabajo del recorte (costo fijo por recorte)
+SEARCH_TOP = 0.35  # La placa se busca bajo esta fracción de la altura
+
+
+class PlateRegion:
+    """Región candidata a placa dentro de un recorte y su puntaje"""
+
+    __slots__ = ("bbox", "angle", "sharpness", "size", "skew", "score")
+
+    def __init__(self, bbox, angle, sharpness, size, skew):
+        self.bbox = bbox  # (x, y, w, h) en píxeles del recorte
+        self.angle = angle  # Grados respecto a la horizontal
+        self.sharpness = sharpness
+        self.size = size
+        self.skew = skew
+        self.score = (
+            sharpness * PLATE_SHARPNESS_WEIGHT
+            + size * PLATE_SIZE_WEIGHT
+            + skew * PLATE_SKEW_WEIGHT
+        )
+
+    def as_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _rect_angle(rect) -> Tuple[float, float, float]:
+    """(lado largo, lado corto, ángulo del lado largo en [-90, 90)) de un minAreaRect"""
+    (_, _), (w, h), angle = rect
+    if w < h:
+        w, h, angle = h, w, angle + 90.0
+    angle = (angle + 90.0) % 180.0 - 90.0
+    return w, h, angle
+
+
+def locate_plate(crop: np.ndarray) -> Optional[PlateRegion]:
+    """
+    Busca la placa más legible en el recorte de un vehículo
+
+    Args:
+        crop: Recorte BGR (o gris) del vehículo
+
+    Returns:
+        PlateRegion con mejor puntaje o None si no hay candidata
+    """
+    if crop is None or crop.size == 0:
+        return None
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    height, width = gray.shape
+    top = int(height * SEARCH_TOP)
+
+    ratio = SEARCH_WIDTH / width
+    search = gray[top:]
+    if ratio < 1.0:
+        search = cv2.resize(search, None, fx=ratio, fy=ratio, interpolation=cv2.INTER_AREA)
+    else:
+        ratio = 1.0
+    if search.shape[0] < 8 or search.shape[1] < 16:
+        return None
+
+    # Caracteres oscuros sobre fondo claro → bordes verticales densos
+    blackhat = cv2.morphologyEx(
+        search, cv2.MORPH_BLACKHAT, cv2.getStructuringElement(cv2.MORPH_RECT, (13, 5))
+    )
+    gradient = np.absolute(cv2.Sobel(blackhat, cv2.CV_32F, 1, 0, ksize=3))
+    gradient = cv2.normalize(gradient, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    gradient = cv2.GaussianBlur(gradient, (5, 5), 0)
+    gradient = cv2.morphologyEx(
+        gradient, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (17, 5))
+    )
+    _, mask = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    mask = cv2.dilate(cv2.erode(mask, None, iterations=1), None, iterations=1)
+
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    min_width = 0.08 * search.shape[1]
+
+    best = None
+    for contour in contours:
+        long_side, short_side, angle = _rect_angle(cv2.minAreaRect(contour))
+        if short_side < 4 or long_side < min_width:
+            continue
+        if not PLATE_ASPECT_RANGE[0] <= long_side / short_side <= PLATE_ASPECT_RANGE[1]:
+            continue
+
+        # Región en píxeles del recorte original
+        x, y, w, h = cv2.boundingRect(contour)
+        bbox = (
+            int(x / ratio),
+            int(y / ratio) + top,
+            max(1, int(round(w / ratio))),
+            max(1, int(round(h / ratio))),
+        )
+        region = gray[bbox[1] : bbox[1] + bbox[3], bbox[0] : bbox[0] + bbox[2]]
+        if region.size == 0:
+            continue
+
+        candidate = PlateRegion(
+            bbox,
+            float(angle),
+            sharpness=min(
+                float(cv2.Laplacian(region, cv2.CV_32F).var()) / PLATE_SHARPNESS_NORM, 1.0
+            ),
+            size=min(float(long_side) / ratio / PLATE_TARGET_WIDTH, 1.0),
+            skew=max(0.0, 1.0 - abs(angle) / PLATE_MAX_SKEW),
+        )
+        if best is None or candidate.score > best.score:
+            best = candidate
+    return best
+
+
+def best_frame_for_plate(frames: Iterable[Dict]) -> Optional[int]:
+    """
+    frameNumber del frame con mejor plateQuality (None si en ninguno se
+    localizó la placa)
+    """
+    best = max(frames, key=lambda frame: frame.get("plateQuality") or 0.0, default=None)
+    if best is None or not best.get("plateQuality"):
+        return None
+    return best["frameNumber"]
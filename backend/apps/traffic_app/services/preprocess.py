@@ -0,0 +1,218 @@
+"""
+Frame Preprocess Service
+Tamaño de inferencia por análisis y pre-escalado de frames en el decodificador
+- choose_imgsz: imgsz según resolución del video/cámara y presupuesto de latencia
+- FramePreprocessor: recorta la ROI y reduce cada frame una sola vez, en
+  buffers reutilizados, antes de encolarlo hacia la inferencia
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Iterable, Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .roi import RegionOfInterest, parse_resolution
+
+
+# Las redes YOLO trabajan con tamaños múltiplos de su stride máximo
+IMGSZ_STRIDE = 32
+
+
+def _round_up(value: float, multiple: int = IMGSZ_STRIDE) -> int:
+    return int(math.ceil(value / multiple) * multiple)
+
+
+def _round_down(value: float, multiple: int = IMGSZ_STRIDE) -> int:
+    return int(value // multiple * multiple)
+
+
+def choose_imgsz(
+    source_size: Tuple[int, int],
+    video_size: Optional[Tuple[int, int]] = None,
+    camera_resolution: Optional[str] = None,
+    reference_latency_ms: Optional[float] = None,
+    latency_budget_ms: Optional[float] = None,
+    min_imgsz: int = 320,
+    max_imgsz: int = 1280,
+) -> int:
+    """
+    Elige el tamaño de entrada del modelo para un análisis
+
+    - No se escala hacia arriba: imgsz <= lado mayor de la región analizada
+      (y, si la cámara tiene menos resolución que el video, el detalle
+      real de la cámara)
+    - La latencia por frame crece con imgsz²; con un presupuesto se
+      limita imgsz a 640 * sqrt(presupuesto / latencia de referencia a 640)
+
+    Args:
+        source_size: (width, height) de la región enviada al modelo (ROI o frame)
+        video_size: (width, height) del video (None = source_size)
+        camera_resolution: Campo `resolution` de la cámara ("1920x1080")
+        reference_latency_ms: Latencia medida/estimada por frame a imgsz=640
+        latency_budget_ms: Latencia objetivo por frame
+        min_imgsz: Tamaño mínimo
+        max_imgsz: Tamaño máximo
+
+    Returns:
+        imgsz múltiplo de 32 en [min_imgsz, max_imgsz]
+    """
+    detail = float(max(source_size))
+
+    # Video reescalado por encima de la resolución real de la cámara
+    camera_size = parse_resolution(camera_resolution)
+    video_long = max(video_size or source_size)
+    if camera_size and max(camera_size) < video_long:
+        detail *= max(camera_size) / float(video_long)
+
+    imgsz = min(_round_up(detail), max_imgsz)
+
+    if reference_latency_ms and latency_budget_ms:
+        by_budget = 640 * math.sqrt(latency_budget_ms / reference_latency_ms)
+        imgsz = min(imgsz, _round_down(by_budget))
+
+    return max(_round_up(min_imgsz), imgsz)
+
+
+class FramePreprocessor:
+    """
+    Recorte de ROI + reducción de cada frame en la etapa de decodificación
+
+    El frame reducido se escribe en un buffer de un pool circular
+    preasignado (sin reservar memoria por frame) y es lo único que viaja
+    por las colas del pipeline. to_frame() devuelve las cajas al sistema
+    de coordenadas del video original.
+
+    El pool debe ser mayor que el número de frames en vuelo (cola de
+    frames + lote + cola de resultados + los que usan decode y tracking);
+    pool_size_for() calcula ese tamaño.
+
+    Los recortes de vehículos se toman del frame decodificado, no del
+    reducido: con iter_prepared(keep_originals=True) cada frame original
+    queda disponible para pop_original(). Quien lo reclama debe hacerlo
+    cuanto antes (las tareas recortan las detecciones apenas sale de la
+    inferencia); nunca se guardan más originales que buffers del pool.
+    """
+
+    def __init__(
+        self,
+        frame_size: Tuple[int, int],
+        imgsz: int,
+        roi: Optional[RegionOfInterest] = None,
+        pool_size: int = 48,
+    ):
+        """
+        Args:
+            frame_size: (width, height) del video
+            imgsz: Lado mayor del frame que recibe el modelo
+            roi: Región de interés de la cámara (None = frame completo)
+            pool_size: Buffers reutilizados
+        """
+        self.roi = roi
+        self.x0, self.y0, x1, y1 = roi.rect if roi is not None else (0, 0, *frame_size)
+        width, height = x1 - self.x0, y1 - self.y0
+        self.region_size = (width, height)
+
+        self.scale = min(1.0, imgsz / float(max(width, height)))
+        self.output_size = (
+            max(1, int(round(width * self.scale))),
+            max(1, int(round(height * self.scale))),
+        )
+        self.passthrough = roi is None and self.scale == 1.0
+
+        self._pool = (
+            []
+            if self.passthrough
+            else [
+                np.empty((self.output_size[1], self.output_size[0], 3), dtype=np.uint8)
+                for _ in range(max(1, pool_size))
+            ]
+        )
+        self._next = 0
+
+        # Frames decodificados en vuelo (frame_number → frame), en orden y
+        # como máximo tantos como frames en vuelo (pool_size)
+        self.max_originals = max(1, pool_size)
+        self._originals = OrderedDict()
+        self._originals_lock = threading.Lock()
+
+    @staticmethod
+    def pool_size_for(queue_size: int, batch_size: int) -> int:
+        """Buffers necesarios para que ninguno se reutilice mientras está en vuelo"""
+        return 2 * queue_size + batch_size + 4
+
+    def prepare(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Recorta y reduce un frame (hilo de decodificación)
+
+        Returns:
+            Frame listo para el modelo (el mismo frame si no hay nada que hacer)
+        """
+        if self.passthrough:
+            return frame
+
+        region = self.roi.crop(frame) if self.roi is not None else frame
+        buffer = self._pool[self._next]
+        self._next = (self._next + 1) % len(self._pool)
+
+        if self.scale == 1.0:
+            np.copyto(buffer, region)
+        else:
+            cv2.resize(region, self.output_size, dst=buffer, interpolation=cv2.INTER_AREA)
+        return buffer
+
+    def iter_prepared(
+        self, frames: Iterable[Tuple[int, np.ndarray]], keep_originals: bool = False
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Aplica prepare() a un iterable (frame_number, frame)
+
+        Args:
+            frames: Frames decodificados (cada uno en su propio array)
+            keep_originals: Guardar el frame decodificado para pop_original()
+        """
+        for frame_number, frame in frames:
+            if keep_originals:
+                with self._originals_lock:
+                    self._originals[frame_number] = frame
+                    while len(self._originals) > self.max_originals:
+                        self._originals.popitem(last=False)
+            yield frame_number, self.prepare(frame)
+
+    def pop_original(self, frame_number: int) -> Optional[np.ndarray]:
+        """
+        Frame decodificado (resolución del video) de `frame_number`
+
+        Los frames se consumen en orden: también se descartan los
+        anteriores que nadie reclamó.
+
+        Returns:
+            Frame original o None si no se guardó
+        """
+        with self._originals_lock:
+            frame = self._originals.pop(frame_number, None)
+            while self._originals and next(iter(self._originals)) < frame_number:
+                self._originals.popitem(last=False)
+        return frame
+
+    def to_frame(self, raw: np.ndarray) -> np.ndarray:
+        """
+        Lleva detecciones del frame preparado al video original
+
+        Args:
+            raw: Array (N, 6) [x1, y1, x2, y2, conf, cls] sobre el frame preparado
+
+        Returns:
+            Array (N', 6) en coordenadas del video (sin las detecciones
+            cuyo centro cae fuera del polígono ROI)
+        """
+        if self.passthrough or len(raw) == 0:
+            return raw
+
+        raw = raw.copy()
+        raw[:, :4] /= self.scale
+        if self.roi is not None:
+            return self.roi.to_frame(raw)
+        return raw
@@ -0,0 +1,355 @@
+"""
+Cross-Camera Re-Identification Service
+Galería en memoria de features de apariencia de vehículos recientes por
+cámara, para enlazar avistamientos del mismo vehículo entre cámaras
+cercanas
+
+- Índice vectorial particionado por (cámara, tipo de vehículo): una
+  consulta es un producto matricial por cámara vecina
+- Cámaras vecinas: ubicaciones a menos de `max_distance_km`
+- Ventana de viaje: el avistamiento anterior terminó entre
+  distancia / velocidad máxima y `max_travel_seconds` antes
+- Memoria acotada: expiración por antigüedad y tope de entradas (heap por tiempo)
+- Los tiempos son instantes de grabación (Vehicle.reidFeature), no de
+  procesamiento: sólo se enlazan videos con hora de grabación conocida
+  (services.video_metadata)
+- Cada worker tiene su galería; la base de datos es la fuente compartida:
+  antes de cada consulta se agregan los vehículos que guardaron los demás
+  procesos desde la última sincronización
+"""
+
+import heapq
+import math
+import threading
+from datetime import timedelta
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from .appearance import FEATURE_DIM, FeatureIndex
+
+
+EARTH_RADIUS_KM = 6371.0
+
+
+class CrossCameraGallery:
+    """
+    Galería de vehículos recientes de todas las cámaras del proceso
+
+    Las claves son ids de Vehicle; la marca de tiempo de cada entrada es
+    el instante de grabación (epoch, segundos) de su última detección. La
+    antigüedad se mide contra la marca más reciente insertada.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 200_000,
+        retention_seconds: float = 3600,
+        max_distance_km: float = 5.0,
+        max_speed_kmh: float = 120.0,
+        max_travel_seconds: float = 1800,
+        similarity_threshold: float = 0.85,
+        dim: int = FEATURE_DIM,
+    ):
+        """
+        Args:
+            max_entries: Vehículos máximos en memoria (se descartan los más antiguos)
+            retention_seconds: Antigüedad máxima de una entrada
+            max_distance_km: Distancia máxima entre cámaras vecinas
+            max_speed_kmh: Velocidad máxima plausible (fija el viaje mínimo)
+            max_travel_seconds: Tiempo máximo de viaje entre cámaras
+            similarity_threshold: Similitud coseno mínima para enlazar
+            dim: Dimensión de las features
+        """
+        self.max_entries = max_entries
+        self.retention_seconds = retention_seconds
+        self.max_distance_km = max_distance_km
+        self.max_speed_kmh = max_speed_kmh
+        self.max_travel_seconds = max_travel_seconds
+        self.similarity_threshold = similarity_threshold
+
+        self._index = FeatureIndex(dim=dim, initial_capacity=1024)
+        self._stamps: Dict[Hashable, float] = {}
+        self._heap: List[Tuple[float, Hashable]] = []  # (timestamp, clave)
+        self._latest = 0.0  # Marca más reciente insertada
+
+        self._camera_ids: List[Hashable] = []
+        self._camera_coords = np.zeros((0, 2))  # (lat, lon) en radianes
+        self._neighbors: Dict[Hashable, List[Tuple[Hashable, float]]] = {}
+        self._lock = threading.RLock()
+
+        # Estadísticas
+        self.queries = 0
+        self.links = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._stamps
+
+    def register_camera(self, camera_id: Hashable, latitude: float, longitude: float):
+        """Registra (o mueve) una cámara; invalida la caché de vecinas"""
+        coords = np.radians([float(latitude), float(longitude)])
+        with self._lock:
+            if camera_id in self._camera_ids:
+                self._camera_coords[self._camera_ids.index(camera_id)] = coords
+            else:
+                self._camera_ids.append(camera_id)
+                self._camera_coords = np.vstack([self._camera_coords, coords])
+            self._neighbors.clear()
+
+    def neighbors(self, camera_id: Hashable) -> List[Tuple[Hashable, float]]:
+        """Cámaras a menos de max_distance_km: [(camera_id, distancia_km)]"""
+        with self._lock:
+            cached = self._neighbors.get(camera_id)
+            if cached is not None:
+                return cached
+            if camera_id not in self._camera_ids:
+                return []
+
+            # Haversine contra todas las cámaras registradas
+            lat, lon = self._camera_coords[self._camera_ids.index(camera_id)]
+            lats, lons = self._camera_coords[:, 0], self._camera_coords[:, 1]
+            a = (
+                np.sin((lats - lat) / 2) ** 2
+                + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+            )
+            distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+            result = [
+                (other, float(distance))
+                for other, distance in zip(self._camera_ids, distances.tolist())
+                if other != camera_id and distance <= self.max_distance_km
+            ]
+            self._neighbors[camera_id] = result
+            return result
+
+    def add(
+        self,
+        key: Hashable,
+        camera_id: Hashable,
+        vehicle_type: str,
+        feature: np.ndarray,
+        timestamp: float,
+    ):
+        """Inserta un vehículo terminado (timestamp = última detección)"""
+        with self._lock:
+            self._index.add(key, (camera_id, vehicle_type), feature, timestamp)
+            self._stamps[key] = timestamp
+            self._latest = max(self._latest, timestamp)
+            heapq.heappush(self._heap, (timestamp, key))
+            self.evict()
+
+    def evict(self, now: Optional[float] = None):
+        """Descarta entradas expiradas y las más antiguas por encima del tope"""
+        with self._lock:
+            if now is None:
+                now = self._latest
+            cutoff = now - self.retention_seconds
+            heap = self._heap
+            while heap and (heap[0][0] < cutoff or len(self._index) > self.max_entries):
+                timestamp, key = heapq.heappop(heap)
+                # Entradas reemplazadas dejan registros viejos en el heap
+                if self._stamps.get(key) == timestamp:
+                    del self._stamps[key]
+                    self._index.remove(key)
+                    self.evicted += 1
+
+    def query(
+        self,
+        camera_id: Hashable,
+        vehicle_type: str,
+        features: np.ndarray,
+        first_seen: np.ndarray,
+    ) -> List[Optional[Tuple[Hashable, float, float]]]:
+        """
+        Busca cada vehículo nuevo en las cámaras vecinas
+
+        Args:
+            camera_id: Cámara donde aparecen los vehículos
+            vehicle_type: Tipo de vehículo (sólo se compara con el mismo tipo)
+            features: Array (M, dim)
+            first_seen: Array (M,) timestamps de primera detección
+
+        Returns:
+            Por vehículo, (clave, similitud, segundos de viaje) o None
+        """
+        features = np.asarray(features, dtype=np.float32).reshape(-1, self._index.dim)
+        first_seen = np.asarray(first_seen, dtype=np.float64).reshape(-1)
+        best: List[Optional[Tuple[Hashable, float, float]]] = [None] * len(features)
+
+        with self._lock:
+            self.queries += len(features)
+            for neighbor, distance_km in self.neighbors(camera_id):
+                min_travel = distance_km / self.max_speed_kmh * 3600.0
+                matches = self._index.search(
+                    (neighbor, vehicle_type),
+                    features,
+                    min_stamp=first_seen - self.max_travel_seconds,
+                    max_stamp=first_seen - min_travel,
+                    threshold=self.similarity_threshold,
+                )
+                for i, match in enumerate(matches):
+                    if match is None:
+                        continue
+                    key, similarity = match
+                    if best[i] is None or similarity > best[i][1]:
+                        best[i] = (key, similarity, float(first_seen[i] - self._stamps[key]))
+
+            self.links += sum(1 for match in best if match is not None)
+        return best
+
+    def get_stats(self) -> Dict:
+        """Retorna estadísticas de la galería"""
+        return {
+            "entries": len(self._index),
+            "cameras": len(self._camera_ids),
+            "queries": self.queries,
+            "links": self.links,
+            "evicted": self.evicted,
+        }
+
+
+_gallery: Optional[CrossCameraGallery] = None
+_gallery_lock = threading.Lock()
+_synced_at = None  # createdAt del último Vehicle cargado desde la base de datos
+
+# Margen de la sincronización para filas de transacciones aún abiertas
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def get_gallery() -> CrossCameraGallery:
+    """Galería del proceso actual (se crea en el primer uso)"""
+    global _gallery
+    with _gallery_lock:
+        if _gallery is None:
+            _gallery = CrossCameraGallery(
+                max_entries=getattr(settings, "REID_GALLERY_MAX_ENTRIES", 200_000),
+                retention_seconds=getattr(settings, "REID_GALLERY_RETENTION_SECONDS", 3600),
+                max_distance_km=getattr(settings, "REID_MAX_DISTANCE_KM", 5.0),
+                max_speed_kmh=getattr(settings, "REID_MAX_SPEED_KMH", 120.0),
+                max_travel_seconds=getattr(settings, "REID_MAX_TRAVEL_SECONDS", 1800),
+                similarity_threshold=getattr(settings, "REID_SIMILARITY_THRESHOLD", 0.85),
+            )
+        return _gallery
+
+
+def sync_gallery(gallery: CrossCameraGallery) -> int:
+    """
+    Agrega a la galería los vehículos con reidFeature guardados (por este
+    u otros procesos) desde la última sincronización; la primera carga
+    los creados dentro de la ventana de retención
+
+    Returns:
+        Número de vehículos agregados
+    """
+    from django.utils import timezone
+    from apps.traffic_app.models import Vehicle
+
+    global _synced_at
+    with _gallery_lock:
+        since = (
+            _synced_at - SYNC_OVERLAP
+            if _synced_at is not None
+            else timezone.now() - timedelta(seconds=gallery.retention_seconds)
+        )
+        rows = (
+            Vehicle.objects.filter(reidFeature__isnull=False, createdAt__gt=since)
+            .order_by("createdAt")
+            .values_list(
+                "id",
+                "vehicleType",
+                "reidFeature",
+                "createdAt",
+                "trafficAnalysisId__cameraId",
+                "trafficAnalysisId__locationId__latitude",
+                "trafficAnalysisId__locationId__longitude",
+            )
+        )
+
+        added = 0
+        cameras = {}
+        for key, vehicle_type, reid, created_at, camera_id, latitude, longitude in rows.iterator():
+            _synced_at = max(_synced_at or created_at, created_at)
+            if key in gallery:
+                continue
+            if camera_id not in cameras:
+                cameras[camera_id] = (latitude, longitude)
+                gallery.register_camera(camera_id, latitude, longitude)
+            gallery.add(
+                key,
+                camera_id,
+                vehicle_type,
+                np.asarray(reid["feature"], dtype=np.float32),
+                reid["lastSeenAt"],
+            )
+            added += 1
+        return added
+
+
+def link_vehicles(analysis, vehicles: List) -> int:
+    """
+    Enlaza los vehículos guardados de un análisis con avistamientos
+    previos en cámaras vecinas y los agrega a la galería
+
+    Args:
+        analysis: TrafficAnalysis (con cameraId y locationId)
+        vehicles: Vehicle guardados del análisis; sólo se usan los que
+            tienen reidFeature (video con hora de grabación)
+
+    Returns:
+        Número de VehicleLink creados
+    """
+    from apps.traffic_app.models import VehicleLink
+
+    vehicles = [v for v in vehicles if v.reidFeature]
+    if not vehicles:
+        return 0
+
+    gallery = get_gallery()
+    location = analysis.locationId
+    camera_id = analysis.cameraId_id
+    gallery.register_camera(camera_id, location.latitude, location.longitude)
+    sync_gallery(gallery)
+
+    links = []
+
+    # Una consulta por tipo de vehículo
+    by_type: Dict[str, List] = {}
+    for vehicle in vehicles:
+        by_type.setdefault(vehicle.vehicleType, []).append(vehicle)
+    for vehicle_type, group in by_type.items():
+        matches = gallery.query(
+            camera_id,
+            vehicle_type,
+            np.array([v.reidFeature["feature"] for v in group], dtype=np.float32),
+            np.array([v.reidFeature["firstSeenAt"] for v in group]),
+        )
+        for vehicle, match in zip(group, matches):
+            if match is None:
+                continue
+            source_id, similarity, travel_seconds = match
+            links.append(
+                VehicleLink(
+                    sourceVehicleId_id=source_id,
+                    targetVehicleId=vehicle,
+                    similarity=round(similarity, 4),
+                    travelSeconds=int(math.floor(travel_seconds)),
+                )
+            )
+
+    if links:
+        VehicleLink.objects.bulk_create(links)
+
+    for vehicle in vehicles:
+        gallery.add(
+            vehicle.id,
+            camera_id,
+            vehicle.vehicleType,
+            np.asarray(vehicle.reidFeature["feature"], dtype=np.float32),
+            vehicle.reidFeature["lastSeenAt"],
+        )
+    return len(links)
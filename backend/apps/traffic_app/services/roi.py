@@ -0,0 +1,168 @@
+"""
+Region of Interest Service
+Región de interés (ROI) por cámara: la inferencia se ejecuta sólo sobre
+el rectángulo que contiene el polígono de la vía y las cajas se devuelven
+en coordenadas del frame completo
+
+RegionOfInterest es el único dueño del recorte y su desplazamiento;
+services.preprocess.FramePreprocessor lo aplica (con la reducción a
+imgsz) tanto en las tareas Celery como en VideoProcessor.
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+def parse_resolution(resolution: Optional[str]) -> Optional[Tuple[int, int]]:
+    """
+    Interpreta la resolución de una cámara ("1920x1080")
+
+    Returns:
+        (width, height) o None si no es válida
+    """
+    if not resolution:
+        return None
+    try:
+        width, height = (int(v) for v in resolution.lower().replace(" ", "").split("x"))
+    except ValueError:
+        return None
+    return (width, height) if width > 0 and height > 0 else None
+
+
+def validate_polygon(polygon) -> List[List[float]]:
+    """
+    Valida un polígono [[x, y], ...] (al menos 3 vértices)
+
+    Raises:
+        ValueError: Si el formato no es válido
+    """
+    if not isinstance(polygon, (list, tuple)) or len(polygon) < 3:
+        raise ValueError("El polígono ROI necesita al menos 3 puntos [x, y]")
+    points = []
+    for point in polygon:
+        if (
+            not isinstance(point, (list, tuple))
+            or len(point) != 2
+            or not all(isinstance(v, (int, float)) and v >= 0 for v in point)
+        ):
+            raise ValueError(f"Punto ROI inválido: {point}")
+        points.append([float(point[0]), float(point[1])])
+    return points
+
+
+def scale_to_frame(points, camera, frame_size: Tuple[int, int]) -> np.ndarray:
+    """
+    Escala puntos guardados en píxeles de `camera.resolution` al tamaño
+    real del video (si la resolución no está definida se asume la del video)
+
+    Returns:
+        Array (N, 2) float32
+    """
+    points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+    source_size = parse_resolution(getattr(camera, "resolution", None))
+    if source_size and source_size != tuple(frame_size):
+        points = points * np.array(
+            [frame_size[0] / source_size[0], frame_size[1] / source_size[1]],
+            dtype=np.float32,
+        )
+    return points
+
+
+class RegionOfInterest:
+    """
+    Polígono de la vía en coordenadas del frame
+
+    - rect: rectángulo envolvente (con margen) que se recorta antes de inferir
+    - contains(): filtra detecciones cuyo centro cae fuera del polígono
+    """
+
+    def __init__(
+        self,
+        polygon: Sequence[Sequence[float]],
+        frame_size: Tuple[int, int],
+        padding: int = 32,
+    ):
+        """
+        Args:
+            polygon: Vértices [[x, y], ...] en píxeles del frame
+            frame_size: (width, height) del video
+            padding: Margen en píxeles alrededor del polígono para no cortar
+                vehículos que cruzan su borde
+        """
+        width, height = frame_size
+        self.polygon = np.asarray(polygon, dtype=np.float32).reshape(-1, 2)
+        self.frame_size = (width, height)
+
+        x, y, w, h = cv2.boundingRect(np.round(self.polygon).astype(np.int32))
+        self.x0 = max(0, x - padding)
+        self.y0 = max(0, y - padding)
+        self.x1 = min(width, x + w + padding)
+        self.y1 = min(height, y + h + padding)
+
+        # Máscara del polígono dentro del rectángulo recortado
+        self.mask = np.zeros((self.y1 - self.y0, self.x1 - self.x0), dtype=np.uint8)
+        offset = np.array([self.x0, self.y0], dtype=np.float32)
+        cv2.fillPoly(self.mask, [np.round(self.polygon - offset).astype(np.int32)], 1)
+
+    @classmethod
+    def from_camera(
+        cls, camera, frame_size: Tuple[int, int], padding: int = 32
+    ) -> Optional["RegionOfInterest"]:
+        """
+        ROI de una cámara escalada al tamaño real del video
+
+        El polígono se guarda en píxeles de `camera.resolution`; si la
+        resolución no está definida se asume la del video.
+
+        Returns:
+            RegionOfInterest o None si la cámara no tiene ROI (o cubre todo el frame)
+        """
+        polygon = getattr(camera, "roiPolygon", None)
+        if not polygon:
+            return None
+
+        points = scale_to_frame(validate_polygon(polygon), camera, frame_size)
+        roi = cls(points, frame_size, padding)
+        return None if roi.covers_frame else roi
+
+    @property
+    def rect(self) -> Tuple[int, int, int, int]:
+        return self.x0, self.y0, self.x1, self.y1
+
+    @property
+    def covers_frame(self) -> bool:
+        return self.rect == (0, 0, *self.frame_size)
+
+    @property
+    def area_ratio(self) -> float:
+        """Fracción del frame que se envía al modelo"""
+        width, height = self.frame_size
+        return (self.x1 - self.x0) * (self.y1 - self.y0) / float(width * height)
+
+    def crop(self, frame: np.ndarray) -> np.ndarray:
+        """Recorte del rectángulo ROI (vista, sin copiar el frame)"""
+        return frame[self.y0 : self.y1, self.x0 : self.x1]
+
+    def to_frame(self, raw: np.ndarray) -> np.ndarray:
+        """
+        Lleva detecciones del recorte al frame completo y descarta las que
+        tienen el centro fuera del polígono
+
+        Args:
+            raw: Array (N, 6) [x1, y1, x2, y2, conf, cls] en coordenadas del recorte
+        """
+        if len(raw) == 0:
+            return raw
+
+        centers_x = ((raw[:, 0] + raw[:, 2]) / 2).astype(np.int32)
+        centers_y = ((raw[:, 1] + raw[:, 3]) / 2).astype(np.int32)
+        np.clip(centers_x, 0, self.mask.shape[1] - 1, out=centers_x)
+        np.clip(centers_y, 0, self.mask.shape[0] - 1, out=centers_y)
+
+        raw = raw[self.mask[centers_y, centers_x] > 0].copy()
+        raw[:, [0, 2]] += self.x0
+        raw[:, [1, 3]] += self.y0
+        return raw
+
@@ -0,0 +1,191 @@
+"""
+Video Sharding Service
+División de un video largo en segmentos temporales solapados para
+analizarlos en paralelo, y unión (stitching) de los tracks por segmento
+en IDs globales de vehículo usando las ventanas de solapamiento
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from .track_store import FrameSample, Trajectory
+
+
+def plan_shards(
+    total_frames: int,
+    fps: float,
+    shard_count: int,
+    overlap_seconds: float = 2.0,
+) -> List[Tuple[int, int]]:
+    """
+    Divide un video en segmentos contiguos con solapamiento
+
+    Args:
+        total_frames: Frames totales del video
+        fps: Frames por segundo del video
+        shard_count: Número de segmentos deseado
+        overlap_seconds: Segundos que cada segmento se extiende sobre el anterior
+
+    Returns:
+        Lista de rangos (start_frame, end_frame), inclusivos y desde 1
+    """
+    overlap = int(round(overlap_seconds * (fps or 30)))
+
+    # Cada segmento debe ser bastante más largo que su solapamiento
+    shard_count = min(shard_count, total_frames // max(2 * overlap, 1))
+    if total_frames <= 0 or shard_count <= 1:
+        return [(1, max(total_frames, 1))]
+
+    shard_length = int(np.ceil(total_frames / shard_count))
+
+    shards = []
+    for index in range(shard_count):
+        start = index * shard_length + 1
+        if start > total_frames:
+            break
+        end = min((index + 1) * shard_length, total_frames)
+
+        # Extender hacia atrás para que los tracks del límite se vean en ambos segmentos
+        shards.append((max(1, start - overlap) if index > 0 else 1, end))
+
+    return shards
+
+
+def _box_iou(box1: Dict, box2: Dict) -> float:
+    """IoU entre dos boundingBox {x, y, width, height}"""
+    xi1 = max(box1["x"], box2["x"])
+    yi1 = max(box1["y"], box2["y"])
+    xi2 = min(box1["x"] + box1["width"], box2["x"] + box2["width"])
+    yi2 = min(box1["y"] + box1["height"], box2["y"] + box2["height"])
+
+    inter_area = max(0, xi2 - xi1) * max(0, yi2 - yi1)
+    union_area = (
+        box1["width"] * box1["height"] + box2["width"] * box2["height"] - inter_area
+    )
+    return inter_area / union_area if union_area > 0 else 0.0
+
+
+def stitch_shard_tracks(
+    shard_results: List[Dict],
+    iou_threshold: float = 0.5,
+    sample_size: int = 8,
+) -> Dict[int, Dict]:
+    """
+    Une los tracks de segmentos solapados en vehículos globales
+
+    En la ventana de solapamiento entre dos segmentos consecutivos ambos
+    analizaron los mismos frames. Un track de cada lado se considera el
+    mismo vehículo cuando su IoU medio en los frames compartidos supera
+    `iou_threshold`; la asignación es óptima (Hungarian).
+
+    Args:
+        shard_results: Resultados de analyze_video_shard
+            [{shard_index, start_frame, end_frame,
+              tracks: [{track_id, type, trajectory, samples, ...}]}]
+        iou_threshold: IoU medio mínimo en el solapamiento para unir tracks
+        sample_size: Frames de la muestra de cada vehículo unido
+
+    Returns:
+        {global_id: {type, first_frame, last_frame, first_seconds, last_seconds,
+        count, confidence_sum, trajectory, samples[, appearance, direction, lane_votes]}}
+        con el mismo formato que tracked_vehicles en analyze_video_async
+    """
+    shards = sorted(shard_results, key=lambda s: s["shard_index"])
+
+    # Union-find sobre (índice de segmento, track_id)
+    parent: Dict[Tuple[int, int], Tuple[int, int]] = {}
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    tracks_by_key = {}
+    trajectories: Dict[Tuple[int, int], Trajectory] = {}
+    for shard_pos, shard in enumerate(shards):
+        for track in shard["tracks"]:
+            key = (shard_pos, track["track_id"])
+            parent[key] = key
+            tracks_by_key[key] = track
+            trajectories[key] = Trajectory.from_dict(track["trajectory"])
+
+    # Emparejar tracks en cada ventana de solapamiento
+    for shard_pos in range(len(shards) - 1):
+        prev_shard, next_shard = shards[shard_pos], shards[shard_pos + 1]
+        overlap_start, overlap_end = next_shard["start_frame"], prev_shard["end_frame"]
+        if overlap_start > overlap_end:
+            continue
+
+        prev_tracks = [
+            (t, trajectories[(shard_pos, t["track_id"])].window(overlap_start, overlap_end))
+            for t in prev_shard["tracks"]
+        ]
+        next_tracks = [
+            (t, trajectories[(shard_pos + 1, t["track_id"])].window(overlap_start, overlap_end))
+            for t in next_shard["tracks"]
+        ]
+        prev_tracks = [(t, f) for t, f in prev_tracks if f]
+        next_tracks = [(t, f) for t, f in next_tracks if f]
+        if not prev_tracks or not next_tracks:
+            continue
+
+        scores = np.zeros((len(prev_tracks), len(next_tracks)))
+        for i, (prev_track, prev_frames) in enumerate(prev_tracks):
+            for j, (next_track, next_frames) in enumerate(next_tracks):
+                if prev_track["type"] != next_track["type"]:
+                    continue
+                common = prev_frames.keys() & next_frames.keys()
+                if common:
+                    scores[i, j] = np.mean(
+                        [_box_iou(prev_frames[n], next_frames[n]) for n in common]
+                    )
+
+        rows, cols = linear_sum_assignment(-scores)
+        for i, j in zip(rows, cols):
+            if scores[i, j] >= iou_threshold:
+                prev_key = (shard_pos, prev_tracks[i][0]["track_id"])
+                next_key = (shard_pos + 1, next_tracks[j][0]["track_id"])
+                parent[find(next_key)] = find(prev_key)
+
+    # Fusionar por grupo (el segmento anterior tiene prioridad en el solapamiento)
+    groups: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+    for key in sorted(tracks_by_key):
+        groups.setdefault(find(key), []).append(key)
+
+    # IDs globales en orden de aparición
+    ordered = sorted(
+        groups.values(), key=lambda keys: min(tracks_by_key[k]["first_frame"] for k in keys)
+    )
+    stitched = {}
+    for global_id, keys in enumerate(ordered, start=1):
+        tracks = [tracks_by_key[key] for key in keys]
+        trajectory = Trajectory.merge(trajectories[key] for key in keys)
+        frames, _, confidences = trajectory.view()
+        vehicle = stitched[global_id] = {
+            "type": tracks[0]["type"],
+            "first_frame": int(frames[0]),
+            "last_frame": int(frames[-1]),
+            "first_seconds": min(t["first_seconds"] for t in tracks),
+            "last_seconds": max(t["last_seconds"] for t in tracks),
+            "count": len(trajectory),
+            "confidence_sum": float(confidences.sum()),
+            "trajectory": trajectory,
+            "samples": FrameSample.merge(
+                (frame for t in tracks for frame in t["samples"]), sample_size
+            ),
+        }
+
+        appearances = [t["appearance"] for t in tracks if t.get("appearance") is not None]
+        if appearances:
+            vehicle["appearance"] = np.sum(np.asarray(appearances, dtype=np.float32), axis=0)
+        directions = [t["direction"] for t in tracks if t.get("direction")]
+        if directions:
+            vehicle["direction"] = directions[0]
+        lane_votes = [t["lane_votes"] for t in tracks if t.get("lane_votes")]
+        if lane_votes:
+            vehicle["lane_votes"] = np.sum(lane_votes, axis=0).tolist()
+
+    return stitched
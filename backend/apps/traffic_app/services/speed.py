@@ -0,0 +1,155 @@
+"""
+Speed Estimation Service
+Velocidad de los vehículos a partir de su trayectoria en el video
+- Calibración por cámara: homografía imagen → plano de la vía (metros)
+  desde puntos de referencia medidos en la calzada
+- Tiempo: número de frame / FPS del video (respeta los frames saltados)
+- Suavizado vectorizado sobre la trayectoria completa del track al
+  terminar el análisis; el bucle de análisis no hace trabajo adicional
+"""
+
+from typing import Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .roi import scale_to_frame
+
+
+def validate_calibration(calibration) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Valida la calibración de velocidad de una cámara
+
+    Formato: {"imagePoints": [[x, y], ...], "worldPoints": [[X, Y], ...]}
+    con al menos 4 pares; la imagen en píxeles de `resolution` y el mundo
+    en metros sobre el plano de la vía.
+
+    Returns:
+        (image_points, world_points) o None si la cámara no está calibrada
+
+    Raises:
+        ValueError: Si el formato no es válido
+    """
+    if not calibration:
+        return None
+    if not isinstance(calibration, dict):
+        raise ValueError("La calibración de velocidad debe ser un objeto")
+    try:
+        image_points = np.asarray(calibration.get("imagePoints"), dtype=np.float32)
+        world_points = np.asarray(calibration.get("worldPoints"), dtype=np.float32)
+    except (TypeError, ValueError):
+        raise ValueError(f"Puntos de calibración inválidos: {calibration}")
+    if (
+        image_points.ndim != 2
+        or image_points.shape[1:] != (2,)
+        or image_points.shape != world_points.shape
+        or len(image_points) < 4
+    ):
+        raise ValueError("La calibración necesita al menos 4 pares de puntos [x, y] ↔ [X, Y]")
+    return image_points, world_points
+
+
+class SpeedEstimator:
+    """
+    Velocidades en km/h de trayectorias de cajas (x, y, w, h) en píxeles
+    del video, usando el punto inferior central de la caja (contacto con
+    la vía)
+    """
+
+    def __init__(
+        self,
+        homography: np.ndarray,
+        fps: float,
+        smoothing_seconds: float = 0.5,
+        max_speed_kmh: float = 250.0,
+    ):
+        """
+        Args:
+            homography: Matriz 3x3 píxeles del video → metros en la vía
+            fps: FPS del video
+            smoothing_seconds: Ventana del promedio móvil de posiciones
+            max_speed_kmh: Velocidades mayores se consideran errores de tracking
+        """
+        self.homography = np.asarray(homography, dtype=np.float64).reshape(3, 3)
+        self.fps = fps or 30.0
+        self.smoothing_seconds = smoothing_seconds
+        self.max_speed_kmh = max_speed_kmh
+
+    @classmethod
+    def from_camera(
+        cls, camera, frame_size: Tuple[int, int], fps: float, **kwargs
+    ) -> Optional["SpeedEstimator"]:
+        """
+        Estimador con la calibración de una cámara escalada al video
+
+        Returns:
+            SpeedEstimator o None si la cámara no está calibrada
+
+        Raises:
+            ValueError: Si la calibración no es válida o es degenerada
+        """
+        points = validate_calibration(getattr(camera, "speedCalibration", None))
+        if points is None:
+            return None
+        image_points, world_points = points
+        homography, _ = cv2.findHomography(
+            scale_to_frame(image_points, camera, frame_size), world_points
+        )
+        if homography is None:
+            raise ValueError("Los puntos de calibración no definen una homografía")
+        return cls(homography, fps, **kwargs)
+
+    def to_world(self, points: np.ndarray) -> np.ndarray:
+        """Proyecta puntos (N, 2) de la imagen al plano de la vía (metros)"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+        if len(points) == 0:
+            return np.zeros((0, 2))
+        return cv2.perspectiveTransform(points, self.homography).reshape(-1, 2)
+
+    def estimate(
+        self, frame_numbers: Sequence[int], bboxes: np.ndarray
+    ) -> Tuple[np.ndarray, Optional[float]]:
+        """
+        Velocidad de un vehículo a lo largo de su trayectoria
+
+        Args:
+            frame_numbers: Array (N,) de números de frame (crecientes)
+            bboxes: Array (N, 4) de cajas (x, y, w, h) en píxeles del video
+
+        Returns:
+            (speeds, avg_speed): Array (N,) de velocidades en km/h y la
+            velocidad media del recorrido (distancia / tiempo) o None si
+            la trayectoria es demasiado corta
+        """
+        frame_numbers = np.asarray(frame_numbers, dtype=np.float64).reshape(-1)
+        count = len(frame_numbers)
+        speeds = np.zeros(count)
+        if count < 2 or frame_numbers[-1] <= frame_numbers[0]:
+            return speeds, None
+
+        bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        anchors = np.stack([bboxes[:, 0] + bboxes[:, 2] / 2, bboxes[:, 1] + bboxes[:, 3]], axis=1)
+        positions = self.to_world(anchors)
+        times = frame_numbers / self.fps
+
+        # Promedio móvil centrado (ventana en detecciones, impar)
+        interval = (times[-1] - times[0]) / (count - 1)
+        window = min(int(round(self.smoothing_seconds / interval)) | 1, count - (count % 2 == 0))
+        if window > 1:
+            kernel = np.ones(window) / window
+            pad = window // 2
+            # Reflexión impar: extrapola el movimiento en los extremos
+            padded = np.pad(
+                positions, ((pad, pad), (0, 0)), mode="reflect", reflect_type="odd"
+            )
+            positions = np.stack(
+                [np.convolve(padded[:, axis], kernel, mode="valid") for axis in range(2)], axis=1
+            )
+
+        # Derivada por diferencias centrales con tiempos no uniformes
+        velocity = np.stack([np.gradient(positions[:, axis], times) for axis in range(2)], axis=1)
+        speeds = np.minimum(np.hypot(velocity[:, 0], velocity[:, 1]) * 3.6, self.max_speed_kmh)
+
+        distance = np.hypot(*np.diff(positions, axis=0).T).sum()
+        avg_speed = min(distance / (times[-1] - times[0]) * 3.6, self.max_speed_kmh)
+        return speeds, float(avg_speed)
@@ -0,0 +1,135 @@
+"""
+Track Store Service
+Estado compacto de cada vehículo durante el análisis
+- Trajectory: frames, cajas y confianzas en arrays numpy que crecen por
+  duplicación (~24 bytes por detección en lugar de un dict por frame)
+- FrameSample: las K mejores detecciones del vehículo (min-heap por
+  puntaje), las únicas que se guardan como VehicleFrame
+"""
+
+import heapq
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+
+class Trajectory:
+    """Detecciones de un track en orden de frame"""
+
+    __slots__ = ("frames", "boxes", "confidences", "size")
+
+    def __init__(self, capacity: int = 32):
+        self.frames = np.empty(capacity, dtype=np.int32)
+        self.boxes = np.empty((capacity, 4), dtype=np.int32)  # (x, y, w, h)
+        self.confidences = np.empty(capacity, dtype=np.float32)
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, frame_number: int, bbox: Tuple[int, int, int, int], confidence: float):
+        """Agrega una detección (frame_number mayor que el anterior)"""
+        if self.size == len(self.frames):
+            capacity = 2 * len(self.frames)
+            self.frames = np.resize(self.frames, capacity)
+            self.boxes = np.resize(self.boxes, (capacity, 4))
+            self.confidences = np.resize(self.confidences, capacity)
+        self.frames[self.size] = frame_number
+        self.boxes[self.size] = bbox
+        self.confidences[self.size] = confidence
+        self.size += 1
+
+    def view(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(frames, boxes, confidences) sin copiar"""
+        size = self.size
+        return self.frames[:size], self.boxes[:size], self.confidences[:size]
+
+    def window(self, start: int, end: int) -> Dict[int, Dict]:
+        """Cajas {x, y, width, height} de los frames en [start, end] por número de frame"""
+        frames, boxes, _ = self.view()
+        mask = (frames >= start) & (frames <= end)
+        return {
+            frame: {"x": x, "y": y, "width": w, "height": h}
+            for frame, (x, y, w, h) in zip(frames[mask].tolist(), boxes[mask].tolist())
+        }
+
+    def to_dict(self) -> Dict[str, List]:
+        """Formato JSON (resultados de Celery)"""
+        frames, boxes, confidences = self.view()
+        return {
+            "frames": frames.tolist(),
+            "boxes": boxes.tolist(),
+            "confidences": confidences.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, List]) -> "Trajectory":
+        trajectory = cls(capacity=max(1, len(data["frames"])))
+        size = len(data["frames"])
+        if size:
+            trajectory.frames[:size] = data["frames"]
+            trajectory.boxes[:size] = data["boxes"]
+            trajectory.confidences[:size] = data["confidences"]
+        trajectory.size = size
+        return trajectory
+
+    @classmethod
+    def merge(cls, trajectories: Iterable["Trajectory"]) -> "Trajectory":
+        """
+        Une trayectorias solapadas; en un frame repetido gana la primera
+        """
+        parts = [t.view() for t in trajectories]
+        frames = np.concatenate([p[0] for p in parts])
+        # np.unique devuelve la primera aparición de cada frame, ya ordenado
+        frames, first = np.unique(frames, return_index=True)
+        merged = cls(capacity=max(1, len(frames)))
+        merged.frames[: len(frames)] = frames
+        merged.boxes[: len(frames)] = np.concatenate([p[1] for p in parts])[first]
+        merged.confidences[: len(frames)] = np.concatenate([p[2] for p in parts])[first]
+        merged.size = len(frames)
+        return merged
+
+
+class FrameSample:
+    """
+    Muestra acotada de las mejores detecciones de un vehículo
+
+    Cada frame es un dict con frameNumber y score; sólo se construye si
+    accepts(score) indica que entraría en la muestra.
+    """
+
+    __slots__ = ("size", "_heap")
+
+    def __init__(self, size: int = 8):
+        self.size = size
+        self._heap: List[Tuple[float, int, Dict]] = []  # (score, frameNumber, frame)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def accepts(self, score: float) -> bool:
+        return len(self._heap) < self.size or score > self._heap[0][0]
+
+    def add(self, frame: Dict):
+        """Agrega un frame ({frameNumber, score, ...}) si mejora la muestra"""
+        entry = (frame["score"], frame["frameNumber"], frame)
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def frames(self) -> List[Dict]:
+        """Frames de la muestra en orden de frame"""
+        return sorted((entry[2] for entry in self._heap), key=lambda f: f["frameNumber"])
+
+    @classmethod
+    def merge(cls, frames: Iterable[Dict], size: int) -> "FrameSample":
+        """Muestra con los mejores frames de varias (frame repetido: el primero)"""
+        sample = cls(size)
+        seen = set()
+        for frame in frames:
+            if frame["frameNumber"] not in seen:
+                seen.add(frame["frameNumber"])
+                sample.add(frame)
+        return sample
+
@@ -0,0 +1,308 @@
+"""
+Tracking Engine Service
+Motor de tracking multi-objeto común a las tareas Celery y a VideoProcessor
+- Estado de los tracks en arrays de numpy (sin dict por track)
+- Estrategia de asociación detección → track intercambiable
+- Predicción de movimiento (Kalman) opcional, en lote para todos los tracks
+"""
+
+from collections import namedtuple
+from typing import Dict, List, Optional, Tuple, Type
+
+import numpy as np
+
+from .detections import iou_matrix, match_iou
+from .kalman import STATE_DIM, ConstantVelocityKalman, states_to_boxes
+
+
+# Resultado de TrackingEngine.update, alineado con las detecciones del frame
+TrackUpdate = namedtuple("TrackUpdate", ["track_ids", "is_new", "removed"])
+
+
+class IoUAssociation:
+    """
+    Asociación por IoU con asignación óptima (Hungarian)
+
+    Sólo se asocian detecciones y tracks de la misma clase si
+    `class_aware` es True.
+    """
+
+    name = "hungarian"
+
+    def __init__(self, iou_threshold: float = 0.3, class_aware: bool = True):
+        self.iou_threshold = iou_threshold
+        self.class_aware = class_aware
+
+    def similarity(
+        self,
+        det_boxes: np.ndarray,
+        det_classes: np.ndarray,
+        track_boxes: np.ndarray,
+        track_classes: np.ndarray,
+    ) -> np.ndarray:
+        """Matriz IoU (detecciones, tracks) con las clases distintas a 0"""
+        ious = iou_matrix(det_boxes, track_boxes)
+        if self.class_aware and ious.size:
+            ious[det_classes[:, None] != track_classes[None, :]] = 0.0
+        return ious
+
+    def associate(
+        self,
+        det_boxes: np.ndarray,
+        det_classes: np.ndarray,
+        track_boxes: np.ndarray,
+        track_classes: np.ndarray,
+    ) -> Tuple[List[Tuple[int, int]], List[int], List[int]]:
+        """
+        Returns:
+            (matches [(det_idx, track_idx)], detecciones sin track, tracks sin detección)
+        """
+        ious = self.similarity(det_boxes, det_classes, track_boxes, track_classes)
+        return match_iou(ious, self.iou_threshold)
+
+
+class GreedyIoUAssociation(IoUAssociation):
+    """
+    Asociación voraz por IoU: cada detección, en orden, toma el track
+    libre con mayor IoU (comportamiento histórico de las tareas)
+    """
+
+    name = "greedy"
+
+    def associate(self, det_boxes, det_classes, track_boxes, track_classes):
+        ious = self.similarity(det_boxes, det_classes, track_boxes, track_classes)
+        num_detections, num_tracks = ious.shape
+
+        matches = []
+        used = np.zeros(num_tracks, dtype=bool)
+        for det_idx in range(num_detections if num_tracks else 0):
+            row = np.where(used, 0.0, ious[det_idx])
+            track_idx = int(row.argmax())
+            if row[track_idx] > self.iou_threshold:
+                used[track_idx] = True
+                matches.append((det_idx, track_idx))
+
+        matched_detections = {d for d, _ in matches}
+        return (
+            matches,
+            [d for d in range(num_detections) if d not in matched_detections],
+            [t for t in range(num_tracks) if not used[t]],
+        )
+
+
+ASSOCIATIONS: Dict[str, Type[IoUAssociation]] = {
+    IoUAssociation.name: IoUAssociation,
+    GreedyIoUAssociation.name: GreedyIoUAssociation,
+}
+
+
+class TrackingEngine:
+    """
+    Tracking por asociación frame a frame con estado en arrays
+
+    Cada track ocupa una fila de arrays contiguos (id, caja, clase,
+    último frame detectado, detecciones y, con predicción de movimiento,
+    estado y covarianza de Kalman); los tracks sin detección durante más
+    de `max_missing` frames del video se eliminan compactando los arrays.
+    El tiempo se mide en frames del video, no en frames procesados: no
+    depende del stride del muestreo.
+
+    Con `motion` la asociación usa la caja predicha para el frame actual
+    en lugar de la última caja detectada.
+    """
+
+    def __init__(
+        self,
+        association: Optional[IoUAssociation] = None,
+        max_missing: int = 15,
+        motion: Optional[ConstantVelocityKalman] = None,
+        initial_capacity: int = 64,
+    ):
+        """
+        Args:
+            association: Estrategia de asociación (None = Hungarian por IoU)
+            max_missing: Frames del video sin detección antes de eliminar un
+                track (15 = 5 frames procesados con stride 3)
+            motion: Filtro de Kalman por lotes (None = última caja detectada)
+            initial_capacity: Filas reservadas inicialmente (crece al doble)
+        """
+        self.association = association if association is not None else IoUAssociation()
+        self.max_missing = max_missing
+        self.motion = motion
+        self.next_id = 1
+        self.frame_number: Optional[int] = None
+        self._size = 0
+        self._allocate(max(1, initial_capacity))
+
+    def _allocate(self, capacity: int):
+        size = self._size
+        fields = {
+            "_ids": np.zeros(capacity, dtype=np.int64),
+            "_boxes": np.zeros((capacity, 4), dtype=np.float32),  # (x, y, w, h)
+            "_classes": np.zeros(capacity, dtype=np.int16),
+            "_last_seen": np.zeros(capacity, dtype=np.int64),  # Frame de la última detección
+            "_hits": np.zeros(capacity, dtype=np.int32),
+        }
+        if self.motion is not None:
+            fields["_states"] = np.zeros((capacity, STATE_DIM))
+            fields["_covariances"] = np.zeros((capacity, STATE_DIM, STATE_DIM))
+
+        for name, array in fields.items():
+            previous = getattr(self, name, None)
+            if previous is not None:
+                array[:size] = previous[:size]
+            setattr(self, name, array)
+        self._fields = list(fields)
+
+    def __len__(self) -> int:
+        """Tracks activos"""
+        return self._size
+
+    @property
+    def active_ids(self) -> np.ndarray:
+        return self._ids[: self._size]
+
+    def _predict(self, frame_number: int):
+        """Lleva las cajas de los tracks activos al frame actual"""
+        dt = 1
+        if self.frame_number is not None:
+            dt = max(1, frame_number - self.frame_number)
+        self.frame_number = frame_number
+
+        size = self._size
+        if self.motion is None or size == 0:
+            return
+
+        states, covariances = self.motion.predict(
+            self._states[:size], self._covariances[:size], dt
+        )
+        self._states[:size] = states
+        self._covariances[:size] = covariances
+        self._boxes[:size] = states_to_boxes(states)
+
+    def update(self, detections: np.ndarray, frame_number: Optional[int] = None) -> TrackUpdate:
+        """
+        Asocia las detecciones de un frame procesado con los tracks activos
+
+        Args:
+            detections: Array estructurado de detecciones (services.detections)
+            frame_number: Número de frame en el video, reloj de la
+                expiración de tracks; con predicción de movimiento, el salto
+                desde el frame anterior es el `dt` del filtro (None = el
+                siguiente al anterior)
+
+        Returns:
+            TrackUpdate(track_ids, is_new, removed): ids y máscara de tracks
+            nuevos alineados con `detections`, e ids eliminados en este frame
+        """
+        if frame_number is None:
+            frame_number = (self.frame_number or 0) + 1
+        self._predict(frame_number)
+
+        size = self._size
+        num_detections = len(detections)
+        det_boxes = detections["bbox"].astype(np.float32)
+        det_classes = detections["cls"]
+
+        matches, unmatched, _ = self.association.associate(
+            det_boxes, det_classes, self._boxes[:size], self._classes[:size]
+        )
+
+        track_ids = np.zeros(num_detections, dtype=np.int64)
+        is_new = np.zeros(num_detections, dtype=bool)
+
+        # Tracks asociados
+        if matches:
+            det_idx, track_idx = np.array(matches, dtype=np.int64).T
+            self._boxes[track_idx] = det_boxes[det_idx]
+            self._last_seen[track_idx] = frame_number
+            self._hits[track_idx] += 1
+            track_ids[det_idx] = self._ids[track_idx]
+
+            if self.motion is not None:
+                states, covariances = self.motion.update(
+                    self._states[track_idx], self._covariances[track_idx], det_boxes[det_idx]
+                )
+                self._states[track_idx] = states
+                self._covariances[track_idx] = covariances
+
+        # Tracks nuevos (en orden de detección)
+        if unmatched:
+            count = len(unmatched)
+            if size + count > len(self._ids):
+                self._allocate(max(2 * len(self._ids), size + count))
+
+            new_rows = slice(size, size + count)
+            new_ids = np.arange(self.next_id, self.next_id + count, dtype=np.int64)
+            self.next_id += count
+
+            self._ids[new_rows] = new_ids
+            self._boxes[new_rows] = det_boxes[unmatched]
+            self._classes[new_rows] = det_classes[unmatched]
+            self._last_seen[new_rows] = frame_number
+            self._hits[new_rows] = 1
+            if self.motion is not None:
+                states, covariances = self.motion.initiate(det_boxes[unmatched])
+                self._states[new_rows] = states
+                self._covariances[new_rows] = covariances
+            self._size = size = size + count
+
+            track_ids[unmatched] = new_ids
+            is_new[unmatched] = True
+
+        # Eliminar tracks perdidos compactando los arrays
+        lost = frame_number - self._last_seen[:size] > self.max_missing
+        removed = self._ids[:size][lost].tolist()
+        if removed:
+            keep = ~lost
+            kept = int(keep.sum())
+            for name in self._fields:
+                array = getattr(self, name)
+                array[:kept] = array[:size][keep]
+            self._size = kept
+
+        return TrackUpdate(track_ids, is_new, removed)
+
+    def get_stats(self) -> Dict:
+        """Retorna estadísticas del motor de tracking"""
+        return {
+            "active_tracks": self._size,
+            "total_tracks": self.next_id - 1,
+            "association": self.association.name,
+            "motion_model": "kalman" if self.motion is not None else None,
+        }
+
+
+def create_tracking_engine(
+    association: Optional[str] = None,
+    iou_threshold: Optional[float] = None,
+    max_missing: Optional[int] = None,
+    motion: Optional[bool] = None,
+) -> TrackingEngine:
+    """
+    Motor de tracking con la configuración de settings (TRACKING_*)
+
+    Args:
+        association: 'hungarian' o 'greedy' (None = settings.TRACKING_ASSOCIATION)
+        iou_threshold: IoU mínimo de asociación (None = settings.TRACKING_IOU_THRESHOLD)
+        max_missing: Frames del video sin detección (None = settings.TRACKING_MAX_MISSING)
+        motion: Predicción Kalman de las cajas (None = settings.TRACKING_KALMAN)
+    """
+    from django.conf import settings
+
+    if association is None:
+        association = getattr(settings, "TRACKING_ASSOCIATION", "hungarian")
+    if association not in ASSOCIATIONS:
+        raise ValueError(f"Estrategia de asociación no soportada: {association}")
+    if iou_threshold is None:
+        iou_threshold = getattr(settings, "TRACKING_IOU_THRESHOLD", 0.3)
+    if max_missing is None:
+        max_missing = getattr(settings, "TRACKING_MAX_MISSING", 15)
+    if motion is None:
+        motion = getattr(settings, "TRACKING_KALMAN", True)
+
+    return TrackingEngine(
+        ASSOCIATIONS[association](iou_threshold=iou_threshold),
+        max_missing=max_missing,
+        motion=ConstantVelocityKalman() if motion else None,
+    )
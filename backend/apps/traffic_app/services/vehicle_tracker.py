@@ -2,303 +2,273 @@
 Vehicle Tracker Service
 Sistema de tracking multi-objeto con re-identificación
 Mantiene IDs únicos y detecta vehículos que regresan después de 1 minuto
+
+Los tiempos se miden en frames del video (reloj del video según su FPS),
+no con el reloj de la máquina: el resultado no depende de la velocidad
+de procesamiento.
 """
 
 import numpy as np
-from collections import deque
-from datetime import datetime, timedelta
+import heapq
 from typing import Dict, List, Tuple, Optional
-import cv2
+
+from .appearance import FeatureIndex, extract_features
+from .counting import TrafficCounter
+from .tracking import TrackingEngine
+
+
+# Posiciones recientes guardadas por vehículo
+HISTORY_LENGTH = 30
 
 
 class TrackedVehicle:
-    """Representa un vehículo rastreado con su historial"""
+    """
+    Representa un vehículo rastreado con su historial
+
+    Objeto compacto (__slots__) con el historial de cajas en un buffer
+    circular de numpy preasignado y marcas de tiempo en frames del video.
+    """
+
+    __slots__ = (
+        "track_id",
+        "vehicle_type",
+        "first_frame",
+        "last_frame",
+        "frame_count",
+        "is_active",
+        "feature_vector",
+        "direction",
+        "lane",
+        "_history",
+        "_head",
+        "_count",
+    )
 
     def __init__(
-        self, track_id: str, vehicle_type: str, bbox: Tuple[int, int, int, int]
+        self,
+        track_id: str,
+        vehicle_type: str,
+        bbox: Tuple[int, int, int, int],
+        frame_number: int = 0,
     ):
         self.track_id = track_id
         self.vehicle_type = vehicle_type
-        self.first_seen = datetime.now()
-        self.last_seen = datetime.now()
-        self.bbox_history = deque(maxlen=30)  # Últimas 30 posiciones
-        self.bbox_history.append(bbox)
+        self.first_frame = frame_number
+        self.last_frame = frame_number
         self.frame_count = 0
         self.is_active = True
         self.feature_vector = None  # Para re-identificación
+        self.direction = None  # Dirección del primer cruce de línea de conteo
+        self.lane = None  # Carril con más detecciones
 
-    def update(self, bbox: Tuple[int, int, int, int]):
+        # Últimas HISTORY_LENGTH posiciones (x, y, w, h)
+        self._history = np.empty((HISTORY_LENGTH, 4), dtype=np.int32)
+        self._history[0] = bbox
+        self._head = 0  # Posición de la última caja
+        self._count = 1
+
+    def update(self, bbox: Tuple[int, int, int, int], frame_number: int):
         """Actualiza la posición del vehículo"""
-        self.bbox_history.append(bbox)
-        self.last_seen = datetime.now()
+        self._head = (self._head + 1) % HISTORY_LENGTH
+        self._history[self._head] = bbox
+        self._count = min(self._count + 1, HISTORY_LENGTH)
+        self.last_frame = frame_number
         self.frame_count += 1
 
+    @property
+    def bbox_history(self) -> np.ndarray:
+        """Historial (N, 4) de cajas, de la más antigua a la más reciente"""
+        order = np.arange(self._head - self._count + 1, self._head + 1) % HISTORY_LENGTH
+        return self._history[order]
+
     def get_current_bbox(self) -> Tuple[int, int, int, int]:
         """Retorna el último bounding box conocido"""
-        return self.bbox_history[-1] if self.bbox_history else (0, 0, 0, 0)
-
-    def is_lost(self, timeout_seconds: int = 5) -> bool:
-        """Determina si el vehículo se ha perdido del tracking"""
-        return (datetime.now() - self.last_seen).total_seconds() > timeout_seconds
-
-    def can_reidentify(self, time_window_seconds: int = 60) -> bool:
-        """Determina si el vehículo puede ser re-identificado"""
-        time_since_lost = (datetime.now() - self.last_seen).total_seconds()
-        return time_window_seconds <= time_since_lost <= (time_window_seconds * 2)
+        return tuple(self._history[self._head].tolist())
 
 
 class VehicleTracker:
     """
     Sistema de tracking de vehículos con:
-    - Tracking por IoU (Intersection over Union)
+    - Tracking por IoU (services.tracking.TrackingEngine, el mismo motor
+      que usan las tareas Celery)
     - Re-identificación visual después de 1 minuto
     - Conteo único de vehículos
+    - Conteo por líneas virtuales y carril (opcional, services.counting)
     """
 
     def __init__(
         self,
-        iou_threshold: float = 0.3,
-        max_lost_frames: int = 150,  # 5 segundos a 30fps
-        reidentification_window: int = 60,
-    ):  # 60 segundos
+        engine: Optional[TrackingEngine] = None,
+        reidentification_window: int = 60,  # 60 segundos
+        class_names: Optional[Dict[int, str]] = None,
+        fps: float = 30.0,
+        counter: Optional[TrafficCounter] = None,
+    ):
         """
         Args:
-            iou_threshold: Umbral mínimo de IoU para considerar mismo vehículo
-            max_lost_frames: Frames máximos sin detección antes de marcar como perdido
-            reidentification_window: Ventana de tiempo (segundos) para re-identificación
+            engine: Motor de asociación frame a frame (None = Hungarian, IoU 0.3)
+            reidentification_window: Ventana de tiempo (segundos de video) para re-identificación
+            class_names: Clase COCO → tipo de vehículo
+            fps: FPS del video (convierte segundos de video en frames)
+            counter: Líneas de conteo y carriles de la cámara (None = sin conteo por línea)
         """
-        self.iou_threshold = iou_threshold
-        self.max_lost_frames = max_lost_frames
+        self.engine = engine if engine is not None else TrackingEngine()
+        self.counter = counter
+        self.class_names = class_names or {}
         self.reidentification_window = reidentification_window
+        self.fps = fps
+        self.frame_number = 0  # Reloj del video (último frame procesado)
 
         self.active_tracks: Dict[str, TrackedVehicle] = {}
         self.lost_tracks: Dict[str, TrackedVehicle] = {}
+        self._lost_heap: List[Tuple[int, str]] = []  # (last_frame, track_id)
+        # Features de lost_tracks por tipo (matriz contigua), marca = last_frame
+        self._lost_features = FeatureIndex()
         self.next_id = 1
+        self._labels: Dict[int, str] = {}  # id del motor → track_id
 
-    def _calculate_iou(
-        self, box1: Tuple[int, int, int, int], box2: Tuple[int, int, int, int]
-    ) -> float:
-        """
-        Calcula Intersection over Union entre dos bounding boxes
-
-        Args:
-            box1, box2: (x, y, width, height)
-
-        Returns:
-            IoU score (0-1)
-        """
-        x1, y1, w1, h1 = box1
-        x2, y2, w2, h2 = box2
-
-        # Convertir a coordenadas (x1, y1, x2, y2)
-        box1_x2, box1_y2 = x1 + w1, y1 + h1
-        box2_x2, box2_y2 = x2 + w2, y2 + h2
-
-        # Calcular intersección
-        inter_x1 = max(x1, x2)
-        inter_y1 = max(y1, y2)
-        inter_x2 = min(box1_x2, box2_x2)
-        inter_y2 = min(box1_y2, box2_y2)
-
-        if inter_x2 < inter_x1 or inter_y2 < inter_y1:
-            return 0.0
-
-        intersection = (inter_x2 - inter_x1) * (inter_y2 - inter_y1)
-
-        # Calcular áreas
-        box1_area = w1 * h1
-        box2_area = w2 * h2
-
-        # Calcular unión
-        union = box1_area + box2_area - intersection
-
-        return intersection / union if union > 0 else 0.0
+    @property
+    def window_frames(self) -> int:
+        """Ventana de re-identificación en frames del video"""
+        return int(round(self.reidentification_window * (self.fps or 30.0)))
 
-    def _extract_features(
-        self, frame: np.ndarray, bbox: Tuple[int, int, int, int]
-    ) -> np.ndarray:
-        """
-        Extrae features visuales del vehículo para re-identificación
-        (Implementación simplificada - en producción usar ResNet o similar)
-
-        Args:
-            frame: Frame del video
-            bbox: Bounding box del vehículo (x, y, w, h)
-
-        Returns:
-            Feature vector normalizado
-        """
-        x, y, w, h = bbox
-
-        # Extraer ROI (Region of Interest)
-        roi = frame[y : y + h, x : x + w]
-
-        if roi.size == 0:
-            return np.zeros(128)  # Vector vacío si ROI es inválido
-
-        # Resize a tamaño fijo
-        roi_resized = cv2.resize(roi, (64, 64))
-
-        # Calcular histograma de color (feature simple pero efectivo)
-        hist_b = cv2.calcHist([roi_resized], [0], None, [32], [0, 256])
-        hist_g = cv2.calcHist([roi_resized], [1], None, [32], [0, 256])
-        hist_r = cv2.calcHist([roi_resized], [2], None, [32], [0, 256])
-
-        # Concatenar y normalizar
-        features = np.concatenate(
-            [hist_b.flatten(), hist_g.flatten(), hist_r.flatten()]
-        )
-        features = features / (np.linalg.norm(features) + 1e-7)
-
-        return features
-
-    def _compare_features(self, features1: np.ndarray, features2: np.ndarray) -> float:
-        """
-        Compara dos feature vectors usando similitud coseno
-
-        Returns:
-            Similitud (0-1), donde 1 es idéntico
-        """
-        if features1 is None or features2 is None:
-            return 0.0
-
-        similarity = np.dot(features1, features2)
-        return max(0.0, similarity)
-
-    def update(self, detections: List[Dict], frame: np.ndarray) -> List[Dict]:
+    def update(
+        self, detections: np.ndarray, frame: np.ndarray, frame_number: Optional[int] = None
+    ) -> List[Dict]:
         """
         Actualiza el tracker con nuevas detecciones
 
         Args:
-            detections: Lista de detecciones [{bbox: (x,y,w,h), class: str, confidence: float}]
+            detections: Array estructurado de detecciones (services.detections)
             frame: Frame actual del video
+            frame_number: Número de frame en el video (None = el siguiente
+                al anterior); es el reloj de todos los tiempos del tracker
 
         Returns:
             Lista de detecciones con track_id asignado
+            [{bbox: (x,y,w,h), class: str, confidence: float, track_id, is_new}]
+            (+ direction, lane y crossings si hay contador)
         """
-        tracked_detections = []
-        unmatched_detections = list(range(len(detections)))
-        unmatched_tracks = list(self.active_tracks.keys())
-
-        # Paso 1: Matching por IoU (vehículos que siguen en frame)
-        matches = []
-
-        for det_idx in list(unmatched_detections):
-            detection = detections[det_idx]
-            det_bbox = detection["bbox"]
-            best_iou = 0
-            best_track_id = None
-
-            for track_id in unmatched_tracks:
-                track = self.active_tracks[track_id]
-                track_bbox = track.get_current_bbox()
-                iou = self._calculate_iou(det_bbox, track_bbox)
-
-                if iou > best_iou and iou >= self.iou_threshold:
-                    best_iou = iou
-                    best_track_id = track_id
-
-            if best_track_id:
-                matches.append((det_idx, best_track_id))
-                unmatched_detections.remove(det_idx)
-                unmatched_tracks.remove(best_track_id)
-
-        # Actualizar tracks matched
-        for det_idx, track_id in matches:
-            detection = detections[det_idx]
-            track = self.active_tracks[track_id]
-            track.update(detection["bbox"])
+        if frame_number is None:
+            frame_number = self.frame_number + 1
+        self.frame_number = frame_number
+        window_frames = self.window_frames
+
+        result = self.engine.update(detections, frame_number)
+        counter = self.counter
+        crossings: Dict[int, List[Tuple[str, str]]] = {}
+        if counter is not None:
+            for engine_id, line_name, direction in counter.update(
+                result.track_ids, detections["bbox"], frame_number
+            ):
+                crossings.setdefault(engine_id, []).append((line_name, direction))
+
+        # Paso 1: Tracks eliminados por el motor pasan a lost_tracks
+        for engine_id in result.removed:
+            track = self.active_tracks.pop(self._labels.pop(engine_id))
+            track.is_active = False
+            if counter is not None:
+                attributes = counter.attributes(engine_id)
+                track.direction, track.lane = attributes["direction"], attributes["lane"]
+                counter.forget(engine_id)
+            self.lost_tracks[track.track_id] = track
+            heapq.heappush(self._lost_heap, (track.last_frame, track.track_id))
+            if track.feature_vector is not None:
+                self._lost_features.add(
+                    track.track_id, track.vehicle_type, track.feature_vector, track.last_frame
+                )
 
-            # Actualizar feature vector periódicamente
+        # Una sola conversión array → Python por frame
+        detections = [
+            {
+                "bbox": tuple(bbox),
+                "class": self.class_names.get(cls, "other"),
+                "confidence": conf,
+            }
+            for bbox, conf, cls in zip(
+                detections["bbox"].tolist(),
+                detections["conf"].tolist(),
+                detections["cls"].tolist(),
+            )
+        ]
+        engine_ids = result.track_ids.tolist()
+        new_indices = np.flatnonzero(result.is_new).tolist()
+
+        # Paso 2: Actualizar tracks asociados por el motor
+        tracks: Dict[int, TrackedVehicle] = {}
+        refresh = []  # Tracks cuyo feature vector se actualiza (cada 10 frames)
+        for idx, (detection, is_new) in enumerate(zip(detections, result.is_new.tolist())):
+            if is_new:
+                continue
+            track = self.active_tracks[self._labels[engine_ids[idx]]]
+            track.update(detection["bbox"], frame_number)
+            tracks[idx] = track
             if track.frame_count % 10 == 0:
-                track.feature_vector = self._extract_features(frame, detection["bbox"])
-
-            tracked_detections.append(
-                {**detection, "track_id": track_id, "is_new": False}
+                refresh.append(idx)
+
+        # Features de todas las cajas que las necesitan, en una pasada
+        feature_indices = refresh + new_indices
+        features = extract_features(frame, [detections[i]["bbox"] for i in feature_indices])
+        features = dict(zip(feature_indices, features))
+        for idx in refresh:
+            tracks[idx].feature_vector = features[idx]
+
+        # Paso 3: Re-identificar vehículos que volvieron (lost_tracks vistos
+        # por última vez hace entre 1 y 2 ventanas), una consulta por tipo
+        reidentified: Dict[int, str] = {}
+        by_type: Dict[str, List[int]] = {}
+        for idx in new_indices:
+            by_type.setdefault(detections[idx]["class"], []).append(idx)
+        for vehicle_type, indices in by_type.items():
+            matches = self._lost_features.search(
+                vehicle_type,
+                np.stack([features[i] for i in indices]),
+                min_stamp=frame_number - 2 * window_frames,
+                max_stamp=frame_number - window_frames,
+                threshold=0.7,  # Umbral de similitud
             )
-
-        # Paso 2: Intentar re-identificar vehículos que volvieron
-        for det_idx in list(unmatched_detections):
-            detection = detections[det_idx]
-            det_features = self._extract_features(frame, detection["bbox"])
-
-            best_similarity = 0
-            best_track_id = None
-
-            # Buscar en tracks perdidos recientemente
-            for track_id, track in self.lost_tracks.items():
-                if track.can_reidentify(self.reidentification_window):
-                    if track.vehicle_type == detection["class"]:
-                        similarity = self._compare_features(
-                            det_features, track.feature_vector
-                        )
-
-                        if (
-                            similarity > 0.7 and similarity > best_similarity
-                        ):  # Umbral de similitud
-                            best_similarity = similarity
-                            best_track_id = track_id
-
+            for idx, match in zip(indices, matches):
+                if match is not None:
+                    reidentified[idx] = match[0]
+
+        # Paso 4: Crear tracks nuevos (o re-identificados)
+        for idx in new_indices:
+            detection = detections[idx]
+            best_track_id = reidentified.get(idx)
             if best_track_id:
-                # Re-identificado! Crear nuevo track con contador incrementado
-                new_track_id = f"{best_track_id}_R{self.next_id}"
-                self.next_id += 1
-
-                track = TrackedVehicle(
-                    new_track_id, detection["class"], detection["bbox"]
-                )
-                track.feature_vector = det_features
-                self.active_tracks[new_track_id] = track
-
-                unmatched_detections.remove(det_idx)
-
-                tracked_detections.append(
-                    {
-                        **detection,
-                        "track_id": new_track_id,
-                        "is_new": True,
-                        "reidentified": True,
-                    }
-                )
-
-        # Paso 3: Crear nuevos tracks para detecciones no matched
-        for det_idx in unmatched_detections:
-            detection = detections[det_idx]
-            track_id = f"V{self.next_id:05d}"
+                # Re-identificado! Nuevo track con contador incrementado
+                track_id = f"{best_track_id}_R{self.next_id}"
+            else:
+                track_id = f"V{self.next_id:05d}"
             self.next_id += 1
 
-            track = TrackedVehicle(track_id, detection["class"], detection["bbox"])
-            track.feature_vector = self._extract_features(frame, detection["bbox"])
-            self.active_tracks[track_id] = track
-
-            tracked_detections.append(
-                {
-                    **detection,
-                    "track_id": track_id,
-                    "is_new": True,
-                    "reidentified": False,
-                }
+            track = TrackedVehicle(
+                track_id, detection["class"], detection["bbox"], frame_number
             )
+            track.feature_vector = features[idx]
+            self.active_tracks[track_id] = track
+            self._labels[engine_ids[idx]] = track_id
+            tracks[idx] = track
 
-        # Paso 4: Mover tracks perdidos a lost_tracks
-        for track_id in unmatched_tracks:
-            track = self.active_tracks[track_id]
-            if track.is_lost(
-                self.max_lost_frames / 30
-            ):  # Convertir frames a segundos (asumiendo 30fps)
-                track.is_active = False
-                self.lost_tracks[track_id] = track
-                del self.active_tracks[track_id]
-
-        # Limpiar tracks muy antiguos
-        cutoff_time = datetime.now() - timedelta(
-            seconds=self.reidentification_window * 2
-        )
-        self.lost_tracks = {
-            tid: track
-            for tid, track in self.lost_tracks.items()
-            if track.last_seen > cutoff_time
-        }
+        tracked_detections = []
+        for idx, detection in enumerate(detections):
+            is_new = bool(result.is_new[idx])
+            item = {**detection, "track_id": tracks[idx].track_id, "is_new": is_new}
+            if is_new:
+                item["reidentified"] = idx in reidentified
+            if counter is not None:
+                attributes = counter.attributes(engine_ids[idx])
+                item["direction"], item["lane"] = attributes["direction"], attributes["lane"]
+                item["crossings"] = crossings.get(engine_ids[idx], [])
+            tracked_detections.append(item)
+
+        # Limpiar tracks muy antiguos (heap ordenado por último frame visto)
+        cutoff_frame = frame_number - window_frames * 2
+        lost_heap = self._lost_heap
+        while lost_heap and lost_heap[0][0] <= cutoff_frame:
+            _, track_id = heapq.heappop(lost_heap)
+            self.lost_tracks.pop(track_id, None)
+            self._lost_features.remove(track_id)
 
         return tracked_detections
 
@@ -308,4 +278,6 @@ class VehicleTracker:
             "active_tracks": len(self.active_tracks),
             "lost_tracks": len(self.lost_tracks),
             "total_unique_vehicles": self.next_id - 1,
+            "association": self.engine.association.name,
+            **({"line_counts": self.counter.get_counts()} if self.counter is not None else {}),
         }
@@ -0,0 +1,55 @@
+"""
+Video Metadata Service
+Instante de grabación de un video subido
+- creation_time del contenedor (MP4/MOV/MKV), leído con el ffmpeg que
+  trae imageio-ffmpeg; las cámaras y las exportaciones de DVR lo escriben
+- Sin ese metadato no se conoce la hora de grabación: startedAt del
+  análisis es la hora de procesamiento
+"""
+
+import functools
+import logging
+import re
+import subprocess
+from datetime import datetime, timezone
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+CREATION_TIME = re.compile(r"creation_time\s*:\s*(\S+)")
+MIN_CAPTURE_YEAR = 1971  # Contenedores sin fecha escriben 1904 o 1970
+
+
+@functools.lru_cache(maxsize=64)
+def capture_start(video_path: str) -> Optional[datetime]:
+    """
+    Instante (UTC) en que empezó la grabación del video
+
+    Returns:
+        datetime con zona horaria o None si el contenedor no lo indica
+    """
+    try:
+        import imageio_ffmpeg
+
+        result = subprocess.run(
+            [imageio_ffmpeg.get_ffmpeg_exe(), "-hide_banner", "-i", video_path],
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo leer la hora de grabación de {video_path}: {e}")
+        return None
+
+    # Sin salida ffmpeg termina con error, pero los metadatos ya están en stderr
+    match = CREATION_TIME.search(result.stderr)
+    if match is None:
+        return None
+    try:
+        started = datetime.fromisoformat(match.group(1).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if started.tzinfo is None:
+        started = started.replace(tzinfo=timezone.utc)
+    return started if started.year >= MIN_CAPTURE_YEAR else None
@@ -5,17 +5,59 @@ Núcleo del sistema de análisis de tráfico
 """
 
 import cv2
+import heapq
 import numpy as np
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Callable, Tuple
 from pathlib import Path
-from datetime import datetime
-from ultralytics import YOLO
 import torch
 from django.conf import settings
 
+from .adaptive_sampling import create_sampler
+from .batch_inference import FrameBatcher
+from .frame_sampling import iter_frames
+from .detections import from_raw
+from .detector_backends import create_detector
+from .pipeline import VideoPipeline
+from .preprocess import FramePreprocessor, choose_imgsz
+from .counting import TrafficCounter, validate_count_lines
+from .crop_store import CropStore, crop_region
+from .frame_quality import FrameQualityMap, quality_score, shared_region
+from .plate_quality import locate_plate
+from .roi import RegionOfInterest, validate_polygon
+from .tracking import create_tracking_engine
 from .vehicle_tracker import VehicleTracker
 
 
+
+class BestFrame:
+    """Candidato a mejor frame de un vehículo (entrada del min-heap por calidad)"""
+
+    __slots__ = (
+        "quality", "confidence", "frame_number", "bbox", "timestamp", "plate_quality",
+        "image_path", "crop",
+    )
+
+    def __init__(self, quality, confidence, frame_number, bbox, timestamp, crop=None):
+        self.quality = quality
+        self.confidence = confidence
+        self.frame_number = frame_number
+        self.bbox = bbox
+        self.timestamp = timestamp  # Segundos desde el inicio del video
+        self.plate_quality = None  # Legibilidad de la placa (process_video con crops_dir)
+        self.image_path = None  # Recorte en disco (process_video con crops_dir)
+        self.crop = crop
+
+    def __lt__(self, other: "BestFrame") -> bool:
+        return (self.quality, self.frame_number) < (other.quality, other.frame_number)
+
+    def as_dict(self, video_start: datetime) -> Dict:
+        """Formato de get_stats (timestamp como datetime desde video_start)"""
+        frame = {name: getattr(self, name) for name in self.__slots__ if name != "crop"}
+        frame["timestamp"] = video_start + timedelta(seconds=self.timestamp)
+        return frame
+
+
 class VideoProcessor:
     """
     Procesador de video con detección de vehículos, tracking y OCR
@@ -42,6 +84,8 @@ class VideoProcessor:
         confidence_threshold: float = 0.5,
         iou_threshold: float = 0.45,
         device: str = "auto",
+        batch_size: Optional[int] = None,
+        queue_size: Optional[int] = None,
     ):
         """
         Args:
@@ -49,9 +93,20 @@ class VideoProcessor:
             confidence_threshold: Umbral mínimo de confianza
             iou_threshold: Umbral IoU para NMS
             device: 'cuda', 'cpu' o 'auto'
+            batch_size: Frames por predict() (None = settings.YOLO_BATCH_SIZE)
+            queue_size: Capacidad de las colas del pipeline (None = settings)
         """
         self.confidence_threshold = confidence_threshold
         self.iou_threshold = iou_threshold
+        self.batch_size = batch_size or getattr(settings, "YOLO_BATCH_SIZE", 8)
+        self.batch_max_wait = getattr(settings, "YOLO_BATCH_MAX_WAIT", 0.05)
+        self.queue_size = queue_size or getattr(settings, "VIDEO_PIPELINE_QUEUE_SIZE", 16)
+        self.sampling_mode = getattr(settings, "FRAME_SAMPLING_MODE", "auto")
+        self.seek_min_stride = getattr(settings, "FRAME_SEEK_MIN_STRIDE", 30)
+        self.frames_per_vehicle = getattr(settings, "FRAMES_PER_VEHICLE", 8)
+        self.frame_quality_threshold = getattr(settings, "FRAME_QUALITY_THRESHOLD", 0.6)
+        self.frame_quality_scale = getattr(settings, "FRAME_QUALITY_SCALE", 0.5)
+        self.keep_crops = False  # process_video(crops_dir=...) guarda los recortes
 
         # Determinar device
         if device == "auto":
@@ -64,21 +119,24 @@ class VideoProcessor:
         # Cargar modelo YOLO
         if model_path is None:
             model_path = str(settings.YOLO_MODEL_PATH)
+        self.model_path = model_path
 
-        self.model = YOLO(model_path)
-        self.model.to(self.device)
+        # Modelo compartido del proceso (se carga y calienta una sola vez, al
+        # primer uso); en CPU se usa ONNX Runtime si está disponible
+        self.detector = None  # process_video lo crea con el imgsz del video
 
         # Inicializar tracker
-        self.tracker = VehicleTracker(
-            iou_threshold=0.3,
-            max_lost_frames=150,
-            reidentification_window=settings.REIDENTIFICATION_TIME_WINDOW,
-        )
+        self.tracker = self._create_tracker()
+
+        # Mejores frames por vehículo: {track_id: min-heap de BestFrame}
+        self._best_frames: Dict[str, List[BestFrame]] = {}
+        self.video_start = datetime.now()  # Origen de los datetime de las detecciones
 
         # Estadísticas
         self.stats = {
             "total_frames": 0,
             "processed_frames": 0,
+            "video_fps": 0,
             "vehicles_detected": {},  # {track_id: {...}}
             "vehicle_counts": {
                 "car": 0,
@@ -90,7 +148,26 @@ class VideoProcessor:
             },
         }
 
-    def _detect_vehicles(self, frame: np.ndarray) -> List[Dict]:
+    def _create_detector(self, imgsz: int):
+        """Detector del registro del proceso para un tamaño de entrada"""
+        return create_detector(
+            self.model_path,
+            device=self.device,
+            imgsz=imgsz,
+            conf=self.confidence_threshold,
+            iou=self.iou_threshold,
+            classes=list(self.VEHICLE_CLASSES),
+        )
+
+    def _create_tracker(self) -> VehicleTracker:
+        """Tracker sobre el motor común (misma asociación que las tareas Celery)"""
+        return VehicleTracker(
+            engine=create_tracking_engine(),
+            reidentification_window=settings.REIDENTIFICATION_TIME_WINDOW,
+            class_names=self.VEHICLE_CLASSES,
+        )
+
+    def _detect_vehicles(self, frame: np.ndarray) -> np.ndarray:
         """
         Detecta vehículos en un frame usando YOLO
 
@@ -98,170 +175,196 @@ class VideoProcessor:
             frame: Frame del video (BGR)
 
         Returns:
-            Lista de detecciones con formato:
-            [{bbox: (x,y,w,h), class: str, confidence: float}]
+            Array estructurado de detecciones (bbox, xyxy, conf, cls)
         """
         # Ejecutar detección
-        results = self.model(
-            frame, conf=self.confidence_threshold, iou=self.iou_threshold, verbose=False
-        )
+        if self.detector is None:
+            self.detector = self._create_detector(640)
+        return self._parse_detections(self.detector.predict([frame])[0])
 
-        detections = []
-
-        for result in results:
-            boxes = result.boxes
-
-            for box in boxes:
-                class_id = int(box.cls[0])
-
-                # Filtrar solo vehículos
-                if class_id in self.VEHICLE_CLASSES:
-                    # Obtener bounding box (x, y, width, height)
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    x, y, w, h = int(x1), int(y1), int(x2 - x1), int(y2 - y1)
-
-                    confidence = float(box.conf[0])
-                    vehicle_type = self.VEHICLE_CLASSES[class_id]
+    def _parse_detections(self, result) -> np.ndarray:
+        """
+        Convierte las detecciones de un frame en detecciones de vehículos
 
-                    detections.append(
-                        {
-                            "bbox": (x, y, w, h),
-                            "class": vehicle_type,
-                            "confidence": confidence,
-                        }
-                    )
+        Args:
+            result: Array (N, 6) [x1, y1, x2, y2, conf, cls] del Detector
 
-        return detections
+        Returns:
+            Array estructurado de detecciones (services.detections)
+        """
+        return from_raw(result, self.VEHICLE_CLASSES)
 
     def _evaluate_frame_quality(
-        self, frame: np.ndarray, bbox: Tuple[int, int, int, int]
+        self,
+        frame: np.ndarray,
+        bbox: Tuple[int, int, int, int],
+        quality_map: Optional[FrameQualityMap] = None,
     ) -> float:
         """
         Evalúa la calidad de un frame para OCR de placas
 
         Factores evaluados:
-        - Nitidez (blur detection)
+        - Nitidez (varianza del Laplaciano, en la imagen reducida)
         - Brillo
         - Tamaño del vehículo
 
         Args:
             frame: Frame completo
             bbox: Bounding box del vehículo (x, y, w, h)
+            quality_map: Mapa de calidad compartido del frame (None = sólo la región)
 
         Returns:
             Score de calidad (0-1)
         """
         x, y, w, h = bbox
-
-        # Extraer ROI
-        roi = frame[y : y + h, x : x + w]
-
-        if roi.size == 0:
+        if w <= 0 or h <= 0:
             return 0.0
 
-        # 1. Evaluar nitidez (Laplacian variance)
-        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-        laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-        sharpness_score = min(laplacian_var / 500.0, 1.0)  # Normalizar
+        if quality_map is None:
+            # Evaluación aislada: sólo la región del vehículo
+            roi = frame[max(0, y) : y + h, max(0, x) : x + w]
+            if roi.size == 0:
+                return 0.0
+            quality_map = FrameQualityMap(roi, self.frame_quality_scale)
+            bbox = (0, 0, roi.shape[1], roi.shape[0])
 
-        # 2. Evaluar brillo
-        brightness = np.mean(gray)
-        brightness_score = 1.0 - abs(brightness - 127.0) / 127.0  # Óptimo en 127
+        # 1. Nitidez y 2. brillo por sumas de área
+        sharpness, brightness = quality_map.measure([bbox])
 
-        # 3. Evaluar tamaño (vehículos más grandes = mejor para OCR)
-        area = w * h
-        size_score = min(area / 50000.0, 1.0)  # Normalizar (50k pixels = score 1.0)
+        # 3. Tamaño (vehículos más grandes = mejor para OCR) y combinación
+        return quality_score(sharpness[0], brightness[0], w, h)
 
-        # Combinar scores
-        quality_score = (
-            sharpness_score * 0.5 + brightness_score * 0.3 + size_score * 0.2
-        )
-
-        return quality_score
+    def _may_improve(self, vehicle_id: str, bbox: Tuple[int, int, int, int]) -> bool:
+        """
+        Descarte rápido: False si ni con nitidez y brillo perfectos la
+        detección entraría en los mejores frames del vehículo
+        """
+        upper_bound = quality_score(1.0, 1.0, bbox[2], bbox[3])
+        if upper_bound < self.frame_quality_threshold:
+            return False
+        best_frames = self._best_frames.get(vehicle_id)
+        if not best_frames:
+            return True
+        return len(best_frames) < self.frames_per_vehicle or upper_bound > best_frames[0].quality
 
     def _extract_best_frames(
         self,
         vehicle_id: str,
         frame: np.ndarray,
         bbox: Tuple[int, int, int, int],
-        quality: float,
+        quality: Optional[float] = None,
         vehicle_type: str = "car",
         confidence: float = 0.8,
+        frame_number: Optional[int] = None,
+        quality_map: Optional[FrameQualityMap] = None,
     ) -> bool:
         """
         Determina si un frame debe guardarse como "mejor frame" para un vehículo
 
         Mantiene los mejores N frames por vehículo (configurado en settings)
+        en un min-heap por calidad. Con el heap lleno, si ni la calidad
+        máxima posible con el tamaño de la caja supera al peor frame, la
+        calidad no se evalúa.
 
         Args:
             vehicle_id: ID único del vehículo
             frame: Frame actual
             bbox: Bounding box
-            quality: Score de calidad del frame
+            quality: Score de calidad del frame (None = evaluarlo aquí sólo si
+                el frame puede entrar)
             vehicle_type: Tipo de vehículo detectado
             confidence: Confianza de la detección
+            frame_number: Número de frame en el video (None = frames procesados)
+            quality_map: Mapa de calidad compartido por las detecciones del
+                frame (se construye sólo si alguna puede mejorar su heap)
 
         Returns:
             True si el frame fue guardado
         """
-        now = datetime.now()
-
-        if vehicle_id not in self.stats["vehicles_detected"]:
-            self.stats["vehicles_detected"][vehicle_id] = {
+        if frame_number is None:
+            frame_number = self.stats["processed_frames"]
+        timestamp = frame_number / (self.stats["video_fps"] or 30)
+        detected_at = self.video_start + timedelta(seconds=timestamp)
+        vehicle_data = self.stats["vehicles_detected"].get(vehicle_id)
+
+        if vehicle_data is None:
+            vehicle_data = self.stats["vehicles_detected"][vehicle_id] = {
                 "track_id": vehicle_id,
                 "class_name": vehicle_type,
-                "first_detected_at": now,
-                "last_detected_at": now,
+                "first_detected_at": detected_at,
+                "last_detected_at": detected_at,
                 "total_confidence": confidence,
                 "detection_count": 1,
-                "best_frames": [],
+                "best_frames": [],  # get_stats: dicts de get_best_frames
                 "frame_count": 1,
             }
         else:
-            vehicle_data = self.stats["vehicles_detected"][vehicle_id]
-            vehicle_data["last_detected_at"] = now
+            vehicle_data["last_detected_at"] = detected_at
             vehicle_data["total_confidence"] += confidence
             vehicle_data["detection_count"] += 1
             vehicle_data["frame_count"] += 1
 
-        vehicle_data = self.stats["vehicles_detected"][vehicle_id]
-
-        # Mantener solo los mejores N frames
-        max_frames = settings.FRAMES_PER_VEHICLE
-        best_frames = vehicle_data["best_frames"]
-
-        # Si aún no tenemos suficientes frames, agregar
-        if len(best_frames) < max_frames:
-            if quality >= settings.FRAME_QUALITY_THRESHOLD:
-                best_frames.append(
-                    {
-                        "quality": quality,
-                        "confidence": confidence,
-                        "frame_number": self.stats["processed_frames"],
-                        "bbox": bbox,
-                        "timestamp": datetime.now(),
-                    }
-                )
-                best_frames.sort(key=lambda x: x["quality"], reverse=True)
-                return True
+        best_frames = self._best_frames.setdefault(vehicle_id, [])
+        full = len(best_frames) >= self.frames_per_vehicle
+        if quality is None:
+            if not self._may_improve(vehicle_id, bbox):
+                return False
+            quality = self._evaluate_frame_quality(frame, bbox, quality_map)
+        if quality < self.frame_quality_threshold:
+            return False
+
+        entry = BestFrame(
+            quality, confidence, frame_number, bbox, timestamp,
+            crop_region(frame, bbox) if self.keep_crops and frame is not None else None,
+        )
+        if not full:
+            heapq.heappush(best_frames, entry)
+        elif best_frames[0] < entry:
+            heapq.heapreplace(best_frames, entry)
         else:
-            # Reemplazar el peor frame si encontramos uno mejor
-            worst_frame = min(best_frames, key=lambda x: x["quality"])
-            if quality > worst_frame["quality"]:
-                best_frames.remove(worst_frame)
-                best_frames.append(
-                    {
-                        "quality": quality,
-                        "confidence": confidence,
-                        "frame_number": self.stats["processed_frames"],
-                        "bbox": bbox,
-                        "timestamp": datetime.now(),
-                    }
-                )
-                best_frames.sort(key=lambda x: x["quality"], reverse=True)
-                return True
+            return False
+        return True
 
-        return False
+    def _score_plates(self):
+        """
+        Localiza la placa en los recortes de los mejores frames y elige el
+        mejor frame para OCR de cada vehículo (best_frame_for_plate)
+        """
+        for vehicle_id, vehicle_data in self.stats["vehicles_detected"].items():
+            best = None
+            for entry in self._best_frames.get(vehicle_id, []):
+                region = locate_plate(entry.crop)
+                entry.plate_quality = region.score if region is not None else 0.0
+                if entry.plate_quality and (best is None or entry.plate_quality > best.plate_quality):
+                    best = entry
+            vehicle_data["best_frame_for_plate"] = best.frame_number if best is not None else None
+
+    def _save_crops(self, crops_dir: str) -> Dict:
+        """Escribe los recortes de los mejores frames de cada vehículo"""
+        crop_store = CropStore(
+            crops_dir,
+            image_format=getattr(settings, "FRAME_CROPS_FORMAT", "jpg"),
+            quality=getattr(settings, "FRAME_CROPS_QUALITY", 90),
+            workers=getattr(settings, "FRAME_CROPS_WORKERS", 2),
+            dedup_distance=getattr(settings, "FRAME_CROPS_DEDUP_DISTANCE", 4),
+        )
+        try:
+            for best_frames in self._best_frames.values():
+                entries = sorted(best_frames, reverse=True)
+                paths = crop_store.save([entry.crop for entry in entries])
+                for entry, path in zip(entries, paths):
+                    entry.image_path = path
+                    entry.crop = None
+        finally:
+            crop_store.close()
+        return crop_store.get_stats()
+
+    def get_best_frames(self, vehicle_id: str) -> List[Dict]:
+        """Mejores frames de un vehículo, de mayor a menor calidad"""
+        return [
+            entry.as_dict(self.video_start)
+            for entry in sorted(self._best_frames.get(vehicle_id, []), reverse=True)
+        ]
 
     def process_video(
         self,
@@ -269,6 +372,10 @@ class VideoProcessor:
         progress_callback: Optional[Callable] = None,
         frame_callback: Optional[Callable] = None,
         skip_frames: int = 0,
+        roi_polygon: Optional[List[List[float]]] = None,
+        count_lines: Optional[List[Dict]] = None,
+        lane_polygons: Optional[List[List[List[float]]]] = None,
+        crops_dir: Optional[str] = None,
     ) -> Dict:
         """
         Procesa un video completo frame por frame
@@ -277,7 +384,14 @@ class VideoProcessor:
             video_source: Ruta al archivo de video o URL de stream
             progress_callback: Función callback(frame_num, total_frames, stats)
             frame_callback: Función callback(frame, detections) para procesar cada frame
-            skip_frames: Procesar 1 de cada N frames (0 = procesar todos)
+            skip_frames: Saltar N frames entre cada frame procesado (0 = procesar
+                todos; sólo con skip_frames > 0 se usa el muestreo adaptativo)
+            roi_polygon: Polígono [[x, y], ...] de la vía en píxeles del video;
+                la detección se ejecuta sólo sobre su rectángulo envolvente
+            count_lines: Líneas de conteo [{name, points, direction}] en píxeles del video
+            lane_polygons: Polígonos de carril en píxeles del video
+            crops_dir: Directorio donde guardar los recortes de los mejores
+                frames (image_path en get_best_frames); None = no guardar
 
         Returns:
             Diccionario con estadísticas del procesamiento
@@ -298,30 +412,114 @@ class VideoProcessor:
 
         self.stats["total_frames"] = total_frames
         self.stats["video_fps"] = fps
+        self.video_start = datetime.now()
+        self.tracker.fps = fps or 30  # Tiempos del tracker en tiempo de video
         self.stats["video_resolution"] = (width, height)
 
         print(f"📊 Video info: {width}x{height}, {fps} FPS, {total_frames} frames")
 
-        frame_count = 0
+        self.keep_crops = crops_dir is not None
 
-        try:
-            while True:
-                ret, frame = cap.read()
+        # Conteo por líneas y carriles dentro del tracker
+        if count_lines or lane_polygons:
+            self.tracker.counter = TrafficCounter(
+                validate_count_lines(count_lines or []),
+                [validate_polygon(polygon) for polygon in lane_polygons or []],
+                (width, height),
+            )
 
-                if not ret:
-                    break
+        roi = None
+        if roi_polygon:
+            roi = RegionOfInterest(
+                roi_polygon,
+                (width, height),
+                padding=getattr(settings, "CAMERA_ROI_PADDING", 32),
+            )
+            if roi.covers_frame:
+                roi = None
+
+        # Tamaño de entrada según la región analizada (sin escalar hacia arriba)
+        x0, y0, x1, y1 = roi.rect if roi is not None else (0, 0, width, height)
+        imgsz = choose_imgsz(
+            (x1 - x0, y1 - y0),
+            video_size=(width, height),
+            reference_latency_ms=getattr(settings, "YOLO_REFERENCE_LATENCY_MS", {}).get(
+                "cpu" if self.device == "cpu" else "cuda"
+            ),
+            latency_budget_ms=getattr(settings, "YOLO_LATENCY_BUDGET_MS", None),
+            min_imgsz=getattr(settings, "YOLO_MIN_IMGSZ", 320),
+            max_imgsz=getattr(settings, "YOLO_MAX_IMGSZ", 960),
+        )
+        if self.detector is None or imgsz != self.detector.imgsz:
+            self.detector = self._create_detector(imgsz)
+        print(f"📐 imgsz={imgsz}")
+
+        if roi is not None:
+            print(f"✂️ ROI: {roi.rect} ({roi.area_ratio:.0%} del frame)")
+
+        # Recorte ROI + reducción en el decodificador (mismo preprocesado que
+        # las tareas Celery); el tracking y los recortes usan el frame original
+        preprocessor = FramePreprocessor(
+            (width, height),
+            imgsz,
+            roi=roi,
+            pool_size=FramePreprocessor.pool_size_for(self.queue_size, self.batch_size),
+        )
 
-                frame_count += 1
+        # Muestreo adaptativo: stride mayor en tramos estáticos (skip_frames=0
+        # pide todos los frames: stride fijo)
+        sampler = (
+            create_sampler(skip_frames + 1, roi=roi.rect if roi is not None else None)
+            if skip_frames > 0
+            else None
+        )
+        if sampler is not None:
+            frames = sampler.iter_frames(
+                cap, mode=self.sampling_mode, seek_min_stride=self.seek_min_stride
+            )
+        else:
+            frames = iter_frames(
+                cap,
+                stride=skip_frames + 1,
+                mode=self.sampling_mode,
+                seek_min_stride=self.seek_min_stride,
+            )
 
-                # Skip frames si está configurado
-                if skip_frames > 0 and frame_count % (skip_frames + 1) != 0:
-                    continue
+        # Pipeline: decode (hilo) → inferencia por lotes (hilo) → tracking
+        pipeline = VideoPipeline(
+            preprocessor.iter_prepared(frames, keep_originals=True),
+            FrameBatcher(
+                self.detector,
+                batch_size=self.batch_size,
+                max_wait=self.batch_max_wait,
+            ),
+            postprocess=lambda _, __, raw: self._parse_detections(preprocessor.to_frame(raw)),
+            queue_size=self.queue_size,
+        )
 
-                # Detectar vehículos
-                detections = self._detect_vehicles(frame)
+        next_progress = 0
+        try:
+            for frame_count, _, detections in pipeline:
+                frame = preprocessor.pop_original(frame_count)
 
                 # Tracking
-                tracked_detections = self.tracker.update(detections, frame)
+                tracked_detections = self.tracker.update(detections, frame, frame_count)
+                if sampler is not None:
+                    sampler.observe_tracks(len(self.tracker.engine))
+
+                # Gris e integrales una vez por frame, sobre la región de las
+                # detecciones que aún pueden mejorar los mejores frames de su
+                # vehículo (cajas dispersas: cada una se evalúa por separado)
+                region = shared_region([
+                    detection["bbox"]
+                    for detection in tracked_detections
+                    if self._may_improve(detection["track_id"], detection["bbox"])
+                ])
+                quality_map = (
+                    FrameQualityMap(frame, self.frame_quality_scale, region=region)
+                    if region is not None
+                    else None
+                )
 
                 # Procesar cada detección tracked
                 for detection in tracked_detections:
@@ -336,20 +534,20 @@ class VideoProcessor:
                             self.stats["vehicle_counts"].get(vehicle_type, 0) + 1
                         )
 
-                    # Evaluar calidad del frame
-                    quality = self._evaluate_frame_quality(frame, bbox)
-
-                    # Guardar frame si es de buena calidad
+                    # Guardar frame si es de buena calidad (evalúa la calidad sólo si puede entrar)
                     self._extract_best_frames(
-                        track_id, frame, bbox, quality, vehicle_type, confidence
+                        track_id, frame, bbox,
+                        vehicle_type=vehicle_type,
+                        confidence=confidence,
+                        frame_number=frame_count,
+                        quality_map=quality_map,
                     )
 
                 self.stats["processed_frames"] += 1
 
-                # Callback de progreso
-                if (
-                    progress_callback and frame_count % 30 == 0
-                ):  # Cada segundo (asumiendo 30fps)
+                # Callback de progreso cada segundo de video, sea cual sea el stride
+                if progress_callback and frame_count >= next_progress:
+                    next_progress = frame_count + (fps or 30)
                     progress_callback(frame_count, total_frames, self.get_stats())
 
                 # Callback de frame procesado
@@ -359,6 +557,14 @@ class VideoProcessor:
         finally:
             cap.release()
 
+        self.stats["pipeline"] = pipeline.get_stats()
+        if sampler is not None:
+            self.stats["sampling"] = sampler.get_stats()
+        if crops_dir is not None:
+            if getattr(settings, "PLATE_QUALITY_ENABLED", True):
+                self._score_plates()
+            self.stats["crops"] = self._save_crops(crops_dir)
+
         print(
             f"✅ Procesamiento completado: {self.stats['processed_frames']} frames procesados"
         )
@@ -425,7 +631,7 @@ class VideoProcessor:
         """Retorna estadísticas completas del procesamiento"""
         tracker_stats = self.tracker.get_stats()
 
-        # Calcular average_confidence para cada vehículo
+        # Calcular average_confidence y los mejores frames (dicts) de cada vehículo
         for vehicle_id, vehicle_data in self.stats["vehicles_detected"].items():
             if vehicle_data["detection_count"] > 0:
                 vehicle_data["average_confidence"] = (
@@ -433,6 +639,7 @@ class VideoProcessor:
                 )
             else:
                 vehicle_data["average_confidence"] = 0.0
+            vehicle_data["best_frames"] = self.get_best_frames(vehicle_id)
 
         return {
             **self.stats,
@@ -442,15 +649,13 @@ class VideoProcessor:
 
     def reset(self):
         """Reinicia el procesador para un nuevo video"""
-        self.tracker = VehicleTracker(
-            iou_threshold=0.3,
-            max_lost_frames=150,
-            reidentification_window=settings.REIDENTIFICATION_TIME_WINDOW,
-        )
+        self.tracker = self._create_tracker()
+        self._best_frames = {}
 
         self.stats = {
             "total_frames": 0,
             "processed_frames": 0,
+            "video_fps": 0,
             "vehicles_detected": {},
             "vehicle_counts": {
                 "car": 0,
@@ -4,44 +4,868 @@ Tareas de Celery para procesamiento de video en segundo plano.
 """
 
 import os
+import json
+import shutil
 import logging
 from datetime import datetime, timedelta
-from celery import shared_task
+from celery import chord, group, shared_task
 from django.conf import settings
 from django.utils import timezone
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from sympy import true
 import torch
-import time
 from scipy.spatial import distance
+import numpy as np
+
+from apps.traffic_app.services.appearance import crop_features
+from apps.traffic_app.services.detections import from_raw, to_dicts
+from apps.traffic_app.services.crop_store import crop_region
+from apps.traffic_app.services.track_store import FrameSample, Trajectory
 
 logger = logging.getLogger(__name__)
 
 
+# ============================================================================
+# CONFIGURACIÓN DEL ANÁLISIS - Optimizaciones para RTX 3050 (4GB VRAM)
+# ============================================================================
+SKIP_FRAMES = 3          # Procesar cada 3 frames
+CONF_THRESHOLD = 0.5     # Umbral de confianza
+IOU_THRESHOLD = 0.45     # IoU para NMS
+USE_HALF_PRECISION = False  # ✅ CAMBIAR DE OFF A False
+MIN_FRAMES_TO_SAVE = 10  # Mínimo de frames para guardar vehículo
+VEHICLE_FLUSH_BATCH = 50  # Tracks terminados que se guardan juntos durante el análisis
+APPEARANCE_SAMPLE_EVERY = 10  # Detecciones entre muestras de apariencia (re-ID entre cámaras)
+
+# Clases COCO de vehículos detectadas por YOLO
+VEHICLE_CLASS_NAMES = {2: "car", 3: "motorcycle", 5: "bus", 7: "truck"}
+
+
+def _send_ws(analysis_id, message_type, data):
+    """Enviar mensaje WebSocket al grupo del análisis"""
+    try:
+        async_to_sync(get_channel_layer().group_send)(
+            f"traffic_analysis_{analysis_id}",
+            {"type": message_type, "data": data}
+        )
+    except Exception as e:
+        #logger.warning(f"⚠️ Error WS: {e}")
+        ...
+
+
+def _parse_detections(result):
+    """
+    Convierte la salida del detector de un frame en un array de
+    detecciones de vehículos (hilo de inferencia)
+
+    Args:
+        result: Array (N, 6) [x1, y1, x2, y2, conf, cls] del Detector
+    """
+    return from_raw(result, VEHICLE_CLASS_NAMES)
+
+
+def _cut_crops(frame, detections):
+    """
+    Recortes de las detecciones de un frame decodificado (hilo de
+    inferencia): el frame completo se libera en cuanto se recorta
+
+    Returns:
+        Lista alineada con `detections` (None si la caja queda fuera)
+    """
+    return [crop_region(frame, bbox) for bbox in detections["bbox"].tolist()]
+
+
+def _record_detections(
+    tracked_vehicles, track_ids, detections, frame_count, timestamp_seconds,
+    crops=None,
+):
+    """
+    Acumula las detecciones de un frame en tracked_vehicles
+
+    Por vehículo se guardan agregados (conteo, confianza), la trayectoria
+    compacta y una muestra acotada de los mejores frames (confianza x área),
+    no un dict por detección. Con `crops` (_cut_crops, a resolución del
+    video) los frames que entran a la muestra guardan además su recorte.
+
+    Returns:
+        Lista [(track_id, vehicle_type)] de vehículos vistos por primera vez
+    """
+    new_vehicles = []
+    sample_size = getattr(settings, "FRAMES_PER_VEHICLE", 8)
+
+    for row, (track_id, (x, y, w, h), conf, cls) in enumerate(zip(
+        track_ids.tolist(),
+        detections["bbox"].tolist(),
+        detections["conf"].tolist(),
+        detections["cls"].tolist(),
+    )):
+        vehicle = tracked_vehicles.get(track_id)
+        
+        # Guardar en diccionario de vehículos rastreados
+        if vehicle is None:
+            vehicle_type = VEHICLE_CLASS_NAMES.get(cls, "unknown")
+            vehicle = tracked_vehicles[track_id] = {
+                "type": vehicle_type,
+                "first_frame": frame_count,
+                "last_frame": frame_count,
+                "first_seconds": timestamp_seconds,
+                "last_seconds": timestamp_seconds,
+                "count": 1,
+                "confidence_sum": conf,
+                "trajectory": Trajectory(),
+                "samples": FrameSample(sample_size),
+            }
+            new_vehicles.append((track_id, vehicle_type))
+        else:
+            # Actualizar información del vehículo existente
+            vehicle["last_frame"] = frame_count
+            vehicle["last_seconds"] = timestamp_seconds
+            vehicle["count"] += 1
+            vehicle["confidence_sum"] += conf
+        
+        # Trayectoria compacta (velocidad, unión de segmentos)
+        vehicle["trajectory"].append(frame_count, (x, y, w, h), conf)
+
+        # Muestra de los mejores frames: el dict sólo se crea si entra
+        score = conf * w * h
+        if vehicle["samples"].accepts(score):
+            sample = {
+                "frameNumber": frame_count,
+                "timestamp_seconds": timestamp_seconds,
+                "boundingBox": {"x": x, "y": y, "width": w, "height": h},
+                "confidence": conf,
+                "score": score,
+            }
+            if crops is not None:
+                sample["crop"] = crops[row]
+            vehicle["samples"].add(sample)
+
+    return new_vehicles
+
+
+def _update_appearance(tracked_vehicles, track_ids, crops):
+    """
+    Acumula la apariencia de los vehículos del frame (re-ID entre cámaras)
+
+    Se muestrea al aparecer y cada APPEARANCE_SAMPLE_EVERY detecciones,
+    con una sola extracción por frame. `crops` son los recortes a
+    resolución completa de _cut_crops (None = frame original no disponible).
+    """
+    if crops is None:
+        return
+
+    rows = [
+        i for i, track_id in enumerate(track_ids.tolist())
+        if tracked_vehicles[track_id]["count"] % APPEARANCE_SAMPLE_EVERY == 1
+    ]
+    if not rows:
+        return
+
+    for row, feature in zip(rows, crop_features([crops[row] for row in rows])):
+        vehicle = tracked_vehicles[int(track_ids[row])]
+        vehicle["appearance"] = vehicle.get("appearance", 0) + feature
+
+
+def _capture_start(analysis):
+    """
+    Hora de grabación del video del análisis (services.video_metadata), o
+    None si el contenedor no la indica o la re-ID está desactivada
+    """
+    if not getattr(settings, "REID_CROSS_CAMERA_ENABLED", True) or not analysis.videoPath:
+        return None
+
+    from apps.traffic_app.services.video_metadata import capture_start
+
+    video_path = analysis.videoPath
+    if not os.path.isabs(video_path):
+        video_path = os.path.join(settings.MEDIA_ROOT, video_path)
+    return capture_start(video_path)
+
+
+def _reid_feature(vdata, capture_start):
+    """
+    Apariencia normalizada e instantes de grabación del vehículo
+    (Vehicle.reidFeature), o None sin apariencia u hora de grabación
+    """
+    appearance = vdata.get("appearance")
+    if appearance is None or capture_start is None:
+        return None
+
+    appearance = np.asarray(appearance, dtype=np.float32)
+    appearance = appearance / (np.linalg.norm(appearance) + 1e-7)
+    start = capture_start.timestamp()
+    return {
+        "feature": appearance.round(5).tolist(),
+        "firstSeenAt": start + vdata["first_seconds"],
+        "lastSeenAt": start + vdata["last_seconds"],
+    }
+
+
+def _link_cross_camera(analysis, saved):
+    """
+    Enlaza los vehículos guardados con avistamientos de cámaras vecinas
+    (services.reid_gallery) y los agrega a la galería
+
+    Args:
+        saved: [(track_id, Vehicle)] de _save_tracked_vehicles
+    """
+    if not getattr(settings, "REID_CROSS_CAMERA_ENABLED", True):
+        return 0
+
+    from apps.traffic_app.services.reid_gallery import link_vehicles
+
+    try:
+        links = link_vehicles(analysis, [vehicle for _, vehicle in saved])
+    except Exception as e:
+        logger.error(f"✖️ Error en re-identificación entre cámaras: {e}")
+        return 0
+
+    if links:
+        logger.info(f"🔗 {links} vehículos enlazados con cámaras vecinas")
+    return links
+
+
+def _load_counter(camera, frame_size, count_from_frame=1):
+    """
+    Contador por líneas virtuales y carriles de la cámara (services.counting)
+
+    Returns:
+        TrafficCounter o None si la cámara no tiene líneas ni carriles
+    """
+    from apps.traffic_app.services.counting import TrafficCounter
+
+    if camera is None:
+        return None
+    try:
+        counter = TrafficCounter.from_camera(camera, frame_size, count_from_frame=count_from_frame)
+    except ValueError as e:
+        logger.warning(f"⚠️ Líneas/carriles inválidos en cámara {camera.pk}, sin conteo por línea: {e}")
+        return None
+    if counter is not None:
+        logger.info(
+            f"🚦 Cámara {camera.pk}: {len(counter.names)} líneas de conteo, {counter.num_lanes} carriles"
+        )
+    return counter
+
+
+def _update_counts(counter, tracked_vehicles, update, detections, frame_count):
+    """
+    Cruces de línea y carril de los tracks del frame
+
+    Los atributos (dirección, votos por carril) se pasan a tracked_vehicles
+    cuando el track termina (update.removed) o con _finish_counts.
+
+    Returns:
+        Cruces nuevos [(track_id, línea, dirección)]
+    """
+    crossings = counter.update(update.track_ids, detections["bbox"], frame_count)
+    _finish_counts(counter, tracked_vehicles, update.removed)
+    return crossings
+
+
+def _finish_counts(counter, tracked_vehicles, track_ids):
+    """Guarda dirección y votos por carril de tracks terminados en tracked_vehicles"""
+    for track_id in track_ids:
+        vehicle = tracked_vehicles.get(track_id)
+        attributes = counter.attributes(track_id)
+        counter.forget(track_id)
+        if vehicle is not None:
+            vehicle["direction"] = attributes["direction"]
+            vehicle["lane_votes"] = attributes["lane_votes"]
+
+
+def _load_speed_estimator(camera, frame_size, fps):
+    """
+    Estimador de velocidad con la calibración de la cámara (services.speed)
+
+    Returns:
+        SpeedEstimator o None si la cámara no está calibrada
+    """
+    from apps.traffic_app.services.speed import SpeedEstimator
+
+    if camera is None:
+        return None
+    try:
+        return SpeedEstimator.from_camera(
+            camera,
+            frame_size,
+            fps,
+            smoothing_seconds=getattr(settings, "SPEED_SMOOTHING_SECONDS", 0.5),
+            max_speed_kmh=getattr(settings, "SPEED_MAX_KMH", 250.0),
+        )
+    except ValueError as e:
+        logger.warning(f"⚠️ Calibración de velocidad inválida en cámara {camera.pk}: {e}")
+        return None
+
+
+def _crop_directory(analysis_id):
+    """Directorio de los recortes de un análisis"""
+    return os.path.join(
+        getattr(settings, "FRAME_CROPS_DIR", os.path.join(settings.MEDIA_ROOT, "vehicle_crops")),
+        str(analysis_id),
+    )
+
+
+def _create_crop_store(analysis_id):
+    """
+    Escritor en segundo plano de los recortes de los frames guardados
+    (services.crop_store), o None si está desactivado
+    """
+    if not getattr(settings, "FRAME_CROPS_ENABLED", True):
+        return None
+
+    from apps.traffic_app.services.crop_store import CropStore
+
+    return CropStore(
+        _crop_directory(analysis_id),
+        image_format=getattr(settings, "FRAME_CROPS_FORMAT", "jpg"),
+        quality=getattr(settings, "FRAME_CROPS_QUALITY", 90),
+        workers=getattr(settings, "FRAME_CROPS_WORKERS", 2),
+        dedup_distance=getattr(settings, "FRAME_CROPS_DEDUP_DISTANCE", 4),
+    )
+
+
+def _score_frames(vehicles, min_frames=MIN_FRAMES_TO_SAVE):
+    """
+    Puntúa los recortes de la muestra de cada vehículo guardable: calidad
+    del frame (frameQuality: nitidez, brillo, tamaño) y, con
+    PLATE_QUALITY_ENABLED, legibilidad de la placa localizada (plateQuality)
+
+    Se ejecuta antes de _store_crops, que libera los recortes.
+    """
+    from apps.traffic_app.services.frame_quality import crop_quality
+    from apps.traffic_app.services.plate_quality import locate_plate
+
+    scale = getattr(settings, "FRAME_QUALITY_SCALE", 0.5)
+    plates = getattr(settings, "PLATE_QUALITY_ENABLED", True)
+    for vdata in vehicles:
+        if vdata["count"] < min_frames:
+            continue
+        for frame in vdata["samples"].frames():
+            if "crop" not in frame:
+                continue  # Sin recorte (frame de otro segmento ya puntuado)
+            frame["frameQuality"] = round(crop_quality(frame["crop"], scale), 4)
+            if plates:
+                region = locate_plate(frame["crop"])
+                frame["plateQuality"] = round(region.score, 4) if region is not None else 0.0
+
+
+def _store_crops(crop_store, vehicles, min_frames=MIN_FRAMES_TO_SAVE):
+    """
+    Encola los recortes de la muestra de cada vehículo guardable y los
+    reemplaza por su ruta (imagePath) en los frames de la muestra
+
+    Args:
+        min_frames: Detecciones mínimas del vehículo (en un segmento un
+            track corto puede completarse con el del segmento vecino)
+    """
+    for vdata in vehicles:
+        frames = vdata["samples"].frames()
+        crops = [frame.pop("crop", None) for frame in frames]
+        if crop_store is None or vdata["count"] < min_frames:
+            continue
+        for frame, path in zip(frames, crop_store.save(crops)):
+            if path is not None:
+                frame["imagePath"] = path
+
+
+def _finish_shard_tracks(tracked_vehicles, track_ids, crop_store=None):
+    """
+    Cierra tracks terminados de un segmento: puntúa y guarda sus recortes
+    y los libera de memoria en el formato del resultado (JSON para Celery)
+
+    Los frames de la muestra viajan con frameQuality, plateQuality e
+    imagePath (recortes en disco); cualquier track cuenta (min_frames=1)
+    porque puede completarse con el del segmento vecino.
+
+    Returns:
+        Lista de tracks {track_id, type, ..., trajectory, samples[, appearance]}
+    """
+    finished = {
+        track_id: tracked_vehicles.pop(track_id)
+        for track_id in track_ids
+        if track_id in tracked_vehicles
+    }
+    _score_frames(finished.values(), min_frames=1)
+    _store_crops(crop_store, finished.values(), min_frames=1)
+
+    tracks = []
+    for track_id, vdata in finished.items():
+        track = {
+            "track_id": track_id,
+            **vdata,
+            "trajectory": vdata["trajectory"].to_dict(),
+            "samples": vdata["samples"].frames(),
+        }
+        if "appearance" in vdata:
+            track["appearance"] = vdata["appearance"].tolist()
+        tracks.append(track)
+    return tracks
+
+
+def _discard_orphan_crops(shard_results, tracked_vehicles):
+    """
+    Borra los recortes escritos por los segmentos que no quedan en ningún
+    vehículo guardable tras la unión (frames desplazados de la muestra al
+    unir tracks y tracks con menos de MIN_FRAMES_TO_SAVE detecciones)
+
+    Returns:
+        Número de archivos borrados
+    """
+    from apps.traffic_app.services.crop_store import remove_crops
+
+    kept = {
+        frame["imagePath"]
+        for vdata in tracked_vehicles.values()
+        if vdata["count"] >= MIN_FRAMES_TO_SAVE
+        for frame in vdata["samples"].frames()
+        if frame.get("imagePath")
+    }
+    written = {
+        frame["imagePath"]
+        for shard in shard_results
+        for track in shard["tracks"]
+        for frame in track["samples"]
+        if frame.get("imagePath")
+    }
+    return remove_crops(written - kept)
+
+
+def _count_vehicle_types(tracked_vehicles):
+    """Contar vehículos por tipo"""
+    counts = {"car": 0, "truck": 0, "motorcycle": 0, "bus": 0}
+    for vdata in tracked_vehicles.values():
+        if vdata["type"] in counts:
+            counts[vdata["type"]] += 1
+    return counts
+
+
+def _load_detector(camera=None, frame_size=None):
+    """
+    Detector de vehículos con el modelo en caché del proceso y el
+    preprocesado de frames del análisis
+
+    PyTorch en GPU; en CPU ONNX Runtime (settings.YOLO_BACKEND) con
+    fallback automático a PyTorch. El imgsz se elige por análisis según la
+    resolución del video, la `resolution` de la cámara y el presupuesto de
+    latencia; si la cámara tiene ROI sólo se analiza el recorte de la vía.
+
+    Args:
+        camera: Camera del análisis (opcional)
+        frame_size: (width, height) del video
+
+    Returns:
+        (detector, preprocessor) - preprocessor es None sin frame_size
+    """
+    from apps.traffic_app.services.detector_backends import create_detector
+    from apps.traffic_app.services.model_registry import resolve_device
+    from apps.traffic_app.services.preprocess import FramePreprocessor, choose_imgsz
+    from apps.traffic_app.services.roi import RegionOfInterest
+
+    roi = None
+    if camera is not None and frame_size is not None:
+        try:
+            roi = RegionOfInterest.from_camera(
+                camera, frame_size, padding=getattr(settings, "CAMERA_ROI_PADDING", 32)
+            )
+        except ValueError as e:
+            logger.warning(f"⚠️ ROI inválida en cámara {camera.pk}, se usa el frame completo: {e}")
+        if roi is not None:
+            logger.info(f"✂️ ROI cámara {camera.pk}: {roi.rect} ({roi.area_ratio:.0%} del frame)")
+
+    # Tamaño de entrada según la región analizada y el presupuesto de latencia
+    max_imgsz = getattr(settings, "YOLO_MAX_IMGSZ", 960)
+    imgsz = max_imgsz
+    if frame_size is not None:
+        x0, y0, x1, y1 = roi.rect if roi is not None else (0, 0, *frame_size)
+        device_kind = "cpu" if resolve_device() == "cpu" else "cuda"
+        imgsz = choose_imgsz(
+            (x1 - x0, y1 - y0),
+            video_size=frame_size,
+            camera_resolution=getattr(camera, "resolution", None),
+            reference_latency_ms=getattr(settings, "YOLO_REFERENCE_LATENCY_MS", {}).get(device_kind),
+            latency_budget_ms=getattr(settings, "YOLO_LATENCY_BUDGET_MS", None),
+            min_imgsz=getattr(settings, "YOLO_MIN_IMGSZ", 320),
+            max_imgsz=max_imgsz,
+        )
+
+    detector = create_detector(
+        getattr(settings, "YOLO_MODEL_PATH", "yolov8n.pt"),
+        device="auto",
+        imgsz=imgsz,
+        precision="fp16" if USE_HALF_PRECISION else "fp32",
+        conf=CONF_THRESHOLD,
+        iou=IOU_THRESHOLD,
+        classes=list(VEHICLE_CLASS_NAMES),
+    )
+
+    if frame_size is None:
+        return detector, None
+
+    # Recorte + reducción una sola vez en el decodificador, en buffers reutilizados
+    preprocessor = FramePreprocessor(
+        frame_size,
+        imgsz,
+        roi=roi,
+        pool_size=FramePreprocessor.pool_size_for(
+            getattr(settings, "VIDEO_PIPELINE_QUEUE_SIZE", 16),
+            getattr(settings, "YOLO_BATCH_SIZE", 8),
+        ),
+    )
+    logger.info(
+        f"📐 imgsz={imgsz}: frames {frame_size[0]}x{frame_size[1]} → "
+        f"{preprocessor.output_size[0]}x{preprocessor.output_size[1]} en el decodificador"
+    )
+    return detector, preprocessor
+
+
+def _build_pipeline(detector, cap, preprocessor=None, start_frame=1, end_frame=None):
+    """
+    Pipeline decode → inferencia por lotes → tracking para un rango de frames
+
+    Con `preprocessor` los frames se recortan/reducen en el hilo de
+    decodificación y las cajas vuelven a coordenadas del video antes del
+    tracking (los frames entregados por el pipeline son los reducidos).
+    En el hilo de inferencia se recortan las detecciones del frame
+    decodificado (_cut_crops) y éste se libera: las colas hacia el
+    tracking no retienen frames a resolución completa. Cada resultado es
+    (detecciones, recortes).
+
+    Con ADAPTIVE_SAMPLING_ENABLED el stride varía entre SKIP_FRAMES (con
+    movimiento o tracks activos) y ADAPTIVE_SAMPLING_MAX_STRIDE (escena
+    estática); el llamador informa los tracks activos con
+    sampler.observe_tracks().
+
+    Returns:
+        (pipeline, batcher, sampler) - sampler es None con muestreo fijo
+    """
+    from apps.traffic_app.services.adaptive_sampling import create_sampler
+    from apps.traffic_app.services.batch_inference import FrameBatcher
+    from apps.traffic_app.services.frame_sampling import iter_frames
+    from apps.traffic_app.services.pipeline import VideoPipeline
+
+    batcher = FrameBatcher(
+        detector,
+        batch_size=getattr(settings, "YOLO_BATCH_SIZE", 8),  # Frames por predict()
+        max_wait=getattr(settings, "YOLO_BATCH_MAX_WAIT", 0.05),  # Segundos máximos de espera del lote
+    )
+
+    sampling_mode = getattr(settings, "FRAME_SAMPLING_MODE", "auto")  # 'grab', 'seek' o 'auto'
+    seek_min_stride = getattr(settings, "FRAME_SEEK_MIN_STRIDE", 30)
+
+    # Medir movimiento sólo dentro de la ROI de la cámara
+    roi = preprocessor.roi if preprocessor is not None else None
+    sampler = create_sampler(SKIP_FRAMES, roi=roi.rect if roi is not None else None)
+
+    if sampler is not None:
+        frames = sampler.iter_frames(
+            cap,
+            mode=sampling_mode,
+            seek_min_stride=seek_min_stride,
+            start_frame=start_frame,
+            end_frame=end_frame,
+        )
+    else:
+        frames = iter_frames(  # Procesar cada 3 frames sin decodificar los descartados
+            cap,
+            stride=SKIP_FRAMES,
+            mode=sampling_mode,
+            seek_min_stride=seek_min_stride,
+            start_frame=start_frame,
+            end_frame=end_frame,
+        )
+
+    if preprocessor is not None:
+        frames = preprocessor.iter_prepared(frames, keep_originals=True)
+
+    def postprocess(frame_number, frame, raw):
+        if preprocessor is None:
+            detections = _parse_detections(raw)
+        else:
+            detections = _parse_detections(preprocessor.to_frame(raw))
+            frame = preprocessor.pop_original(frame_number)
+        return detections, _cut_crops(frame, detections) if frame is not None else None
+
+    pipeline = VideoPipeline(
+        frames,
+        batcher,
+        postprocess=postprocess,
+        queue_size=getattr(settings, "VIDEO_PIPELINE_QUEUE_SIZE", 16),  # Frames máximos en cada cola
+    )
+
+    return pipeline, batcher, sampler
+
+
+def _save_tracked_vehicles(analysis, tracked_vehicles, speed_estimator=None, writer=None):
+    """
+    Guarda en base de datos los vehículos con suficientes frames
+
+    Se guardan como VehicleFrame los frames de la muestra de cada vehículo.
+    Con speed_estimator calcula su velocidad y la media del vehículo desde
+    la trayectoria completa. Todos los vehículos y frames se insertan en un
+    lote (services.persistence) dentro de una transacción.
+
+    Args:
+        writer: BulkWriter del análisis (acumula el throughput)
+
+    Returns:
+        Lista [(track_id, Vehicle)] de vehículos guardados
+
+    Raises:
+        DatabaseError: Si falla la inserción del lote (no se guarda nada de él)
+    """
+    from apps.traffic_app.models import Vehicle, VehicleFrame
+    from apps.traffic_app.services.plate_quality import best_frame_for_plate
+
+    if writer is None:
+        writer = _create_bulk_writer()
+
+    video_start_time = analysis.startedAt
+    capture_start = _capture_start(analysis)  # Tiempos de la re-ID entre cámaras
+    saved_vehicles = []
+    frames_to_create = []
+
+    for track_id, vdata in tracked_vehicles.items():
+        # Solo guardar vehículos con suficientes frames
+        if vdata["count"] < MIN_FRAMES_TO_SAVE:
+            continue
+
+        try:
+            # Calcular confianza promedio
+            avg_confidence = vdata["confidence_sum"] / vdata["count"]
+            
+            # Calcular timestamps
+            first_frame_time = video_start_time + timedelta(seconds=vdata["first_seconds"])
+            last_frame_time = video_start_time + timedelta(seconds=vdata["last_seconds"])
+
+            sampled_frames = vdata["samples"].frames()
+
+            # Velocidad desde la trayectoria completa (una pasada vectorizada)
+            speeds, avg_speed = None, None
+            if speed_estimator is not None:
+                frame_numbers, boxes, _ = vdata["trajectory"].view()
+                trajectory_speeds, avg_speed = speed_estimator.estimate(frame_numbers, boxes)
+                positions = np.searchsorted(
+                    frame_numbers, [f["frameNumber"] for f in sampled_frames]
+                )
+                speeds = trajectory_speeds[positions].round(2).tolist()
+
+            # Carril con más detecciones (votos por carril, índice 0 = fuera de carril)
+            lane_votes = vdata.get("lane_votes")
+
+            # ID del vehículo (antes de insertar: enlaza sus frames); único en el
+            # análisis y estable entre reintentos (_discard_partial_results)
+            vehicle_id = f"vehicle_{analysis.id}_{track_id}"
+
+            # Crear registro de vehículo
+            vehicle = Vehicle(
+                id=vehicle_id,
+                trafficAnalysisId=analysis,
+                vehicleType=vdata["type"],
+                confidence=round(avg_confidence, 4),
+                firstDetectedAt=first_frame_time,
+                lastDetectedAt=last_frame_time,
+                trackingStatus="COMPLETED",
+                totalFrames=vdata["count"],
+                storedFrames=len(sampled_frames),
+                plateProcessingStatus="PENDING",
+                bestFrameForPlate=best_frame_for_plate(sampled_frames),
+                direction=vdata.get("direction"),
+                lane=int(np.argmax(lane_votes)) if lane_votes else None,
+                avgSpeed=round(avg_speed, 2) if avg_speed is not None else None,
+                reidFeature=_reid_feature(vdata, capture_start),
+            )
+
+            # Crear registros de frames
+            vehicle_frames = []
+            for index, frame_data in enumerate(sampled_frames):
+                frame_timestamp = video_start_time + timedelta(seconds=frame_data["timestamp_seconds"])
+                vehicle_frames.append(VehicleFrame(
+                    vehicleId=vehicle,
+                    frameNumber=frame_data["frameNumber"],
+                    timestamp=frame_timestamp,
+                    boundingBoxX=frame_data["boundingBox"]["x"],
+                    boundingBoxY=frame_data["boundingBox"]["y"],
+                    boundingBoxWidth=frame_data["boundingBox"]["width"],
+                    boundingBoxHeight=frame_data["boundingBox"]["height"],
+                    confidence=round(frame_data["confidence"], 4),
+                    frameQuality=frame_data.get("frameQuality", 1.0),
+                    plateQuality=frame_data.get("plateQuality"),
+                    speed=speeds[index] if speeds is not None else 0,
+                    imagePath=frame_data.get("imagePath", ""),
+                ))
+
+            frames_to_create.extend(vehicle_frames)
+            saved_vehicles.append((track_id, vehicle))
+
+        except Exception as e:
+            logger.error(f"✖️ Error guardando vehículo {track_id}: {e}")
+
+    # Guardar todos los vehículos y frames de una vez; un error de la base de
+    # datos se propaga a la tarea (el análisis se marca con error)
+    writer.write([vehicle for _, vehicle in saved_vehicles], frames_to_create)
+
+    return saved_vehicles
+
+
+def _create_bulk_writer():
+    """Escritor por lotes de vehículos y frames (services.persistence)"""
+    from apps.traffic_app.services.persistence import BulkWriter
+
+    return BulkWriter(getattr(settings, "DB_BULK_CREATE_BATCH_SIZE", 1000))
+
+
+def _flush_vehicles(
+    analysis, tracked_vehicles, track_ids, speed_estimator, vehicle_speeds, crop_store=None,
+    writer=None,
+):
+    """
+    Guarda y libera de memoria los vehículos cuyos tracks terminaron
+
+    Args:
+        track_ids: Tracks terminados (se eliminan de tracked_vehicles)
+        crop_store: Escritor de recortes (None = frames sin imagen)
+        writer: BulkWriter del análisis (un lote y una transacción por llamada)
+        vehicle_speeds: Lista donde se acumulan las velocidades medias guardadas
+
+    Returns:
+        Número de vehículos guardados
+    """
+    finished = {
+        track_id: tracked_vehicles.pop(track_id)
+        for track_id in track_ids
+        if track_id in tracked_vehicles
+    }
+    if not finished:
+        return 0
+
+    _score_frames(finished.values())
+    _store_crops(crop_store, finished.values())
+    saved = _save_tracked_vehicles(analysis, finished, speed_estimator, writer)
+    _link_cross_camera(analysis, saved)
+    vehicle_speeds.extend(
+        float(vehicle.avgSpeed) for _, vehicle in saved if vehicle.avgSpeed is not None
+    )
+    return len(saved)
+
+
+def _discard_partial_results(analysis):
+    """
+    Borra los vehículos (sus frames y enlaces en cascada) y los recortes
+    de una ejecución anterior del análisis
+
+    Los tracks terminados se guardan durante el análisis; un reintento
+    procesa el video desde el inicio y los volvería a insertar.
+
+    Returns:
+        Número de vehículos borrados
+    """
+    from apps.traffic_app.models import Vehicle
+
+    _, deleted = Vehicle.objects.filter(trafficAnalysisId=analysis).delete()
+    shutil.rmtree(_crop_directory(analysis.id), ignore_errors=True)
+    return deleted.get(Vehicle._meta.label, 0)
+
+
+def _log_persistence(analysis_id, writer):
+    """Reporta el throughput de inserción de vehículos y frames"""
+    stats = writer.get_stats()
+    logger.info(
+        f"💾 Análisis {analysis_id}: {stats['vehicles']} vehículos y {stats['frames']} frames "
+        f"en {stats['batches']} lotes - {stats['seconds']:.2f}s ({stats['rows_per_second']:.0f} filas/s)"
+    )
+    _send_ws(analysis_id, "log_message", {
+        "message": f"Guardados {stats['vehicles']} vehículos en {stats['seconds']:.1f}s "
+                   f"({stats['rows_per_second']:.0f} filas/s)",
+        "level": "info",
+    })
+
+
+def _complete_analysis(analysis, processed_frames, total_frames, saved_vehicles):
+    """Marca el análisis como COMPLETED y notifica al frontend"""
+    analysis_id = analysis.id
+
+    # Finalizar análisis
+    analysis.processedFrames = processed_frames
+    analysis.totalFrames = total_frames
+    analysis.totalVehicles = saved_vehicles
+    analysis.status = "COMPLETED"
+    analysis.endedAt = timezone.now()
+    analysis.save()
+
+    processing_time = (analysis.endedAt - analysis.startedAt).total_seconds()
+    logger.info(f"✅ Análisis {analysis_id} COMPLETADO en {processing_time:.1f}s")
+
+    # Notificar análisis completado
+    _send_ws(analysis_id, "analysis_completed", {
+        "analysis_id": analysis_id,
+        "status": "COMPLETED",
+        "total_vehicles": saved_vehicles,
+        "processing_time": processing_time,
+        "vehicle_breakdown": {
+            "car": analysis.carCount,
+            "truck": analysis.truckCount,
+            "motorcycle": analysis.motorcycleCount,
+            "bus": analysis.busCount,
+        }
+    })
+
+    _send_ws(analysis_id, "processing_complete", {
+        "analysis_id": analysis_id,
+        "status": "COMPLETED",
+        "total_vehicles": saved_vehicles,
+        "processing_time": processing_time,
+    })
+
+    return {
+        "status": "COMPLETED",
+        "analysis_id": analysis_id,
+        "total_vehicles": saved_vehicles,
+        "processing_time": processing_time,
+    }
+
+
+def _mark_analysis_error(analysis_id, error):
+    """Marca el análisis como ERROR y notifica al frontend"""
+    from apps.traffic_app.models import TrafficAnalysis
+
+    try:
+        analysis = TrafficAnalysis.objects.get(id=analysis_id)
+        analysis.status = "ERROR"
+        analysis.endedAt = timezone.now()
+        analysis.save(update_fields=["status", "endedAt"])
+
+        _send_ws(analysis_id, "analysis_error", {
+            "analysis_id": analysis_id,
+            "error": str(error),
+            "message": "Error durante el procesamiento del video",
+        })
+
+        _send_ws(analysis_id, "processing_error", {
+            "analysis_id": analysis_id,
+            "error": str(error),
+        })
+
+    except Exception as inner_e:
+        logger.error(f"Error en manejo de excepciones: {inner_e}")
+
+
 @shared_task(bind=True, max_retries=3)
 def analyze_video_async(self, analysis_id, video_path):
     """
     🔥 Analiza video con actualizaciones en tiempo real vía WebSocket
+
+    Videos largos se dividen en segmentos analizados en paralelo
+    (ver VIDEO_SHARD_COUNT y analyze_video_shard)
     """
     import cv2
-    from ultralytics import YOLO
-    from apps.traffic_app.models import TrafficAnalysis, Vehicle, VehicleFrame
-
-    # Capa de canales para WebSocket - mensajería con el frontend
-    channel_layer = get_channel_layer()
-    room_group_name = f"traffic_analysis_{analysis_id}"
+    from apps.traffic_app.models import TrafficAnalysis
+    from apps.traffic_app.services.sharding import plan_shards
+    from apps.traffic_app.services.tracking import create_tracking_engine
 
     def send_ws(message_type, data):
         """Enviar mensaje WebSocket"""
-        try:
-            async_to_sync(channel_layer.group_send)(
-                room_group_name,
-                {"type": message_type, "data": data}
-            )
-        except Exception as e:
-            #logger.warning(f"⚠️ Error WS: {e}")
-            ...
+        _send_ws(analysis_id, message_type, data)
 
     try:
         logger.info(f"🧠 Iniciando análisis {analysis_id}")
@@ -61,7 +885,7 @@ def analyze_video_async(self, analysis_id, video_path):
 
         # Obtener análisis
         try:
-            analysis = TrafficAnalysis.objects.get(id=analysis_id)
+            analysis = TrafficAnalysis.objects.select_related("cameraId").get(id=analysis_id)
             analysis.status = "PROCESSING"
             analysis.save(update_fields=["status"])
             
@@ -69,6 +893,11 @@ def analyze_video_async(self, analysis_id, video_path):
             logger.error(f"❌ Análisis {analysis_id} no encontrado")
             return {"error": "Análisis no encontrado"}
 
+        # Resultados parciales de un intento anterior (reintento de la tarea)
+        discarded = _discard_partial_results(analysis)
+        if discarded:
+            logger.info(f"🧹 Análisis {analysis_id}: {discarded} vehículos de un intento anterior borrados")
+
 
         # Notificar inicio
         send_ws("analysis_started", {
@@ -78,49 +907,56 @@ def analyze_video_async(self, analysis_id, video_path):
         })
 
 
-        # Cargar modelo YOLO
-        model_path = getattr(settings, "YOLO_MODEL_PATH", "yolov8n.pt")
-        model = YOLO(model_path)
-        logger.info(f"✅ YOLO cargado: {model_path}")
-        
-        
-         # 🔬 DIAGNÓSTICO: Medir velocidad pura de GPU
-        logger.info("🔬 Prueba de velocidad GPU...")
-        cap.set(cv2.CAP_PROP_POS_FRAMES, 100)  # Ir a frame 100
-        ret, test_frame = cap.read()
-
-        # Calentar GPU
-        for i in range(3):
-            _ = model.predict(test_frame, device=0, imgsz=384, verbose=False)
-        torch.cuda.synchronize()
-
-        # Medir 10 inferencias
-        test_times = []
-        for i in range(10):
-            start = time.time()
-            _ = model.predict(test_frame, device=0, imgsz=384, verbose=False)
-            torch.cuda.synchronize()
-            test_times.append((time.time() - start) * 1000)
-
-        avg_time = sum(test_times) / len(test_times)
-        logger.info(f"⚡ Velocidad GPU pura: {avg_time:.1f}ms/frame")
-        logger.info(f"⚡ FPS teórico: {1000/avg_time:.1f}")
-
-        # Resetear video
-        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-        
-        # 🔥 DIAGNÓSTICO CRÍTICO
-        logger.info(f"🔥 CUDA disponible: {torch.cuda.is_available()}")
-        logger.info(f"🔥 Device actual: {model.device}")
+        # Información del video
+        fps = int(cap.get(cv2.CAP_PROP_FPS)) or 30
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
 
-        # ⭐ AGREGAR ESTAS LÍNEAS AQUÍ:
-        if torch.cuda.is_available():
-            model.to('cuda:0')  # 🎯 MOVER MODELO A GPU
-            logger.info(f"✅ Modelo movido a GPU")
-            logger.info(f"✅ Device después: {next(model.model.parameters()).device}")
-            torch.cuda.empty_cache()
-        else:
-            logger.warning("⚠️ GPU no disponible")
+
+        # ====================================================================
+        # VIDEOS LARGOS: dividir en segmentos y analizarlos en paralelo
+        # ====================================================================
+        shard_count = getattr(settings, "VIDEO_SHARD_COUNT", 1)
+        min_shard_duration = getattr(settings, "VIDEO_SHARD_MIN_DURATION", 600)
+        if shard_count > 1 and total_frames / fps >= min_shard_duration:
+            cap.release()
+
+            shards = plan_shards(
+                total_frames,
+                fps,
+                shard_count,
+                overlap_seconds=getattr(settings, "VIDEO_SHARD_OVERLAP_SECONDS", 2.0),
+            )
+            logger.info(f"🧩 Análisis {analysis_id} dividido en {len(shards)} segmentos: {shards}")
+            send_ws("log_message", {
+                "message": f"Video: {total_frames} frames @ {fps}fps ({width}x{height}) - "
+                           f"procesando en {len(shards)} segmentos paralelos",
+                "level": "info",
+            })
+
+            chord(
+                group(
+                    analyze_video_shard.s(analysis_id, video_path, index, start, end)
+                    for index, (start, end) in enumerate(shards)
+                )
+            )(
+                finalize_sharded_analysis.s(analysis_id, total_frames).on_error(
+                    sharded_analysis_failed.s(analysis_id)
+                )
+            )
+
+            return {
+                "status": "SHARDED",
+                "analysis_id": analysis_id,
+                "shards": len(shards),
+            }
+
+
+        # Cargar modelo YOLO (caché del proceso: se carga y calienta una sola vez)
+        model_path = getattr(settings, "YOLO_MODEL_PATH", "yolov8n.pt")
+        detector, preprocessor = _load_detector(analysis.cameraId, (width, height))
+        logger.info(f"✅ YOLO listo: {model_path} en {detector.device} ({detector.backend})")
 
         if torch.cuda.is_available():
             logger.info(f"🔥 GPU: {torch.cuda.get_device_name(0)}")
@@ -130,17 +966,11 @@ def analyze_video_async(self, analysis_id, video_path):
 
 
         send_ws("log_message", {
-            "message": f"Modelo YOLO cargado: {model_path}",
+            "message": f"Modelo YOLO cargado: {model_path} ({detector.backend})",
             "level": "info",
         })
         
         
-        # Información del video
-        fps = int(cap.get(cv2.CAP_PROP_FPS)) or 30
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-
         logger.info(f"📹 Video: {total_frames} frames @ {fps}fps")
 
         send_ws("log_message", {
@@ -148,245 +978,82 @@ def analyze_video_async(self, analysis_id, video_path):
             "level": "info",
         })
 
-        # Optimizaciones para RTX 3050 (4GB VRAM)
-        next_vehicle_id = 1
-        active_tracks = {}  # {track_id: {'bbox': [x,y,w,h], 'type': str, 'frames_missing': int}}
-        MAX_FRAMES_MISSING = 5  # Máximo frames sin detectar antes de eliminar track
-        IOU_THRESHOLD_TRACKING = 0.3  # IoU mínimo para asociar detección con track
-        SKIP_FRAMES = 3          # Procesar cada 3 frames
-        IMGSZ = 480            # Resolución de entrada [616x346 para 16:9, 608x352 para 16:9, 384x216 para pruebas rápidas]
-        CONF_THRESHOLD = 0.5     # Umbral de confianza
-        IOU_THRESHOLD = 0.45     # IoU para NMS
-        USE_HALF_PRECISION = False  # ✅ CAMBIAR DE OFF A False
-        MIN_FRAMES_TO_SAVE = 10  # Mínimo de frames para guardar vehículo
-        
-        
-        def calculate_iou(box1, box2):
-            """Calcular IoU entre dos bounding boxes [x, y, w, h]"""
-            x1, y1, w1, h1 = box1
-            x2, y2, w2, h2 = box2
-            
-            # Coordenadas de intersección
-            xi1 = max(x1, x2)
-            yi1 = max(y1, y2)
-            xi2 = min(x1 + w1, x2 + w2)
-            yi2 = min(y1 + h1, y2 + h2)
-            
-            # Área de intersección
-            inter_area = max(0, xi2 - xi1) * max(0, yi2 - yi1)
-            
-            # Áreas individuales
-            box1_area = w1 * h1
-            box2_area = w2 * h2
-            
-            # IoU
-            union_area = box1_area + box2_area - inter_area
-            return inter_area / union_area if union_area > 0 else 0
-        
-        
-      
-        def assign_track_ids(detections, active_tracks):
-            """Asignar IDs a detecciones usando tracking simple"""
-            nonlocal next_vehicle_id  # ✅ AGREGAR ESTA LÍNEA AL INICIO
-            
-            assigned_detections = []
-            used_track_ids = set()
-            
-            # Incrementar frames_missing para todos los tracks
-            for track_id in active_tracks:
-                active_tracks[track_id]['frames_missing'] += 1
-            
-            # Para cada detección, buscar el mejor track
-            for det in detections:
-                det_bbox = det['bbox']
-                det_type = det['vehicle_type']
-                best_track_id = None
-                best_iou = IOU_THRESHOLD_TRACKING
-                
-                # Buscar track más cercano del mismo tipo
-                for track_id, track in active_tracks.items():
-                    if track_id in used_track_ids:
-                        continue
-                    if track['type'] != det_type:
-                        continue
-                        
-                    iou = calculate_iou(det_bbox, track['bbox'])
-                    if iou > best_iou:
-                        best_iou = iou
-                        best_track_id = track_id
-                
-                # Asignar track ID
-                if best_track_id is not None:
-                    # Actualizar track existente
-                    active_tracks[best_track_id]['bbox'] = det_bbox
-                    active_tracks[best_track_id]['frames_missing'] = 0
-                    det['track_id'] = best_track_id
-                    used_track_ids.add(best_track_id)
-                else:
-                    # Crear nuevo track
-                    track_id = next_vehicle_id
-                    next_vehicle_id += 1
-                    active_tracks[track_id] = {
-                        'bbox': det_bbox,
-                        'type': det_type,
-                        'frames_missing': 0
-                    }
-                    det['track_id'] = track_id
-                
-                assigned_detections.append(det)
-            
-            # Eliminar tracks perdidos
-            tracks_to_remove = [
-                tid for tid, track in active_tracks.items()
-                if track['frames_missing'] > MAX_FRAMES_MISSING
-            ]
-            for tid in tracks_to_remove:
-                del active_tracks[tid]
-            
-            return assigned_detections
-
-
+        tracker = create_tracking_engine()
+        counter = _load_counter(analysis.cameraId, (width, height))
+        speed_estimator = _load_speed_estimator(analysis.cameraId, (width, height), fps)
+        crop_store = _create_crop_store(analysis_id)
+        writer = _create_bulk_writer()
         frame_count = 0
         last_progress = 0
-        tracked_vehicles = {}
-
-        # Procesar frames del video
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        tracked_vehicles = {}  # Sólo tracks activos (y terminados aún sin guardar)
+        finished_tracks = []
+        vehicle_counts = {"car": 0, "truck": 0, "motorcycle": 0, "bus": 0}
+        vehicle_speeds = []
+        total_vehicles = 0
+        saved_count = 0
 
-            frame_count += 1
-
-            # Saltar frames para optimizar procesamiento
-            if frame_count % SKIP_FRAMES != 0:
-                continue
-            
-            # ====================================================================
-            # DETECCIÓN SIN TRACKING 
-            # ====================================================================
+        def handle_frame_result(frame_count, frame, detections_raw, crops):
+            """Tracking, WebSocket y progreso de un frame ya detectado"""
+            nonlocal last_progress, total_vehicles, saved_count
 
-            start_time = time.time()
-            
             timestamp_seconds = frame_count / fps if fps > 0 else 0
 
-            # Detección con YOLO
-            results = model.predict(
-                frame,
-                conf=CONF_THRESHOLD,
-                iou=IOU_THRESHOLD,
-                classes=[2, 3, 5, 7],
-                verbose=False,
-                imgsz=IMGSZ,  # Resolución reducida
-                device=0,
-                half=False,
-            )
-            
-            if torch.cuda.is_available():
-                torch.cuda.synchronize()
-                
-            # Opcional: Limpiar caché de CUDA periódicamente
-            if frame_count % 100 == 0 and torch.cuda.is_available():
-                torch.cuda.empty_cache()
-                
-            # ✅ CALCULAR TIEMPO
-            yolo_time = (time.time() - start_time) * 1000  # en milisegundos
-            
-            # Reducir frecuencia:
-            if frame_count % 90 == 0:  # Log cada 90 frames
-                logger.info(f"⏱️ YOLO tardó: {yolo_time:.1f}ms en frame {frame_count}")
-                
-                
-                
-            # ====================================================================
-            # PASO 1: PROCESAR DETECCIONES DE YOLO
-            # ====================================================================
-            detections_raw = []
-
-            if results[0].boxes is not None and len(results[0].boxes) > 0:
-                for box in results[0].boxes:
-                    cls = int(box.cls[0])
-                    conf = float(box.conf[0])
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    
-                    class_names = {2: "car", 3: "motorcycle", 5: "bus", 7: "truck"}
-                    vehicle_type = class_names.get(cls, "unknown")
-                    
-                    bbox = [int(x1), int(y1), int(x2 - x1), int(y2 - y1)]
-                    
-                    detections_raw.append({
-                        "vehicle_type": vehicle_type,
-                        "bbox": bbox,
-                        "confidence": conf,
-                        "x1": int(x1),
-                        "y1": int(y1),
-                        "x2": int(x2),
-                        "y2": int(y2),
-                    })
-           
-           
             # ====================================================================
             # PASO 2: APLICAR TRACKING MANUAL
             # ====================================================================
-            detections_to_send = assign_track_ids(detections_raw, active_tracks)
+            update = tracker.update(detections_raw, frame_count)
+            track_ids = update.track_ids
                
                
             # ====================================================================
             # PASO 3: GUARDAR EN tracked_vehicles
             # ====================================================================
-            for det in detections_to_send:
-                track_id = det['track_id']
-                vehicle_type = det['vehicle_type']
-                conf = det['confidence']
-                x1, y1 = det['x1'], det['y1']
-                x2, y2 = det['x2'], det['y2']
-                
-                # Guardar en diccionario de vehículos rastreados
-                if track_id not in tracked_vehicles:
-                    tracked_vehicles[track_id] = {
-                        "type": vehicle_type,
-                        "first_frame": frame_count,
-                        "last_frame": frame_count,
-                        "count": 1,
-                        "confidence_sum": conf,
-                        "frames": [],
-                    }
-                    
-                    # Notificar nuevo vehículo detectado
-                    send_ws("vehicle_detected", {
+            new_vehicles = _record_detections(
+                tracked_vehicles, track_ids, detections_raw, frame_count, timestamp_seconds, crops
+            )
+            _update_appearance(tracked_vehicles, track_ids, crops)
+            if counter is not None:
+                for track_id, line_name, direction in _update_counts(
+                    counter, tracked_vehicles, update, detections_raw, frame_count
+                ):
+                    # Notificar cruce de línea de conteo
+                    send_ws("line_crossed", {
                         "track_id": track_id,
-                        "vehicle_type": vehicle_type,
+                        "line": line_name,
+                        "direction": direction,
                         "frame": frame_count,
-                        "total_vehicles": len(tracked_vehicles),
                     })
-                else:
-                    # Actualizar información del vehículo existente
-                    tracked_vehicles[track_id]["last_frame"] = frame_count
-                    tracked_vehicles[track_id]["count"] += 1
-                    tracked_vehicles[track_id]["confidence_sum"] += conf
-                
-                # Guardar información del frame actual
-                tracked_vehicles[track_id]["frames"].append({
-                    "frameNumber": frame_count,
-                    "timestamp_seconds": timestamp_seconds,
-                    "boundingBox": {
-                        "x": x1,
-                        "y": y1,
-                        "width": x2 - x1,
-                        "height": y2 - y1,
-                    },
-                    "confidence": conf,
+            for track_id, vehicle_type in new_vehicles:
+                total_vehicles += 1
+                if vehicle_type in vehicle_counts:
+                    vehicle_counts[vehicle_type] += 1
+
+                # Notificar nuevo vehículo detectado
+                send_ws("vehicle_detected", {
+                    "track_id": track_id,
+                    "vehicle_type": vehicle_type,
+                    "frame": frame_count,
+                    "total_vehicles": total_vehicles,
                 })
 
+            # Tracks terminados: se guardan por lotes y se liberan de memoria
+            finished_tracks.extend(update.removed)
+            if len(finished_tracks) >= VEHICLE_FLUSH_BATCH:
+                saved_count += _flush_vehicles(
+                    analysis, tracked_vehicles, finished_tracks, speed_estimator, vehicle_speeds,
+                    crop_store, writer,
+                )
+                finished_tracks.clear()
+
 
             # ====================================================================
             # PASO 4: ENVIAR DETECCIONES AL FRONTEND
             # ====================================================================
-            if detections_to_send and frame_count % 3 == 0:
+            if len(detections_raw) and frame_count % 3 == 0:
                 send_ws("frame_processed", {
                     "frame_number": frame_count,
                     "timestamp": round(timestamp_seconds, 2),
-                    "detections": detections_to_send,
+                    "detections": to_dicts(detections_raw, VEHICLE_CLASS_NAMES, track_ids.tolist()),
                 })
                 
  
@@ -399,172 +1066,278 @@ def analyze_video_async(self, analysis_id, video_path):
                 last_progress = progress
 
                 # Contar vehículos por tipo
-                car_count = sum(1 for v in tracked_vehicles.values() if v["type"] == "car")
-                truck_count = sum(1 for v in tracked_vehicles.values() if v["type"] == "truck")
-                moto_count = sum(1 for v in tracked_vehicles.values() if v["type"] == "motorcycle")
-                bus_count = sum(1 for v in tracked_vehicles.values() if v["type"] == "bus")
+                counts = dict(vehicle_counts)
 
                 # Actualizar base de datos
                 analysis.processedFrames = frame_count
-                analysis.totalVehicles = len(tracked_vehicles)
-                analysis.carCount = car_count
-                analysis.truckCount = truck_count
-                analysis.motorcycleCount = moto_count
-                analysis.busCount = bus_count
+                analysis.totalVehicles = total_vehicles
+                analysis.carCount = counts["car"]
+                analysis.truckCount = counts["truck"]
+                analysis.motorcycleCount = counts["motorcycle"]
+                analysis.busCount = counts["bus"]
                 analysis.save(update_fields=[
                     "processedFrames", "totalVehicles",
                     "carCount", "truckCount", "motorcycleCount", "busCount"
                 ])
 
-                logger.info(f"📊 {progress:.1f}% - {len(tracked_vehicles)} vehículos")
+                logger.info(
+                    f"📊 {progress:.1f}% - {total_vehicles} vehículos "
+                    f"({len(tracked_vehicles)} en memoria, {saved_count} guardados)"
+                )
 
                 # Notificar progreso al frontend
                 send_ws("progress_update", {
                     "progress": round(progress, 2),
                     "processed_frames": frame_count,
                     "total_frames": total_frames,
-                    "vehicles_detected": len(tracked_vehicles),
-                    "vehicle_breakdown": {
-                        "car": car_count,
-                        "truck": truck_count,
-                        "motorcycle": moto_count,
-                        "bus": bus_count,
-                    }
+                    "vehicles_detected": total_vehicles,
+                    "vehicle_breakdown": counts,
                 })
-                
-                
+
+        # ====================================================================
+        # PIPELINE: decode (hilo) → inferencia por lotes (hilo) → tracking/emisión
+        # PASO 1 (procesar detecciones de YOLO) se ejecuta en el hilo de inferencia
+        # ====================================================================
+        pipeline, batcher, sampler = _build_pipeline(detector, cap, preprocessor)
+
+        for processed, (frame_count, frame, (detections_raw, crops)) in enumerate(pipeline, 1):
+            handle_frame_result(frame_count, frame, detections_raw, crops)
+
+            # Con vehículos en seguimiento el muestreo vuelve al stride mínimo
+            if sampler is not None:
+                sampler.observe_tracks(len(tracker))
+
+            # Reducir frecuencia (por frames procesados: el stride puede variar):
+            if processed % 30 == 0:  # Log cada 30 frames procesados
+                yolo_time = batcher.last_batch_time * 1000  # en milisegundos
+                logger.info(f"⏱️ YOLO tardó: {yolo_time:.1f}ms en el último lote (frame {frame_count})")
+
+            # Opcional: Limpiar caché de CUDA periódicamente
+            if processed % 100 == 0 and torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+        batch_stats = batcher.get_stats()
+        logger.info(
+            f"⚡ Inferencia por lotes: {batch_stats['frames']} frames en {batch_stats['batches']} lotes "
+            f"(promedio {batch_stats['avg_batch_size']:.1f}) - {batch_stats['inference_fps']:.1f} FPS"
+        )
+        logger.info(f"🧵 Pipeline: {pipeline.get_stats()}")
+        if sampler is not None:
+            logger.info(f"🎚️ Muestreo adaptativo: {sampler.get_stats()}")
+
         # Liberar recursos del video
         cap.release()
 
-        # Guardar vehículos en base de datos
+        if counter is not None:
+            _finish_counts(counter, tracked_vehicles, tracker.active_ids.tolist())
+            analysis.analysisData = json.dumps({"lineCounts": counter.get_counts()})
+            logger.info(f"🚦 Conteo por línea: {counter.get_counts()}")
+
+        # Guardar los vehículos restantes en base de datos
         logger.info(f"💾 Guardando {len(tracked_vehicles)} vehículos en la base de datos...")
         send_ws("log_message", {
             "message": f"Guardando {len(tracked_vehicles)} vehículos en base de datos...",
             "level": "info",
         })
 
-        video_start_time = analysis.startedAt
-        saved_vehicles = 0
+        saved_count += _flush_vehicles(
+            analysis, tracked_vehicles, list(tracked_vehicles), speed_estimator, vehicle_speeds,
+            crop_store, writer,
+        )
+        _log_persistence(analysis_id, writer)
+        if crop_store is not None:
+            # Los recortes se escriben en segundo plano: esperar antes de completar
+            crop_store.close()
+            logger.info(f"🖼️ Recortes: {crop_store.get_stats()}")
+        analysis.carCount = vehicle_counts["car"]
+        analysis.truckCount = vehicle_counts["truck"]
+        analysis.motorcycleCount = vehicle_counts["motorcycle"]
+        analysis.busCount = vehicle_counts["bus"]
+        if vehicle_speeds:
+            analysis.avgSpeed = round(float(np.mean(vehicle_speeds)), 2)
+
+        return _complete_analysis(analysis, frame_count, total_frames, saved_count)
 
-        for track_id, vdata in tracked_vehicles.items():
-            # Solo guardar vehículos con suficientes frames
-            if vdata["count"] < MIN_FRAMES_TO_SAVE:
-                continue
+    except Exception as e:
+        logger.error(f"✖️ Error en el análisis: {e}", exc_info=True)
 
-            try:
-                # Calcular confianza promedio
-                avg_confidence = vdata["confidence_sum"] / vdata["count"]
-                
-                # Calcular timestamps
-                first_frame_time = video_start_time + timedelta(seconds=vdata["frames"][0]["timestamp_seconds"])
-                last_frame_time = video_start_time + timedelta(seconds=vdata["frames"][-1]["timestamp_seconds"])
-                
-                # Generar ID único para el vehículo
-                vehicle_id = f"vehicle_{analysis_id}_{track_id}_{int(timezone.now().timestamp() * 1000)}"
-
-                # Crear registro de vehículo
-                vehicle = Vehicle.objects.create(
-                    id=vehicle_id,
-                    trafficAnalysisId=analysis,
-                    vehicleType=vdata["type"],
-                    confidence=round(avg_confidence, 4),
-                    firstDetectedAt=first_frame_time,
-                    lastDetectedAt=last_frame_time,
-                    trackingStatus="COMPLETED",
-                    totalFrames=vdata["count"],
-                    storedFrames=len(vdata["frames"]),
-                    plateProcessingStatus="PENDING",
-                )
+        _mark_analysis_error(analysis_id, e)
 
-                # Crear registros de frames
-                frames_to_create = []
-                for frame_data in vdata["frames"]:
-                    frame_timestamp = video_start_time + timedelta(seconds=frame_data["timestamp_seconds"])
-                    frames_to_create.append(VehicleFrame(
-                        vehicleId=vehicle,
-                        frameNumber=frame_data["frameNumber"],
-                        timestamp=frame_timestamp,
-                        boundingBoxX=frame_data["boundingBox"]["x"],
-                        boundingBoxY=frame_data["boundingBox"]["y"],
-                        boundingBoxWidth=frame_data["boundingBox"]["width"],
-                        boundingBoxHeight=frame_data["boundingBox"]["height"],
-                        confidence=round(frame_data["confidence"], 4),
-                        frameQuality=1.0,
-                        speed=0,
-                        imagePath="",
-                    ))
-
-                # Guardar todos los frames de una vez
-                VehicleFrame.objects.bulk_create(frames_to_create)
-                saved_vehicles += 1
-
-            except Exception as e:
-                logger.error(f"✖️ Error guardando vehículo {track_id}: {e}")
-
-        # Finalizar análisis
-        analysis.processedFrames = frame_count
-        analysis.totalFrames = total_frames
-        analysis.totalVehicles = saved_vehicles
-        analysis.status = "COMPLETED"
-        analysis.endedAt = timezone.now()
-        analysis.save()
+        # Reintentar la tarea si falla
+        raise self.retry(exc=e, countdown=60 * (2**self.request.retries))
 
-        processing_time = (analysis.endedAt - analysis.startedAt).total_seconds()
-        logger.info(f"✅ Análisis {analysis_id} COMPLETADO en {processing_time:.1f}s")
 
-        # Notificar análisis completado
-        send_ws("analysis_completed", {
-            "analysis_id": analysis_id,
-            "status": "COMPLETED",
-            "total_vehicles": saved_vehicles,
-            "processing_time": processing_time,
-            "vehicle_breakdown": {
-                "car": analysis.carCount,
-                "truck": analysis.truckCount,
-                "motorcycle": analysis.motorcycleCount,
-                "bus": analysis.busCount,
-            }
-        })
+@shared_task(bind=True, max_retries=3)
+def analyze_video_shard(self, analysis_id, video_path, shard_index, start_frame, end_frame):
+    """
+    Analiza un segmento [start_frame, end_frame] de un video largo
 
-        send_ws("processing_complete", {
-            "analysis_id": analysis_id,
-            "status": "COMPLETED",
-            "total_vehicles": saved_vehicles,
-            "processing_time": processing_time,
+    Ejecuta la misma detección + tracking que analyze_video_async pero sin
+    persistir: devuelve los tracks del segmento para que
+    finalize_sharded_analysis los una en vehículos globales. Los tracks
+    terminados se cierran durante el segmento (_finish_shard_tracks): sólo
+    los activos conservan recortes en memoria.
+
+    Returns:
+        {shard_index, start_frame, end_frame, processed_frames, tracks: [...]}
+    """
+    import cv2
+    from apps.traffic_app.models import TrafficAnalysis
+    from apps.traffic_app.services.tracking import create_tracking_engine
+
+    try:
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise Exception(f"No se puede abrir el video: {video_path}")
+
+        fps = int(cap.get(cv2.CAP_PROP_FPS)) or 30
+        frame_size = (
+            int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        )
+        analysis = TrafficAnalysis.objects.select_related("cameraId").get(id=analysis_id)
+        detector, preprocessor = _load_detector(analysis.cameraId, frame_size)
+
+        tracker = create_tracking_engine()
+        tracked_vehicles = {}  # Sólo tracks activos
+        tracks = []  # Tracks terminados, ya sin recortes en memoria
+        last_frame = start_frame
+        crop_store = _create_crop_store(analysis_id)
+
+        # El solapamiento inicial ya lo cuenta el segmento anterior
+        overlap = int(round(getattr(settings, "VIDEO_SHARD_OVERLAP_SECONDS", 2.0) * fps))
+        counter = _load_counter(
+            analysis.cameraId,
+            frame_size,
+            count_from_frame=start_frame + overlap if start_frame > 1 else 1,
+        )
+
+        pipeline, _, sampler = _build_pipeline(
+            detector, cap, preprocessor, start_frame=start_frame, end_frame=end_frame
+        )
+        try:
+            for frame_count, frame, (detections_raw, crops) in pipeline:
+                timestamp_seconds = frame_count / fps if fps > 0 else 0
+                update = tracker.update(detections_raw, frame_count)
+                track_ids = update.track_ids
+                _record_detections(
+                    tracked_vehicles, track_ids, detections_raw, frame_count, timestamp_seconds,
+                    crops,
+                )
+                _update_appearance(tracked_vehicles, track_ids, crops)
+                if counter is not None:
+                    _update_counts(counter, tracked_vehicles, update, detections_raw, frame_count)
+                if update.removed:
+                    tracks.extend(_finish_shard_tracks(tracked_vehicles, update.removed, crop_store))
+                if sampler is not None:
+                    sampler.observe_tracks(len(tracker))
+                last_frame = frame_count
+        finally:
+            cap.release()
+
+        if counter is not None:
+            _finish_counts(counter, tracked_vehicles, tracker.active_ids.tolist())
+
+        # Tracks activos al final del segmento
+        tracks.extend(_finish_shard_tracks(tracked_vehicles, list(tracked_vehicles), crop_store))
+        if crop_store is not None:
+            crop_store.close()
+
+        logger.info(
+            f"🧩 Segmento {shard_index} ({start_frame}-{end_frame}) del análisis {analysis_id}: "
+            f"{len(tracks)} tracks - {pipeline.get_stats()}"
+        )
+        _send_ws(analysis_id, "log_message", {
+            "message": f"Segmento {shard_index + 1} completado: {len(tracks)} tracks",
+            "level": "info",
         })
 
         return {
-            "status": "COMPLETED",
-            "analysis_id": analysis_id,
-            "total_vehicles": saved_vehicles,
-            "processing_time": processing_time,
+            "shard_index": shard_index,
+            "start_frame": start_frame,
+            "end_frame": end_frame,
+            "processed_frames": last_frame,
+            "fps": fps,
+            "frame_size": frame_size,
+            "tracks": tracks,
+            "line_counts": counter.get_counts() if counter is not None else None,
         }
 
     except Exception as e:
-        logger.error(f"✖️ Error en el análisis: {e}", exc_info=True)
+        logger.error(f"✖️ Error en segmento {shard_index} del análisis {analysis_id}: {e}", exc_info=True)
+        raise self.retry(exc=e, countdown=60 * (2**self.request.retries))
 
-        try:
-            analysis = TrafficAnalysis.objects.get(id=analysis_id)
-            analysis.status = "ERROR"
-            analysis.endedAt = timezone.now()
-            analysis.save(update_fields=["status", "endedAt"])
 
-            send_ws("analysis_error", {
-                "analysis_id": analysis_id,
-                "error": str(e),
-                "message": "Error durante el procesamiento del video",
-            })
+@shared_task
+def finalize_sharded_analysis(shard_results, analysis_id, total_frames):
+    """
+    Une los tracks de todos los segmentos y guarda los vehículos
 
-            send_ws("processing_error", {
-                "analysis_id": analysis_id,
-                "error": str(e),
-            })
+    Args:
+        shard_results: Resultados de analyze_video_shard (uno por segmento)
+        analysis_id: ID del análisis
+        total_frames: Frames totales del video
+    """
+    from apps.traffic_app.models import TrafficAnalysis
+    from apps.traffic_app.services.counting import merge_line_counts
+    from apps.traffic_app.services.sharding import stitch_shard_tracks
+
+    analysis = TrafficAnalysis.objects.select_related("cameraId").get(id=analysis_id)
+
+    tracked_vehicles = stitch_shard_tracks(
+        shard_results,
+        iou_threshold=getattr(settings, "VIDEO_SHARD_STITCH_IOU", 0.5),
+        sample_size=getattr(settings, "FRAMES_PER_VEHICLE", 8),
+    )
+
+    orphan_crops = _discard_orphan_crops(shard_results, tracked_vehicles)
+    segment_tracks = sum(len(shard["tracks"]) for shard in shard_results)
+    logger.info(
+        f"🧩 Análisis {analysis_id}: {segment_tracks} tracks de {len(shard_results)} segmentos "
+        f"unidos en {len(tracked_vehicles)} vehículos ({orphan_crops} recortes sin uso borrados)"
+    )
+
+    counts = _count_vehicle_types(tracked_vehicles)
+    analysis.carCount = counts["car"]
+    analysis.truckCount = counts["truck"]
+    analysis.motorcycleCount = counts["motorcycle"]
+    analysis.busCount = counts["bus"]
+
+    line_counts = [
+        shard["line_counts"] for shard in shard_results if shard.get("line_counts") is not None
+    ]
+    if line_counts:
+        analysis.analysisData = json.dumps({"lineCounts": merge_line_counts(*line_counts)})
+
+    # Guardar vehículos en base de datos
+    logger.info(f"💾 Guardando {len(tracked_vehicles)} vehículos en la base de datos...")
+    _send_ws(analysis_id, "log_message", {
+        "message": f"Guardando {len(tracked_vehicles)} vehículos en base de datos...",
+        "level": "info",
+    })
+
+    speed_estimator = _load_speed_estimator(
+        analysis.cameraId, tuple(shard_results[0]["frame_size"]), shard_results[0]["fps"]
+    )
+    vehicle_speeds = []
+    writer = _create_bulk_writer()
+    saved_count = _flush_vehicles(
+        analysis, tracked_vehicles, list(tracked_vehicles), speed_estimator, vehicle_speeds,
+        writer=writer,
+    )
+    _log_persistence(analysis_id, writer)
+    if vehicle_speeds:
+        analysis.avgSpeed = round(float(np.mean(vehicle_speeds)), 2)
+    processed_frames = max(shard["processed_frames"] for shard in shard_results)
+
+    return _complete_analysis(analysis, processed_frames, total_frames, saved_count)
 
-        except Exception as inner_e:
-            logger.error(f"Error en manejo de excepciones: {inner_e}")
 
-        # Reintentar la tarea si falla
-        raise self.retry(exc=e, countdown=60 * (2**self.request.retries))
+@shared_task
+def sharded_analysis_failed(request, exc, traceback, analysis_id):
+    """Errback del chord: algún segmento falló definitivamente"""
+    logger.error(f"✖️ Error en el análisis por segmentos {analysis_id}: {exc}")
+    _mark_analysis_error(analysis_id, exc)
 
 
 @shared_task
@@ -601,6 +1374,9 @@ def cleanup_old_analyses(days: int = 30):
                             deleted_files += 1
                     vehicle.delete() # Esto también eliminará los VehicleFrame asociados por la cascada
 
+            # Eliminar recortes del análisis (services.crop_store)
+            shutil.rmtree(_crop_directory(analysis.id), ignore_errors=True)
+
             # Eliminar registro de análisis
             analysis.delete()
             deleted_count += 1
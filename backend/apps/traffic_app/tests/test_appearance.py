@@ -0,0 +1,41 @@
+"""
+Tests de las features de apariencia para re-identificación
+"""
+
+import cv2
+import numpy as np
+from django.test import SimpleTestCase
+
+from apps.traffic_app.services.appearance import FEATURE_DIM, crop_features, extract_features
+
+
+def striped_crop(width, height):
+    """Vehículo sintético: franjas horizontales azul, blanca y roja"""
+    crop = np.zeros((height, width, 3), dtype=np.uint8)
+    crop[: height // 3] = (200, 40, 40)
+    crop[height // 3 : 2 * height // 3] = (230, 230, 230)
+    crop[2 * height // 3 :] = (40, 40, 200)
+    return crop
+
+
+class CropFeaturesTests(SimpleTestCase):
+    def test_independent_of_crop_resolution(self):
+        full = striped_crop(300, 240)
+        small = cv2.resize(full, (75, 60), interpolation=cv2.INTER_AREA)
+        features = crop_features([full, small])
+        self.assertGreater(float(features[0] @ features[1]), 0.99)
+
+    def test_missing_crops(self):
+        features = crop_features([None, np.zeros((0, 10, 3), dtype=np.uint8), striped_crop(40, 30)])
+        self.assertEqual(features.shape, (3, FEATURE_DIM))
+        self.assertFalse(features[:2].any())
+        self.assertAlmostEqual(float(np.linalg.norm(features[2])), 1.0, places=5)
+
+    def test_matches_extract_features(self):
+        frame = np.zeros((200, 300, 3), dtype=np.uint8)
+        frame[50:110, 100:180] = striped_crop(80, 60)
+        bboxes = [(100, 50, 80, 60), (400, 0, 10, 10)]
+        np.testing.assert_array_equal(
+            extract_features(frame, bboxes),
+            crop_features([frame[50:110, 100:180], None]),
+        )
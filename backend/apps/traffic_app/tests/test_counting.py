@@ -0,0 +1,117 @@
+"""
+Tests del conteo por líneas virtuales y la asignación de carril
+"""
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from apps.traffic_app.services.counting import (
+    TrafficCounter,
+    merge_line_counts,
+    validate_count_lines,
+)
+
+
+FRAME_SIZE = (200, 200)
+
+# Línea horizontal en y = 100; de izquierda a derecha de (0, 100) → (200, 100)
+# es hacia abajo en la imagen
+LINES = [{"name": "stop", "points": [[0, 100], [200, 100]], "direction": "SOUTH"}]
+
+# Carril 1 a la izquierda, carril 2 a la derecha
+LANES = [
+    [[0, 0], [100, 0], [100, 200], [0, 200]],
+    [[100, 0], [200, 0], [200, 200], [100, 200]],
+]
+
+
+def box(x, bottom):
+    """Caja 20x20 (x, y, w, h) cuyo punto inferior central es (x + 10, bottom)"""
+    return [x, bottom - 20, 20, 20]
+
+
+class ValidateCountLinesTests(SimpleTestCase):
+    def test_defaults_and_floats(self):
+        lines = validate_count_lines([{"points": [[0, 1], [2, 3]], "direction": "EAST"}])
+        self.assertEqual(
+            lines,
+            [{"name": "line_1", "points": [[0.0, 1.0], [2.0, 3.0]], "direction": "EAST"}],
+        )
+
+    def test_invalid_lines(self):
+        for lines in (
+            {"points": []},
+            [{"points": [[0, 0], [0, 0]], "direction": "EAST"}],
+            [{"points": [[0, 0], [1, 1]], "direction": "UP"}],
+            [{"points": [[0, 0]], "direction": "EAST"}],
+        ):
+            with self.assertRaises(ValueError):
+                validate_count_lines(lines)
+
+
+class TrafficCounterTests(SimpleTestCase):
+    def make_counter(self, **kwargs):
+        return TrafficCounter(validate_count_lines(LINES), LANES, FRAME_SIZE, **kwargs)
+
+    def test_opposite_directions(self):
+        counter = self.make_counter()
+        ids = np.array([1, 2])
+
+        # Track 1 baja por el carril 1 y track 2 sube por el carril 2
+        self.assertEqual(counter.update(ids, [box(30, 80), box(130, 120)], 1), [])
+        events = counter.update(ids, [box(30, 95), box(130, 105)], 2)
+        self.assertEqual(events, [])
+        events = counter.update(ids, [box(30, 110), box(130, 90)], 3)
+
+        self.assertEqual(sorted(events), [(1, "stop", "SOUTH"), (2, "stop", "NORTH")])
+        self.assertEqual(counter.get_counts(), {"stop": {"SOUTH": 1, "NORTH": 1}})
+        self.assertEqual(counter.attributes(1)["direction"], "SOUTH")
+        self.assertEqual(counter.attributes(1)["lane"], 1)
+        self.assertEqual(counter.attributes(2)["direction"], "NORTH")
+        self.assertEqual(counter.attributes(2)["lane"], 2)
+
+    def test_track_counted_once_per_line(self):
+        counter = self.make_counter()
+        ids = np.array([1])
+        for frame_number, bottom in enumerate((90, 110, 90, 110), start=1):
+            counter.update(ids, [box(30, bottom)], frame_number)
+        self.assertEqual(counter.get_counts(), {"stop": {"SOUTH": 1}})
+
+    def test_crossing_beside_the_segment_not_counted(self):
+        lines = [{"name": "half", "points": [[0, 100], [80, 100]], "direction": "SOUTH"}]
+        counter = TrafficCounter(validate_count_lines(lines), [], FRAME_SIZE)
+        ids = np.array([1])
+        counter.update(ids, [box(130, 90)], 1)
+        self.assertEqual(counter.update(ids, [box(130, 110)], 2), [])
+        self.assertIsNone(counter.attributes(1)["direction"])
+
+    def test_count_from_frame(self):
+        # Segmento solapado: los cruces del frame 10 los cuenta el anterior
+        counter = self.make_counter(count_from_frame=11)
+        ids = np.array([1, 2])
+        counter.update(ids, [box(30, 90), box(130, 80)], 9)
+        self.assertEqual(counter.update(ids, [box(30, 110), box(130, 95)], 10), [])
+        events = counter.update(ids, [box(30, 120), box(130, 105)], 11)
+
+        self.assertEqual(events, [(2, "stop", "SOUTH")])
+        self.assertEqual(counter.get_counts(), {"stop": {"SOUTH": 1}})
+        # La dirección del track no contado se conserva
+        self.assertEqual(counter.attributes(1)["direction"], "SOUTH")
+
+    def test_forget(self):
+        counter = self.make_counter()
+        ids = np.array([1])
+        counter.update(ids, [box(30, 90)], 1)
+        counter.forget(1)
+        self.assertEqual(counter.update(ids, [box(30, 110)], 2), [])
+        self.assertEqual(
+            counter.attributes(1), {"direction": None, "lane": 1, "lane_votes": [0, 1, 0]}
+        )
+
+
+class MergeLineCountsTests(SimpleTestCase):
+    def test_sums_by_line_and_direction(self):
+        merged = merge_line_counts(
+            {"stop": {"SOUTH": 2}}, None, {"stop": {"SOUTH": 1, "NORTH": 3}, "exit": {"EAST": 1}}
+        )
+        self.assertEqual(merged, {"stop": {"SOUTH": 3, "NORTH": 3}, "exit": {"EAST": 1}})
@@ -0,0 +1,107 @@
+"""
+Tests del filtro de Kalman de velocidad constante en lote
+"""
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from apps.traffic_app.services.detections import from_raw
+from apps.traffic_app.services.kalman import (
+    ConstantVelocityKalman,
+    boxes_to_measurements,
+    states_to_boxes,
+)
+from apps.traffic_app.services.tracking import IoUAssociation, TrackingEngine
+
+
+class ConstantVelocityKalmanTests(SimpleTestCase):
+    def setUp(self):
+        self.kalman = ConstantVelocityKalman()
+
+    def test_boxes_roundtrip(self):
+        boxes = np.array([[10, 20, 40, 30], [0, 0, 8, 16]], dtype=np.float64)
+        states, _ = self.kalman.initiate(boxes)
+        np.testing.assert_allclose(boxes_to_measurements(boxes)[0], (30, 35, 1200, 40 / 30))
+        np.testing.assert_allclose(states_to_boxes(states), boxes)
+
+    def test_predict_advances_dt_frames(self):
+        states, covariances = self.kalman.initiate(np.array([[0, 0, 10, 10]]))
+        states[0, 4:6] = (3.0, -2.0)
+
+        predicted, predicted_covariances = self.kalman.predict(states, covariances, dt=4)
+        np.testing.assert_allclose(predicted[0, :2], (5.0 + 12.0, 5.0 - 8.0))
+        np.testing.assert_allclose(predicted[0, 2:4], states[0, 2:4])
+
+        # Más frames sin medición → más incertidumbre
+        _, one_frame_covariances = self.kalman.predict(states, covariances, dt=1)
+        self.assertGreater(predicted_covariances[0, 0, 0], one_frame_covariances[0, 0, 0])
+        # No modifica los arrays de entrada
+        self.assertEqual(states[0, 0], 5.0)
+
+    def test_area_never_negative(self):
+        states, covariances = self.kalman.initiate(np.array([[0, 0, 10, 10]]))
+        states[0, 6] = -200.0
+        predicted, _ = self.kalman.predict(states, covariances, dt=1)
+        self.assertEqual(predicted[0, 2], 100.0)
+
+    def test_batch_matches_single_filters(self):
+        boxes = np.array([[0, 0, 20, 10], [50, 50, 10, 30]], dtype=np.float64)
+        detected = boxes + [[4, 1, 0, 0], [-3, 2, 2, 0]]
+
+        states, covariances = self.kalman.initiate(boxes)
+        states, covariances = self.kalman.predict(states, covariances, dt=2)
+        states, covariances = self.kalman.update(states, covariances, detected)
+
+        for i in range(len(boxes)):
+            single, single_cov = self.kalman.initiate(boxes[i : i + 1])
+            single, single_cov = self.kalman.predict(single, single_cov, dt=2)
+            single, single_cov = self.kalman.update(single, single_cov, detected[i : i + 1])
+            np.testing.assert_allclose(states[i], single[0])
+            np.testing.assert_allclose(covariances[i], single_cov[0])
+
+    def test_recovers_constant_velocity_with_stride(self):
+        # Vehículo a 4 px/frame en x y 1 px/frame en y, observado cada 3 frames
+        stride = 3
+        frames = np.arange(0, 60, stride)
+        boxes = np.zeros((len(frames), 4))
+        boxes[:, 0] = 4.0 * frames
+        boxes[:, 1] = 100 + 1.0 * frames
+        boxes[:, 2:] = (40.0, 20.0)
+
+        states, covariances = self.kalman.initiate(boxes[:1])
+        for box in boxes[1:]:
+            states, covariances = self.kalman.predict(states, covariances, dt=stride)
+            states, covariances = self.kalman.update(states, covariances, box[None])
+
+        np.testing.assert_allclose(states[0, 4:6], (4.0, 1.0), atol=0.05)
+
+        # La predicción lleva la caja al siguiente frame observado
+        predicted, _ = self.kalman.predict(states, covariances, dt=stride)
+        expected = [4.0 * (frames[-1] + stride), 100 + frames[-1] + stride, 40.0, 20.0]
+        np.testing.assert_allclose(states_to_boxes(predicted)[0], expected, atol=0.5)
+
+    def test_empty_batch(self):
+        states, covariances = self.kalman.initiate(np.zeros((0, 4)))
+        predicted, _ = self.kalman.predict(states, covariances, dt=5)
+        self.assertEqual(predicted.shape, (0, 7))
+
+
+class TrackingEngineMotionTests(SimpleTestCase):
+    def track_ids(self, engine):
+        # 5 px/frame con cajas de 40 px: cada frame hasta el 10, luego 1 de
+        # cada 6 (30 px entre detecciones, IoU 0.14 con la última caja)
+        frame_numbers = list(range(1, 11)) + list(range(16, 70, 6))
+        ids = []
+        for frame_number in frame_numbers:
+            x = 5.0 * frame_number
+            raw = np.array([[x, 0, x + 40, 40, 0.9, 2]], dtype=np.float32)
+            ids.append(int(engine.update(from_raw(raw), frame_number).track_ids[0]))
+        return ids
+
+    def test_prediction_keeps_id_across_skipped_frames(self):
+        engine = TrackingEngine(IoUAssociation(0.3), motion=ConstantVelocityKalman())
+        self.assertEqual(set(self.track_ids(engine)), {1})
+
+    def test_last_box_loses_fast_vehicle(self):
+        engine = TrackingEngine(IoUAssociation(0.3))
+        self.assertGreater(len(set(self.track_ids(engine))), 1)
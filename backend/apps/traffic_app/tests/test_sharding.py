@@ -0,0 +1,103 @@
+"""
+Tests de la división de videos en segmentos y la unión de sus tracks
+"""
+
+from django.test import SimpleTestCase
+
+from apps.traffic_app.services.sharding import plan_shards, stitch_shard_tracks
+from apps.traffic_app.services.track_store import Trajectory
+
+
+FPS = 30.0
+
+
+def make_track(track_id, frames, vehicle_type="car", x0=0, y=100, speed=4, **extra):
+    """Track de analyze_video_shard: caja 40x30 que avanza `speed` px por frame"""
+    trajectory = Trajectory()
+    for frame in frames:
+        trajectory.append(frame, (x0 + speed * frame, y, 40, 30), 0.8)
+    return {
+        "track_id": track_id,
+        "type": vehicle_type,
+        "first_frame": frames[0],
+        "first_seconds": frames[0] / FPS,
+        "last_seconds": frames[-1] / FPS,
+        "trajectory": trajectory.to_dict(),
+        "samples": [{"frameNumber": frame, "score": 0.5} for frame in frames[::10]],
+        **extra,
+    }
+
+
+def make_shard(index, start, end, tracks):
+    return {"shard_index": index, "start_frame": start, "end_frame": end, "tracks": tracks}
+
+
+class PlanShardsTests(SimpleTestCase):
+    def test_shards_overlap_previous(self):
+        self.assertEqual(
+            plan_shards(3000, FPS, 3, overlap_seconds=2.0),
+            [(1, 1000), (941, 2000), (1941, 3000)],
+        )
+
+    def test_shards_cover_every_frame(self):
+        shards = plan_shards(1001, FPS, 4, overlap_seconds=1.0)
+        self.assertEqual(shards[0][0], 1)
+        self.assertEqual(shards[-1][1], 1001)
+        for (_, prev_end), (next_start, _) in zip(shards, shards[1:]):
+            self.assertLessEqual(next_start, prev_end + 1)
+
+    def test_short_video_single_shard(self):
+        self.assertEqual(plan_shards(100, FPS, 4, overlap_seconds=2.0), [(1, 100)])
+        self.assertEqual(plan_shards(0, FPS, 4), [(1, 1)])
+
+
+class StitchShardTracksTests(SimpleTestCase):
+    def test_track_stitched_across_overlap(self):
+        shards = [
+            make_shard(
+                1,
+                941,
+                2000,
+                [
+                    make_track(5, list(range(941, 1101)), lane_votes=[0, 2, 0]),
+                    make_track(6, list(range(1500, 1601)), y=400),
+                ],
+            ),
+            make_shard(
+                0,
+                1,
+                1000,
+                [make_track(3, list(range(900, 1001)), direction="SOUTH", lane_votes=[0, 3, 1])],
+            ),
+        ]
+
+        stitched = stitch_shard_tracks(shards, iou_threshold=0.5, sample_size=8)
+
+        self.assertEqual(sorted(stitched), [1, 2])
+        vehicle = stitched[1]
+        self.assertEqual((vehicle["first_frame"], vehicle["last_frame"]), (900, 1100))
+        self.assertEqual(vehicle["count"], 201)  # Frames del solapamiento sin repetir
+        self.assertEqual(vehicle["first_seconds"], 900 / FPS)
+        self.assertEqual(vehicle["last_seconds"], 1100 / FPS)
+        self.assertEqual(vehicle["direction"], "SOUTH")
+        self.assertEqual(vehicle["lane_votes"], [0, 5, 1])
+        frames = [frame["frameNumber"] for frame in vehicle["samples"].frames()]
+        self.assertEqual(len(frames), len(set(frames)))
+
+        self.assertEqual((stitched[2]["first_frame"], stitched[2]["last_frame"]), (1500, 1600))
+
+    def test_different_types_not_stitched(self):
+        shards = [
+            make_shard(0, 1, 1000, [make_track(1, list(range(900, 1001)))]),
+            make_shard(1, 941, 2000, [make_track(1, list(range(941, 1101)), "truck")]),
+        ]
+        stitched = stitch_shard_tracks(shards)
+        self.assertEqual(len(stitched), 2)
+        self.assertEqual([v["type"] for v in stitched.values()], ["car", "truck"])
+
+    def test_distant_tracks_not_stitched(self):
+        shards = [
+            make_shard(0, 1, 1000, [make_track(1, list(range(900, 1001)))]),
+            make_shard(1, 941, 2000, [make_track(1, list(range(941, 1101)), y=300)]),
+        ]
+        self.assertEqual(len(stitch_shard_tracks(shards)), 2)
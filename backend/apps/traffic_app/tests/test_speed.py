@@ -0,0 +1,89 @@
+"""
+Tests de la estimación de velocidad por homografía
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from apps.traffic_app.services.speed import SpeedEstimator, validate_calibration
+
+
+FPS = 30.0
+
+# 10 píxeles = 1 metro en ambos ejes
+HOMOGRAPHY = np.diag([0.1, 0.1, 1.0])
+
+
+def moving_boxes(frame_numbers, px_per_frame):
+    """Cajas 40x30 que avanzan `px_per_frame` en x desde (0, 100)"""
+    frame_numbers = np.asarray(frame_numbers, dtype=np.float64)
+    boxes = np.zeros((len(frame_numbers), 4))
+    boxes[:, 0] = px_per_frame * frame_numbers
+    boxes[:, 1:] = (100, 40, 30)
+    return boxes
+
+
+class SpeedEstimatorTests(SimpleTestCase):
+    def setUp(self):
+        self.estimator = SpeedEstimator(HOMOGRAPHY, FPS)
+
+    def test_constant_velocity(self):
+        # 5 px/frame = 0.5 m/frame = 15 m/s = 54 km/h
+        frame_numbers = np.arange(1, 91)
+        speeds, avg_speed = self.estimator.estimate(frame_numbers, moving_boxes(frame_numbers, 5))
+        np.testing.assert_allclose(speeds, 54.0, rtol=1e-6)
+        self.assertAlmostEqual(avg_speed, 54.0, places=4)
+
+    def test_skipped_frames(self):
+        # Detecciones cada 3 frames: el tiempo sale del número de frame
+        frame_numbers = np.arange(1, 91, 3)
+        speeds, avg_speed = self.estimator.estimate(frame_numbers, moving_boxes(frame_numbers, 5))
+        np.testing.assert_allclose(speeds, 54.0, rtol=1e-6)
+        self.assertAlmostEqual(avg_speed, 54.0, places=4)
+
+    def test_smoothing_removes_jitter(self):
+        frame_numbers = np.arange(1, 91)
+        boxes = moving_boxes(frame_numbers, 5)
+        boxes[:, 0] += np.where(frame_numbers % 2 == 0, 2.0, -2.0)
+        speeds, _ = self.estimator.estimate(frame_numbers, boxes)
+        np.testing.assert_allclose(speeds[10:-10], 54.0, rtol=0.05)
+
+    def test_max_speed(self):
+        estimator = SpeedEstimator(HOMOGRAPHY, FPS, max_speed_kmh=100.0)
+        frame_numbers = np.arange(1, 31)
+        speeds, avg_speed = estimator.estimate(frame_numbers, moving_boxes(frame_numbers, 20))
+        self.assertEqual(speeds.max(), 100.0)
+        self.assertEqual(avg_speed, 100.0)
+
+    def test_short_trajectory(self):
+        speeds, avg_speed = self.estimator.estimate([5], moving_boxes([5], 5))
+        self.assertEqual(speeds.tolist(), [0.0])
+        self.assertIsNone(avg_speed)
+
+        speeds, avg_speed = self.estimator.estimate([5, 5], moving_boxes([5, 5], 5))
+        self.assertIsNone(avg_speed)
+
+    def test_from_camera(self):
+        # Calibración guardada a 1280x720 y video a 640x360
+        camera = SimpleNamespace(
+            resolution="1280x720",
+            speedCalibration={
+                "imagePoints": [[0, 0], [200, 0], [200, 200], [0, 200]],
+                "worldPoints": [[0, 0], [10, 0], [10, 10], [0, 10]],
+            },
+        )
+        estimator = SpeedEstimator.from_camera(camera, (640, 360), FPS)
+        np.testing.assert_allclose(estimator.to_world([[100, 100]]), [[10.0, 10.0]], atol=1e-6)
+
+        self.assertIsNone(SpeedEstimator.from_camera(SimpleNamespace(), (640, 360), FPS))
+
+
+class ValidateCalibrationTests(SimpleTestCase):
+    def test_needs_four_pairs(self):
+        with self.assertRaises(ValueError):
+            validate_calibration({"imagePoints": [[0, 0]] * 3, "worldPoints": [[0, 0]] * 3})
+        with self.assertRaises(ValueError):
+            validate_calibration({"imagePoints": [[0, 0]] * 4, "worldPoints": [[0, 0]] * 5})
+        self.assertIsNone(validate_calibration(None))
@@ -0,0 +1,156 @@
+"""
+Tests de las tareas de análisis de video
+"""
+
+from unittest import mock
+
+import cv2
+import numpy as np
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.traffic_app import tasks
+from apps.traffic_app.models import Camera, Location, TrafficAnalysis, Vehicle, VehicleFrame
+from apps.traffic_app.services.detections import from_raw
+from apps.traffic_app.services.tracking import IoUAssociation, TrackingEngine
+
+
+FRAME = np.full((480, 640, 3), 127, dtype=np.uint8)
+
+
+class FakePipeline:
+    """Pipeline con frames ya detectados; falla tras `fail_after` frames"""
+
+    def __init__(self, frames, fail_after=None):
+        self.frames = frames
+        self.fail_after = fail_after
+
+    def __iter__(self):
+        for index, item in enumerate(self.frames):
+            if index == self.fail_after:
+                raise RuntimeError("Fallo simulado del decodificador")
+            yield item
+
+    def get_stats(self):
+        return {}
+
+
+def video_frames():
+    """Vehículo 1 en los frames 1-12 y vehículo 2 en los frames 1-40"""
+    frames = []
+    for frame_number in range(1, 41):
+        boxes = [[300 + frame_number, 300, 380 + frame_number, 360, 0.9, 7]]
+        if frame_number <= 12:
+            boxes.insert(0, [10 + frame_number, 50, 90 + frame_number, 110, 0.9, 2])
+        detections = from_raw(np.array(boxes, dtype=np.float32))
+        frames.append((frame_number, FRAME, (detections, tasks._cut_crops(FRAME, detections))))
+    return frames
+
+
+@override_settings(
+    VIDEO_SHARD_COUNT=1,
+    FRAME_CROPS_ENABLED=False,
+    REID_CROSS_CAMERA_ENABLED=False,
+    PLATE_QUALITY_ENABLED=False,
+)
+class AnalysisTaskTestCase(TestCase):
+    def setUp(self):
+        location = Location.objects.create(
+            description="Av. Principal", latitude=-0.18, longitude=-78.47, country="EC"
+        )
+        camera = Camera.objects.create(name="Cámara 1", locationId=location)
+        self.analysis = TrafficAnalysis.objects.create(
+            cameraId=camera,
+            locationId=location,
+            videoPath="video.mp4",
+            startedAt=timezone.now(),
+            densityLevel="LOW",
+            status="PENDING",
+        )
+
+        capture = mock.MagicMock()
+        capture.isOpened.return_value = True
+        capture.get.side_effect = {
+            cv2.CAP_PROP_FPS: 30,
+            cv2.CAP_PROP_FRAME_COUNT: 40,
+            cv2.CAP_PROP_FRAME_WIDTH: 640,
+            cv2.CAP_PROP_FRAME_HEIGHT: 480,
+        }.get
+        detector = mock.MagicMock(device="cpu", backend="torch")
+        batcher = mock.MagicMock(last_batch_time=0.0)
+        batcher.get_stats.return_value = {
+            "frames": 0, "batches": 0, "avg_batch_size": 0.0, "inference_fps": 0.0,
+        }
+        self.batcher = batcher
+
+        for patcher in (
+            mock.patch("cv2.VideoCapture", return_value=capture),
+            mock.patch.object(tasks, "_load_detector", return_value=(detector, None)),
+            mock.patch.object(tasks, "_send_ws"),
+            mock.patch.object(tasks, "VEHICLE_FLUSH_BATCH", 1),
+            mock.patch(
+                "apps.traffic_app.services.tracking.create_tracking_engine",
+                lambda: TrackingEngine(IoUAssociation(0.3), max_missing=5),
+            ),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_task(self, pipeline):
+        with mock.patch.object(
+            tasks, "_build_pipeline", return_value=(pipeline, self.batcher, None)
+        ):
+            return tasks.analyze_video_async(self.analysis.id, "video.mp4")
+
+
+class AnalyzeVideoRetryTests(AnalysisTaskTestCase):
+    def test_retry_after_flush_does_not_duplicate_vehicles(self):
+        # El vehículo 1 termina en el frame 18 y se guarda antes del fallo
+        with self.assertRaises(RuntimeError):
+            self.run_task(FakePipeline(video_frames(), fail_after=25))
+        self.assertEqual(Vehicle.objects.filter(trafficAnalysisId=self.analysis).count(), 1)
+
+        # Reintento: procesa el video completo desde el inicio
+        result = self.run_task(FakePipeline(video_frames()))
+
+        vehicles = Vehicle.objects.filter(trafficAnalysisId=self.analysis)
+        self.assertEqual(result["total_vehicles"], 2)
+        self.assertEqual(
+            sorted(vehicles.values_list("id", flat=True)),
+            [f"vehicle_{self.analysis.id}_1", f"vehicle_{self.analysis.id}_2"],
+        )
+        self.assertEqual(
+            VehicleFrame.objects.filter(vehicleId__trafficAnalysisId=self.analysis).count(),
+            sum(vehicles.values_list("storedFrames", flat=True)),
+        )
+
+
+class AnalyzeVideoShardTests(AnalysisTaskTestCase):
+    def test_finished_tracks_released_during_shard(self):
+        current = {}
+        finished = []
+        finish_shard_tracks = tasks._finish_shard_tracks
+
+        def frames():
+            for item in video_frames():
+                current["frame"] = item[0]
+                yield item
+
+        def record_finished(tracked_vehicles, track_ids, crop_store=None):
+            tracks = finish_shard_tracks(tracked_vehicles, track_ids, crop_store)
+            finished.extend((current["frame"], track) for track in tracks)
+            return tracks
+
+        pipeline = FakePipeline(frames())
+        with mock.patch.object(tasks, "_finish_shard_tracks", record_finished), \
+                mock.patch.object(tasks, "_build_pipeline", return_value=(pipeline, None, None)):
+            result = tasks.analyze_video_shard(self.analysis.id, "video.mp4", 0, 1, 40)
+
+        # El vehículo 1 se cierra al perderse (frame 18), no al final del segmento
+        self.assertEqual(
+            [(frame, track["type"]) for frame, track in finished], [(18, "car"), (40, "truck")]
+        )
+        self.assertEqual(len(result["tracks"]), 2)
+        for track in result["tracks"]:
+            self.assertTrue(track["samples"])
+            self.assertFalse(any("crop" in sample for sample in track["samples"]))
@@ -0,0 +1,111 @@
+"""
+Tests de la asociación por IoU y del motor de tracking
+"""
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from apps.traffic_app.services.detections import from_raw, match_iou
+from apps.traffic_app.services.tracking import (
+    GreedyIoUAssociation,
+    IoUAssociation,
+    TrackingEngine,
+)
+
+
+def detections(*boxes, cls=2):
+    """Detecciones desde cajas (x1, y1, x2, y2) con la misma clase"""
+    return from_raw(np.array([[*box, 0.9, cls] for box in boxes], dtype=np.float32))
+
+
+class MatchIoUTests(SimpleTestCase):
+    def test_maximizes_total_iou(self):
+        # La voraz asigna la detección 0 al track 0 y deja la 1 sin track
+        ious = np.array([[0.6, 0.5], [0.55, 0.0]])
+        matches, unmatched_detections, unmatched_tracks = match_iou(ious, 0.3)
+        self.assertEqual(sorted(matches), [(0, 1), (1, 0)])
+        self.assertEqual(unmatched_detections, [])
+        self.assertEqual(unmatched_tracks, [])
+
+    def test_pairs_below_threshold_stay_unmatched(self):
+        ious = np.array([[0.2, 0.0], [0.0, 0.8]])
+        matches, unmatched_detections, unmatched_tracks = match_iou(ious, 0.3)
+        self.assertEqual(matches, [(1, 1)])
+        self.assertEqual(unmatched_detections, [0])
+        self.assertEqual(unmatched_tracks, [0])
+
+    def test_empty_matrix(self):
+        matches, unmatched_detections, unmatched_tracks = match_iou(np.zeros((2, 0)), 0.3)
+        self.assertEqual(matches, [])
+        self.assertEqual(unmatched_detections, [0, 1])
+        self.assertEqual(unmatched_tracks, [])
+
+
+class IoUAssociationTests(SimpleTestCase):
+    # Dos tracks contiguos de 10x10 y una detección cerca de cada uno
+    track_boxes = np.array([[0, 0, 10, 10], [10, 0, 10, 10]], dtype=np.float32)
+    det_boxes = np.array([[3, 0, 10, 10], [12, 0, 10, 10]], dtype=np.float32)
+    classes = np.array([2, 2], dtype=np.int16)
+
+    def test_hungarian_beats_greedy(self):
+        det_boxes = np.array([[5, 0, 10, 10], [0, 0, 6, 10]], dtype=np.float32)
+        hungarian, _, _ = IoUAssociation(0.3).associate(
+            det_boxes, self.classes, self.track_boxes, self.classes
+        )
+        greedy, _, _ = GreedyIoUAssociation(0.3).associate(
+            det_boxes, self.classes, self.track_boxes, self.classes
+        )
+        self.assertEqual(sorted(hungarian), [(0, 1), (1, 0)])
+        self.assertEqual(greedy, [(0, 0)])
+
+    def test_class_aware(self):
+        det_classes = np.array([2, 7], dtype=np.int16)
+        matches, unmatched, _ = IoUAssociation(0.3).associate(
+            self.det_boxes, det_classes, self.track_boxes, self.classes
+        )
+        self.assertEqual(matches, [(0, 0)])
+        self.assertEqual(unmatched, [1])
+
+        matches, _, _ = IoUAssociation(0.3, class_aware=False).associate(
+            self.det_boxes, det_classes, self.track_boxes, self.classes
+        )
+        self.assertEqual(sorted(matches), [(0, 0), (1, 1)])
+
+
+class TrackingEngineTests(SimpleTestCase):
+    def test_two_tracks_keep_their_ids(self):
+        engine = TrackingEngine(IoUAssociation(0.3))
+        first = engine.update(detections((0, 0, 20, 20), (100, 0, 120, 20)), frame_number=1)
+        self.assertEqual(first.track_ids.tolist(), [1, 2])
+        self.assertEqual(first.is_new.tolist(), [True, True])
+
+        # Mismos vehículos desplazados y en orden inverso
+        second = engine.update(detections((102, 2, 122, 22), (2, 2, 22, 22)), frame_number=2)
+        self.assertEqual(second.track_ids.tolist(), [2, 1])
+        self.assertEqual(second.is_new.tolist(), [False, False])
+        self.assertEqual(second.removed, [])
+        self.assertEqual(len(engine), 2)
+
+    def test_tracks_expire_by_video_frames(self):
+        engine = TrackingEngine(IoUAssociation(0.3), max_missing=10)
+        engine.update(detections((0, 0, 20, 20)), frame_number=1)
+
+        self.assertEqual(engine.update(detections(), frame_number=11).removed, [])
+        self.assertEqual(engine.update(detections(), frame_number=12).removed, [1])
+        self.assertEqual(len(engine), 0)
+
+    def test_default_lifetime_at_stride_3(self):
+        # Como el tracker anterior: se elimina al 6º frame procesado sin detección
+        engine = TrackingEngine(IoUAssociation(0.3))
+        engine.update(detections((0, 0, 20, 20)), frame_number=3)
+        for frame_number in range(6, 21, 3):
+            self.assertEqual(engine.update(detections(), frame_number).removed, [])
+        self.assertEqual(engine.update(detections(), frame_number=21).removed, [1])
+
+    def test_new_track_after_expiry(self):
+        engine = TrackingEngine(IoUAssociation(0.3), max_missing=5)
+        engine.update(detections((0, 0, 20, 20)), frame_number=1)
+        update = engine.update(detections((200, 0, 220, 20)), frame_number=20)
+        self.assertEqual(update.track_ids.tolist(), [2])
+        self.assertTrue(update.is_new[0])
+        self.assertEqual(update.removed, [1])
@@ -413,17 +413,78 @@ SUPPORTED_VIDEO_FORMATS = [".mp4", ".avi", ".mov", ".mkv", ".flv", ".wmv"]
 YOLO_MODEL_PATH = BASE_DIR / "models" / "yolov8n.pt"  # Nano model (fast)
 YOLO_CONFIDENCE_THRESHOLD = 0.5  # Minimum confidence for detection
 YOLO_IOU_THRESHOLD = 0.45  # IoU threshold for NMS
+YOLO_BATCH_SIZE = 8  # Frames per predict() call in analysis tasks
+YOLO_BATCH_MAX_WAIT = 0.05  # Max seconds a frame waits for its batch to fill
+YOLO_MODEL_CACHE_MB = 1024  # Memory budget for models cached per worker process
+YOLO_MODEL_IDLE_SECONDS = 1800  # Cached models unused for this long are released
+YOLO_BACKEND = "auto"  # "torch", "onnx" or "auto" (ONNX Runtime on CPU, PyTorch on GPU)
+ONNX_INTRA_OP_THREADS = 0  # Threads per ONNX operator (0 = all physical cores)
+ONNX_INTER_OP_THREADS = 1  # Threads across independent ONNX operators
+YOLO_MIN_IMGSZ = 320  # Smallest inference size chosen per analysis
+YOLO_MAX_IMGSZ = 960  # Largest inference size (sources are never upscaled)
+YOLO_LATENCY_BUDGET_MS = 50  # Target inference latency per frame used to cap imgsz
+YOLO_REFERENCE_LATENCY_MS = {"cpu": 80, "cuda": 8}  # Per-frame latency at imgsz=640
+CAMERA_ROI_PADDING = 32  # Pixels kept around a camera's ROI polygon when cropping frames
+
+# Analysis pipeline (decode -> inference -> tracking threads)
+VIDEO_PIPELINE_QUEUE_SIZE = 16  # Max frames buffered between pipeline stages
+
+# Frame sampling: skipped frames are grabbed (not decoded) or seeked over
+FRAME_SAMPLING_MODE = "auto"  # "grab", "seek" or "auto"
+FRAME_SEEK_MIN_STRIDE = 30  # In "auto" mode, strides >= this seek to the next kept frame
+
+# Adaptive sampling: stride grows on static footage, drops back on motion/active tracks.
+# Off by default: results then match the fixed SKIP_FRAMES stride
+ADAPTIVE_SAMPLING_ENABLED = False
+ADAPTIVE_SAMPLING_MAX_STRIDE = 15  # Max frames between inferences on static stretches
+ADAPTIVE_SAMPLING_MOTION_THRESHOLD = 0.002  # Fraction of changed pixels that counts as motion
+ADAPTIVE_SAMPLING_PATIENCE = 3  # Quiet samples before the stride doubles
+
+# Shard-parallel analysis of long videos (one Celery subtask per shard)
+VIDEO_SHARD_COUNT = 1  # Shards per video (1 = disabled); usually the number of worker cores
+VIDEO_SHARD_MIN_DURATION = 600  # Only shard videos at least this long (seconds)
+VIDEO_SHARD_OVERLAP_SECONDS = 2.0  # Overlap between consecutive shards used to stitch tracks
+VIDEO_SHARD_STITCH_IOU = 0.5  # Mean IoU in the overlap to merge two shard tracks
+
+# Tracking engine shared by the Celery tasks and VideoProcessor
+TRACKING_ASSOCIATION = "hungarian"  # "hungarian" (optimal) or "greedy"
+TRACKING_IOU_THRESHOLD = 0.3  # Min IoU to associate a detection with a track
+TRACKING_MAX_MISSING = 15  # Video frames without detection before a track ends (5 processed frames at stride 3)
+TRACKING_KALMAN = True  # Associate against constant-velocity Kalman predicted boxes
+
+# Speed estimation (cameras with speedCalibration)
+SPEED_SMOOTHING_SECONDS = 0.5  # Moving-average window over each track's road-plane positions
+SPEED_MAX_KMH = 250.0  # Faster estimates are treated as tracking errors and clipped
 
 # Vehicle Re-identification Configuration
 REIDENTIFICATION_TIME_WINDOW = 60  # seconds (1 minute)
 
+# Cross-camera re-identification (per-worker gallery synced from Vehicle.reidFeature;
+# only videos whose container records a creation_time are linked)
+REID_CROSS_CAMERA_ENABLED = True
+REID_GALLERY_MAX_ENTRIES = 200_000  # Recent vehicles kept in memory
+REID_GALLERY_RETENTION_SECONDS = 3600  # Drop entries recorded this long before the newest one
+REID_MAX_DISTANCE_KM = 5.0  # Cameras closer than this are neighbours
+REID_MAX_SPEED_KMH = 120.0  # Sets the minimum plausible travel time between cameras
+REID_MAX_TRAVEL_SECONDS = 1800  # Max time between sightings on neighbouring cameras
+REID_SIMILARITY_THRESHOLD = 0.85  # Min appearance cosine similarity to link vehicles
+
 # Frame Storage Configuration
 FRAMES_PER_VEHICLE = 8  # Best 8 frames per vehicle
 FRAME_QUALITY_THRESHOLD = 0.6  # Minimum quality to save frame
+FRAME_QUALITY_SCALE = 0.5  # Downscale factor for the per-frame sharpness/brightness map
+FRAME_CROPS_ENABLED = True  # Write each saved vehicle frame as an image crop (VehicleFrame.imagePath)
+FRAME_CROPS_DIR = os.path.join(MEDIA_ROOT, "vehicle_crops")  # One subdirectory per analysis
+FRAME_CROPS_FORMAT = "jpg"  # "jpg" or "webp"
+FRAME_CROPS_QUALITY = 90
+FRAME_CROPS_WORKERS = 2  # Background encode/write threads per analysis
+FRAME_CROPS_DEDUP_DISTANCE = 4  # Max dHash Hamming distance for near-duplicate crops of a vehicle
+DB_BULK_CREATE_BATCH_SIZE = 1000  # Rows per INSERT when saving vehicles (the backend caps it to its parameter limit)
 
 # OCR Configuration
 OCR_LANGUAGES = ["en", "es"]  # English and Spanish
 OCR_GPU = config("OCR_GPU", default=False, cast=bool)  # Use GPU if available
+PLATE_QUALITY_ENABLED = True  # Locate the plate in each vehicle's sampled crops to pick bestFrameForPlate
 
 # Video Streaming Configuration
 STREAM_RECONNECT_ATTEMPTS = 3
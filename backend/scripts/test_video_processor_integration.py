@@ -55,6 +55,7 @@ def test_vehicle_data_structure():
         quality=0.88,
         vehicle_type="car",
         confidence=0.93,
+        frame_number=30,  # Frame del video (por defecto: frames procesados)
     )
 
     # Obtener estadísticas (calcula average_confidence)
@@ -120,6 +121,8 @@ def test_vehicle_data_structure():
             assert field in frame, f"❌ Falta campo en frame: {field}"
             print(f"   {field}: {type(frame[field]).__name__} = {frame[field]}")
 
+        assert isinstance(frame["timestamp"], datetime), "❌ timestamp debe ser datetime"
+
         # Verificar bbox
         bbox = frame["bbox"]
         assert (
@@ -56,6 +56,17 @@ export interface LocationEntity {
 // ENTIDAD: CAMERA (Cámara de Vigilancia)
 // ============================================
 
+export interface CountLine {
+  name: string; // Nombre de la línea (Ej: "Entrada norte")
+  points: number[][]; // [[x1, y1], [x2, y2]] en píxeles de `resolution`
+  direction: TrafficDirectionKey; // Sentido de quien cruza de izquierda a derecha de (x1, y1) → (x2, y2); al revés = sentido opuesto
+}
+
+export interface SpeedCalibration {
+  imagePoints?: number[][]; // [[x, y], ...] al menos 4 puntos de la vía en píxeles de `resolution`
+  worldPoints?: number[][]; // [[X, Y], ...] los mismos puntos medidos en metros sobre la vía
+}
+
 export interface CameraEntity {
   id: number; // @db:primary @db:identity - ID autoincremental
   name: string; // @db:varchar(100) - Nombre identificador (Ej: "CAM-001-Centro")
@@ -69,6 +80,10 @@ export interface CameraEntity {
   lanes: number; // @db:int @default(2) - Número de carriles que cubre (Ej: 2, 4)
   coversBothDirections: boolean; // @default(false) - Si cubre ambas direcciones del tráfico
   notes?: string; // @db:text - Notas adicionales (puede incluir historial de ubicaciones si necesario)
+  roiPolygon: number[][]; // Región de interés [[x, y], ...] en píxeles de `resolution` (vacío = frame completo)
+  countLines: CountLine[]; // Líneas virtuales de conteo (vacío = sin conteo por línea)
+  lanePolygons: number[][][]; // Polígonos de carril [[[x, y], ...], ...] en píxeles de `resolution` (carril 1, 2, ...)
+  speedCalibration: SpeedCalibration; // Calibración para velocidad (vacío = sin velocidad)
   createdAt: Date; // @db:datetime - Fecha de creación
   updatedAt: Date; // @db:datetime - Fecha de última actualización (se actualiza al mover la cámara)
 }
@@ -122,6 +137,12 @@ export interface TrafficAnalysisEntity {
 // ENTIDAD: VEHICLE (Vehículo Detectado Único)
 // ============================================
 
+export interface ReidFeature {
+  feature: number[]; // Histograma de apariencia normalizado (norma L2 = 1)
+  firstSeenAt: number; // Instante de grabación (epoch, segundos) de la primera detección
+  lastSeenAt: number; // Instante de grabación (epoch, segundos) de la última detección
+}
+
 export interface VehicleEntity {
   id: string; // @db:primary @db:varchar(50) @default(cuid()) - CUID generado en frontend para tracking único
   trafficAnalysisId: number; // @db:foreignKey TrafficAnalysis @db:int - FK a TrafficAnalysis
@@ -153,6 +174,9 @@ export interface VehicleEntity {
   plateProcessingStatus: PlateProcessingStatusKey; // @db:varchar(20) - Estado del procesamiento de placa
   bestFrameForPlate?: number; // @db:int - Número del mejor frame para OCR de placa
   
+  // Re-identificación entre cámaras
+  reidFeature?: ReidFeature; // Apariencia e instantes de grabación (sólo si el video tiene hora de grabación)
+  
   // Timestamps
   createdAt: Date; // @db:datetime - Fecha de creación
 
@@ -180,6 +204,7 @@ export interface VehicleFrameEntity {
   // Calidad del frame
   confidence: number; // @db:decimal(5,4) - Nivel de confianza de detección en este frame (0-1)
   frameQuality: number; // @db:decimal(5,4) - Calidad del frame para OCR (0-1, calculado por nitidez/iluminación)
+  plateQuality?: number; // @db:decimal(5,4) - Legibilidad de la placa localizada en el recorte (0-1, 0 = sin placa)
   
   // Datos adicionales
   speed?: number; // @db:decimal(6,2) - Velocidad instantánea en este frame (km/h)
@@ -188,6 +213,20 @@ export interface VehicleFrameEntity {
   createdAt: Date; // @db:datetime - Fecha de creación
 }
 
+// ============================================
+// ENTIDAD: VEHICLE LINK (Re-identificación entre cámaras)
+// ============================================
+
+export interface VehicleLinkEntity {
+  id: number; // @db:primary @db:identity - ID autoincremental
+  sourceVehicleId: string; // @db:foreignKey Vehicle @db:varchar(50) - Avistamiento anterior (otra cámara)
+  targetVehicleId: string; // @db:foreignKey Vehicle @db:varchar(50) - Avistamiento nuevo re-identificado
+  similarity: number; // @db:decimal(5,4) - Similitud de apariencia (0-1)
+  travelSeconds: number; // @db:int - Segundos entre la última detección del origen y la primera del destino
+  
+  createdAt: Date; // @db:datetime - Fecha de creación
+}
+
 // ============================================
 // TIPOS AUXILIARES PARA FRONTEND
 // ============================================